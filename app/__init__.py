@@ -0,0 +1,4 @@
+from dotenv import load_dotenv
+
+# Carga las variables del archivo .env una sola vez, antes de que cualquier módulo lea la configuración
+load_dotenv()
@@ -1,11 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routes import tasks, auth
-from app import models
-from app.database import engine
+from app.routes import tasks, auth, metrics, events, health
+from app import database
+from app.replicas import replica_set
+from app.shards import shard_router
+from app.services import password_pool, query_budget, request_metrics, revocations, startup, task_cache
+from app.services.events import broker
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
-app = FastAPI(title = "TaskFlow with Python and React", version = "1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El esquema lo gestiona Alembic; el arranque solo lanza el calentamiento en segundo plano
+    # y /ready responde 200 cuando termina
+    startup.start()
+    replica_set.start()
+    revocations.start()
+    await broker.start()
+    yield
+    await startup.stop()
+    await replica_set.stop()
+    await revocations.stop()
+    await shard_router.close()
+    await broker.stop()
+    await task_cache.cache.close()
+    # Cierra los procesos de hashing de contraseñas al apagar el servidor
+    password_pool.shutdown()
+    await database.dispose_engines()
+
+
+app = FastAPI(title = "TaskFlow with Python and React", version = "1.0", lifespan=lifespan)
 frontend_url = os.getenv("FRONTEND_URL", "https://special-fortnight-r95xx6g67pj3x6r7-5173.app.github.dev")
 
 
@@ -19,13 +44,19 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"],
 )
+if query_budget.QUERY_BUDGET_MODE != "off":
+    # Solo en desarrollo: avisa o falla si un endpoint supera su presupuesto de consultas
+    app.add_middleware(query_budget.QueryBudgetMiddleware)
+if request_metrics.METRICS_ENABLED:
+    # El último middleware añadido es el más externo: mide también el trabajo de CORS
+    app.add_middleware(request_metrics.MetricsMiddleware)
 
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
-
-# Crea la base de datos si no existe
-models.Base.metadata.create_all(bind=engine)
+app.include_router(metrics.router)
+app.include_router(events.router)
+app.include_router(health.router)
 
 
 @app.get("/")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import DDL, Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, Index, event, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -11,13 +11,116 @@ class Task(Base):
     description = Column(String, nullable=True)
     completed = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    deleted_at = Column(DateTime, nullable=True) #Lápida del borrado lógico, para la sincronización incremental
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0") #Posición en la secuencia de cambios del usuario
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False) #Nueva columna con FK
     user = relationship("User", back_populates="tasks") #Relación con User
 
+    __table_args__ = (
+        # Índice compuesto para la paginación por cursor (keyset) de GET /tasks/
+        Index("ix_tasks_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Índice para GET /tasks/changes?since=<cursor>
+        Index("ix_tasks_user_id_change_seq", "user_id", "change_seq"),
+        # Índice para los agregados de GET /tasks/stats, solo sobre tareas no borradas
+        Index(
+            "ix_tasks_user_id_completed_created_at", "user_id", "completed", "created_at",
+            postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL"),
+        ),
+    )
+
+class TaskArchive(Base):
+    """
+    Tareas completadas antiguas que el archivado (services/archive.py) saca de tasks, para
+    que los listados solo recorran las activas. De solo lectura: para modificar o borrar
+    una tarea archivada, task_service la devuelve antes a tasks. En PostgreSQL está
+    particionada por año de creación: el archivado crea las particiones que necesita.
+    """
+    __tablename__ = "tasks_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False) #El mismo id que tenía en tasks
+    created_at = Column(DateTime, primary_key=True) #La clave de partición debe formar parte de la clave primaria
+    title = Column(String)
+    description = Column(String, nullable=True)
+    completed = Column(Boolean, default=True)
+    updated_at = Column(DateTime)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_tasks_archive_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_tasks_archive_user_id_change_seq", "user_id", "change_seq"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0") #Último cursor de sincronización emitido
+    task_count = Column(BigInteger, nullable=False, default=0, server_default="0") #Tareas no borradas, para GET /tasks/stats
+    completed_task_count = Column(BigInteger, nullable=False, default=0, server_default="0") #De ellas, las completadas
     tasks = relationship("Task", back_populates="user") #Relación inversa
+
+
+class UserShard(Base):
+    """Directorio de sharding (solo en la BD principal): en qué shard viven las tareas de cada usuario."""
+    __tablename__ = "user_shards"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    shard = Column(String(64), nullable=False)
+    moving_to = Column(String(64), nullable=True) #Destino de un traslado en curso: mientras tanto se bloquean las escrituras
+
+
+class RevokedToken(Base):
+    """Tokens revocados (logout, rotación) hasta su caducidad: la lista compartida por todos los workers."""
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True) #"jti" del token (o digest, en los emitidos sin él)
+    expires_at = Column(DateTime, nullable=False, index=True) #Después ya no hace falta: el token está caducado
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True) #Para la sincronización incremental
+
+
+# Búsqueda de texto completo para GET /tasks/search. create_all la crea según el dialecto:
+# en PostgreSQL, una columna tsvector generada con un índice GIN (user_id, search_vector),
+# que necesita btree_gin para incluir user_id; en SQLite, una tabla FTS5 mantenida con
+# triggers, con el dueño como token ("u<id>") para filtrar por usuario dentro del índice.
+SEARCH_CONFIG = "simple"
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    f"""ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_user_id_search_vector ON tasks USING gin (user_id, search_vector) WHERE deleted_at IS NULL",
+]
+
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(title, description, owner, tokenize = 'unicode61 remove_diacritics 2')",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks WHEN new.deleted_at IS NULL BEGIN
+        INSERT INTO tasks_fts (rowid, title, description, owner) VALUES (new.id, new.title, new.description, 'u' || new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description, deleted_at, user_id ON tasks BEGIN
+        DELETE FROM tasks_fts WHERE rowid = old.id;
+        INSERT INTO tasks_fts (rowid, title, description, owner)
+            SELECT new.id, new.title, new.description, 'u' || new.user_id WHERE new.deleted_at IS NULL;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        DELETE FROM tasks_fts WHERE rowid = old.id;
+    END""",
+]
+
+for _statement in POSTGRES_SEARCH_DDL:
+    event.listen(Task.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+for _statement in SQLITE_SEARCH_DDL:
+    event.listen(Task.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+# Las filas sin partición propia (no debería haberlas) van a la partición por defecto
+event.listen(
+    TaskArchive.__table__, "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS tasks_archive_default PARTITION OF tasks_archive DEFAULT").execute_if(dialect="postgresql"),
+)
+event.listen(Task.__table__, "before_drop", DDL("DROP TABLE IF EXISTS tasks_fts").execute_if(dialect="sqlite"))
@@ -0,0 +1,265 @@
+import asyncio
+import itertools
+import logging
+import os
+from fastapi import Depends, Request
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, OperationalError
+from starlette.concurrency import run_in_threadpool
+from app import database
+from app.database import run_db
+from app.shards import get_user_db, resolve_user_id
+from app.services import task_cache, task_service
+from app.services.ttl_cache import TTLCache
+
+
+# Réplicas de lectura, separadas por comas. Sin ninguna, las lecturas van al primario
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Tras una escritura, las lecturas de ese usuario van al primario durante estos segundos.
+# No puede ser menor que REPLICA_MAX_LAG_SECONDS: al cerrarse la ventana, la réplica
+# ya debe tener la escritura
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+# Cada cuánto se comprueban las réplicas y el retraso máximo (s) con el que se siguen usando
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "10"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+
+# Retraso de replicación en PostgreSQL; 0 si la réplica ha aplicado todo lo recibido
+# (si no, un primario sin escrituras parecería una réplica cada vez más atrasada)
+PG_REPLICATION_LAG = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+log = logging.getLogger("app.replicas")
+
+
+class Replica:
+    """Una réplica de lectura, con su engine (creado en el primer uso) y su estado de salud."""
+
+    def __init__(self, url: str, name: str, mode: str):
+        self.url = url
+        self.name = name
+        self.mode = mode
+        self.healthy = True
+        self.lag = None
+        self.reads = 0
+        self.failures = 0
+        self.last_error = None
+        self._engine = None
+        self._sessionmaker = None
+
+    def _create(self):
+        if self._engine is None:
+            self._engine, self._sessionmaker = database.create_engines(self.url, self.name, self.mode)
+
+    @property
+    def engine(self):
+        self._create()
+        return self._engine
+
+    def session(self):
+        self._create()
+        return self._sessionmaker()
+
+    def _check_sync(self, connection) -> float:
+        if connection.dialect.name == "postgresql":
+            return float(connection.execute(PG_REPLICATION_LAG).scalar())
+        connection.execute(text("SELECT 1"))
+        return 0.0
+
+    async def check(self) -> float:
+        """Retraso de replicación en segundos; lanza una excepción si la réplica no responde."""
+        if self.mode == "async":
+            async with self.engine.connect() as connection:
+                return await connection.run_sync(self._check_sync)
+
+        def check():
+            with self.engine.connect() as connection:
+                return self._check_sync(connection)
+        return await run_in_threadpool(check)
+
+    async def dispose(self):
+        if self._engine is not None:
+            await database.dispose_engine(self._engine)
+            self._engine = self._sessionmaker = None
+
+    def stats(self) -> dict:
+        return {
+            "url": make_url(self.url).render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "reads": self.reads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class ReplicaSet:
+    """
+    Reparte las lecturas entre las réplicas sanas (round-robin). Un usuario que acaba de
+    escribir lee del primario durante sticky_seconds, para ver sus propias escrituras aunque
+    las réplicas vayan con retraso. La ventana se guarda en el worker y, si la hay, en la
+    caché compartida, para que la respeten también los demás workers.
+    Una réplica con más de max_lag_seconds de retraso sale del reparto, así que la ventana
+    debe durar al menos eso.
+    """
+
+    def __init__(self, urls: list[str], mode: str = None, sticky_seconds: float = REPLICA_STICKY_SECONDS,
+                 max_lag_seconds: float = REPLICA_MAX_LAG_SECONDS):
+        if urls and sticky_seconds < max_lag_seconds:
+            raise ValueError(
+                f"REPLICA_STICKY_SECONDS ({sticky_seconds}) must be at least REPLICA_MAX_LAG_SECONDS ({max_lag_seconds})"
+            )
+        mode = mode or database.DATABASE_MODE
+        self.replicas = [Replica(url, f"replica{i}", mode) for i, url in enumerate(urls)]
+        self.sticky_seconds = sticky_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self._sticky = TTLCache(100_000, sticky_seconds)
+        self._next = itertools.count()
+        self.sticky_reads = 0
+        self.fallback_reads = 0
+        self.stale_reads = 0
+        self._task = None
+
+    @staticmethod
+    def _sticky_key(user_id: int) -> str:
+        return f"primary:{user_id}"
+
+    async def mark_write(self, user_id: int):
+        """Abre (o renueva) la ventana en la que las lecturas del usuario van al primario."""
+        if not self.replicas or self.sticky_seconds <= 0:
+            return
+        self._sticky.set(user_id, True)
+        if task_cache.cache.shared is not None:
+            await task_cache.cache.shared.set(self._sticky_key(user_id), 1, self.sticky_seconds)
+
+    async def _is_sticky(self, user_id: int) -> bool:
+        if self._sticky.get(user_id) is not None:
+            return True
+        shared = task_cache.cache.shared
+        return shared is not None and await shared.get(self._sticky_key(user_id)) is not None
+
+    async def route(self, user_id: int | None) -> Replica | None:
+        """Réplica para una lectura del usuario, o None si debe ir al primario."""
+        if not self.replicas:
+            return None
+        if user_id is not None and self.sticky_seconds > 0 and await self._is_sticky(user_id):
+            self.sticky_reads += 1
+            return None
+        start = next(self._next)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica.healthy:
+                replica.reads += 1
+                return replica
+        self.fallback_reads += 1
+        return None
+
+    def mark_failed(self, replica: Replica, exc: Exception):
+        """Saca la réplica del reparto hasta que la próxima comprobación la dé por sana."""
+        replica.failures += 1
+        replica.last_error = f"{type(exc).__name__}: {exc}"[:500]
+        if replica.healthy:
+            log.warning("Replica %s marked unhealthy: %s", replica.name, replica.last_error)
+        replica.healthy = False
+
+    async def check(self):
+        """Comprueba todas las réplicas: conexión y retraso de replicación."""
+        for replica in self.replicas:
+            try:
+                replica.lag = await replica.check()
+            except Exception as exc:
+                self.mark_failed(replica, exc)
+                continue
+            healthy = replica.lag <= self.max_lag_seconds
+            if healthy != replica.healthy:
+                log.warning("Replica %s is %s (lag %.1f s)", replica.name, "healthy" if healthy else "lagging", replica.lag)
+            replica.healthy = healthy
+
+    async def _health_loop(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(REPLICA_HEALTH_INTERVAL)
+
+    def start(self):
+        """Lanza las comprobaciones periódicas (llamar desde el lifespan)."""
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        for replica in self.replicas:
+            await replica.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "replicas": [replica.stats() for replica in self.replicas],
+            "sticky_seconds": self.sticky_seconds,
+            "sticky_reads": self.sticky_reads,
+            "fallback_reads": self.fallback_reads,
+            "stale_reads": self.stale_reads,
+        }
+
+
+def _is_connection_error(exc: Exception) -> bool:
+    return isinstance(exc, OperationalError) or (isinstance(exc, DBAPIError) and exc.connection_invalidated)
+
+
+async def get_read_db(request: Request, db=Depends(get_user_db)):
+    """
+    Sesión para endpoints de solo lectura: una réplica sana, o la sesión del primario
+    (`db`) si no hay réplicas, ninguna está sana o el usuario acaba de escribir.
+    Los usuarios que viven en un shard leen de su shard, que no tiene réplicas.
+    """
+    if getattr(request.state, "shard", None) is not None:
+        yield db
+        return
+    user_id = await resolve_user_id(request, db) if replica_set.replicas else None
+    replica = await replica_set.route(user_id)
+    if replica is None:
+        yield db
+        return
+    session = replica.session()
+    # Para read_db_at: si la réplica va por detrás de la versión cacheada, se lee de aquí
+    request.state.primary_db = db
+    try:
+        yield session
+    except Exception as exc:
+        if _is_connection_error(exc):
+            replica_set.mark_failed(replica, exc)
+        raise
+    finally:
+        if replica.mode == "async":
+            await session.close()
+        else:
+            await run_in_threadpool(session.close)
+
+
+async def read_db_at(request: Request, db, user_id: int, version: int, known: int | None = None):
+    """
+    Sesión de la que cargar datos que se guardan en caché (o en un ETag) bajo `version`,
+    la versión del usuario que publica el primario. Si `db` es una réplica que aún no ha
+    aplicado esa versión, daría datos antiguos con la versión nueva: se lee del primario.
+    `known` es la versión que ya se leyó de `db`, para no volver a consultarla.
+    """
+    primary = getattr(request.state, "primary_db", None)
+    if primary is None or primary is db:
+        return db
+    if known is None or known < version:
+        known = await run_db(db, task_service.current_change_seq, user_id)
+    if known >= version:
+        return db
+    replica_set.stale_reads += 1
+    return primary
+
+
+replica_set = ReplicaSet(DATABASE_REPLICA_URLS)
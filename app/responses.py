@@ -0,0 +1,31 @@
+import json
+from datetime import date, datetime
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa el módulo json estándar
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """Codifica content como JSON compacto en UTF-8 (orjson si está disponible)."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta JSON para datos ya validados (p. ej. filas leídas de la BD):
+    se codifica directamente, sin pasar por pydantic ni jsonable_encoder.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app import models, schemas
-from app.services.auth_service import hash_password, verify_password, create_access_token, create_refresh_token, decode_access_token, decode_refresh_token
+from app.database import get_db, run_db
+from app import models, schemas, shards
+from app.routes.metrics import require_metrics_access
+from app.services.auth_service import create_access_token, create_refresh_token, decode_access_token, decode_refresh_token, revocation_key, revoke_tokens
+from app.services import principal_cache, password_pool, revocations
+from app.services.principal_cache import Principal
 from datetime import timedelta
 from pydantic import BaseModel
 
@@ -15,32 +18,69 @@ class RefreshRequest(BaseModel):
     refresh_token: str
 
 
+class LogoutRequest(BaseModel):
+    refresh_token: str | None = None
+
+
+busy_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Demasiadas peticiones de autenticación, inténtalo de nuevo",
+    headers={"Retry-After": "1"},
+)
+
+
+def _get_user_by_email(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+
+def _save_user(db: Session, user: models.User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
 @router.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     """Registra un nuevo usuario en la base de datos."""
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
+    existing_user = await run_db(db, _get_user_by_email, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="El correo ya está registrado.")
 
-
-    hashed_password = hash_password(user.password)
+    #bcrypt se ejecuta en el pool de procesos para no bloquear el event loop ni el threadpool
+    try:
+        hashed_password = await password_pool.hash_password(user.password)
+    except password_pool.PasswordPoolBusy:
+        raise busy_exception
     new_user = models.User(email=user.email, hashed_password=hashed_password)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    new_user = await run_db(db, _save_user, new_user)
+    # Con sharding, sus tareas vivirán en el shard que le asigne el anillo
+    await shards.shard_router.place_new_user(db, new_user)
     return new_user
 
 
 @router.post("/login")
-def login(user: schemas.UserLogin, db: Session = Depends(get_db), response: Response = None):
+async def login(user: schemas.UserLogin, db: Session = Depends(get_db), response: Response = None):
     """Autentica un usuario y devuelve un token JWT."""
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await run_db(db, _get_user_by_email, user.email)
     #print(f"Intento de login con email: {user.email}") -> debug email
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
-
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Credenciales incorrectas")
+    try:
+        valid, new_hash = await password_pool.verify_and_update_password(user.password, db_user.hashed_password)
+    except password_pool.PasswordPoolBusy:
+        raise busy_exception
+    if not valid:
         raise HTTPException(status_code=401, detail="Credenciales incorrectas")
+
+    #Rehash transparente si el hash guardado usa un coste de bcrypt obsoleto
+    if new_hash is not None:
+        db_user.hashed_password = new_hash
+        await run_db(db, _save_user, db_user)
     
-    access_token = create_access_token(data={"sub": db_user.email}, expires_delta=timedelta(minutes=30))
+    access_token = create_access_token(data={"sub": db_user.email, "uid": db_user.id}, expires_delta=timedelta(minutes=30))
+    # El usuario se acaba de leer de la BD: las peticiones siguientes no necesitan consultarlo
+    principal_cache.put(Principal(id=db_user.id, email=db_user.email))
     # Añadir headers CORS adicionales manualmente (Ya no es necesario)
     """if response:
         response.headers["Access-Control-Allow-Origin"] = "*"
@@ -52,26 +92,58 @@ def login(user: schemas.UserLogin, db: Session = Depends(get_db), response: Resp
 
 
 @router.post("/refresh-token")
-def refresh_token(request: RefreshRequest, db: Session = Depends(get_db)):
+async def refresh_token(request: RefreshRequest, db: Session = Depends(get_db)):
     """Genera un nuevo token de acceso usando un token de refresh válido"""
     #Decodifica y verifica el token de refresh
     payload = decode_refresh_token(request.refresh_token)
-    if payload is None:
+    # Puede haberlo revocado otro worker: la comprobación en la BD es exacta
+    if payload is None or await run_db(db, revocations.is_stored, revocation_key(request.refresh_token, payload)):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token", headers={"WWW-Authenticate": "Bearer"},)
     
     #Verifica que el usuario existe
     email = payload.get("sub")
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await run_db(db, _get_user_by_email, email)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found", headers={"WWW-Authenticate": "Bearer"},)
     
     # Generar nuevo token de acceso
-    access_token = create_access_token(data={"sub": email})
+    access_token = create_access_token(data={"sub": email, "uid": user.id})
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+@router.post("/logout", status_code=204)
+async def logout(request: LogoutRequest | None = None, credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+    """Revoca el token de acceso (y el de refresh, si se envía) en todos los workers."""
+    tokens = [credentials.credentials]
+    if request is not None and request.refresh_token:
+        tokens.append(request.refresh_token)
+    await run_db(db, revoke_tokens, tokens)
+    return None
+
+
+async def resolve_principal(db, payload: dict):
+    """
+    Principal de un token ya verificado, o None si su usuario no existe. Sale de la caché
+    salvo que el token sea anterior a una invalidación del sujeto; si no, de la BD.
+    """
+    subject = payload.get("sub")
+    if not principal_cache.is_stale(payload):
+        principal = principal_cache.get(subject)
+        if principal is not None:
+            return principal
+
+    user = await run_db(db, _get_user_by_email, subject)
+    if user is None:
+        return None
+    principal = Principal(id=user.id, email=user.email)
+    principal_cache.put(principal)
+    return principal
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+    # Sesión del primario: depender de get_read_db haría que cada escritura ocupase un
+    # turno del reparto de réplicas. Con la caché de usuarios, casi nunca se consulta
     token = credentials.credentials  # Extrae solo el token sin "Bearer "
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -79,14 +151,20 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+    if not revocations.is_current():
+        # Sin las revocaciones de los demás workers no se puede saber si el token sigue valiendo
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Token revocation list is out of date", headers={"Retry-After": "1"})
     payload = decode_access_token(token)
     if payload is None:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.email == payload.get("sub")).first()
-    if user is None:
+    principal = await resolve_principal(db, payload)
+    if principal is None:
         raise credentials_exception
+    return principal
 
-    return user
 
-        
\ No newline at end of file
+@router.get("/principal-cache", dependencies=[Depends(require_metrics_access)])
+def principal_cache_stats():
+    """Contadores de aciertos/fallos de la caché de usuarios autenticados."""
+    return principal_cache.stats()
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import time
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.database import get_db
+from app.responses import dumps
+from app.routes.auth import resolve_principal
+from app.services import events
+from app.services.auth_service import decode_access_token
+
+router = APIRouter(tags=["events"])
+
+# Sin eventos, se envía un ping cada EVENTS_PING_INTERVAL segundos para detectar conexiones muertas
+EVENTS_PING_INTERVAL = float(os.getenv("EVENTS_PING_INTERVAL", "30"))
+
+
+async def _authenticate(websocket: WebSocket, db):
+    """
+    Principal y payload del token de acceso, enviado en la cabecera Authorization o,
+    como hacen los navegadores (que no pueden poner cabeceras en un WebSocket), en ?token=.
+    Si hay que consultar el usuario, la transacción se cierra enseguida: la conexión
+    abierta no retiene una conexión de la BD.
+    """
+    authorization = websocket.headers.get("authorization", "")
+    token = authorization[7:] if authorization.lower().startswith("bearer ") else websocket.query_params.get("token")
+    payload = decode_access_token(token) if token else None
+    if payload is None:
+        return None, None
+    try:
+        return await resolve_principal(db, payload), payload
+    finally:
+        if isinstance(db, AsyncSession):
+            await db.rollback()
+        else:
+            await run_in_threadpool(db.rollback)
+
+
+async def _receive_until_disconnect(websocket: WebSocket):
+    # El cliente no envía nada útil; leer es lo que nos entera de que se ha desconectado
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+@router.websocket("/ws/tasks")
+async def task_events(websocket: WebSocket, db=Depends(get_db)):
+    """
+    Envía en tiempo real los cambios de las tareas del usuario, como JSON:
+    {"type": "created"|"updated"|"deleted"|"changed", "cursor", "base", "tasks"?, "ids"?}.
+    Igual que con X-Sync-Base, el cliente aplica el evento si `base` es su cursor y, si no
+    (o si recibe {"type": "resync"}), pide GET /tasks/changes. La conexión se cierra al
+    caducar el token; el cliente vuelve a conectarse con uno nuevo.
+    """
+    principal, payload = await _authenticate(websocket, db)
+    if principal is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    subscription = events.broker.subscribe(principal.id)
+    receiver = asyncio.create_task(_receive_until_disconnect(websocket))
+    try:
+        while not receiver.done():
+            remaining = payload["exp"] - time.time()
+            if remaining <= 0:
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token expired")
+                break
+            getter = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {getter, receiver}, timeout=min(EVENTS_PING_INTERVAL, remaining), return_when=asyncio.FIRST_COMPLETED,
+            )
+            if getter in done:
+                await websocket.send_text(dumps(getter.result()).decode())
+                continue
+            getter.cancel()
+            if not done:
+                await websocket.send_text(dumps({"type": "ping"}).decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        events.broker.unsubscribe(subscription)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.startup import readiness
+
+router = APIRouter(tags=["health"])
+
+
+@router.get("/health")
+async def health():
+    """Liveness: el proceso responde, aunque todavía no esté listo para servir tráfico."""
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready():
+    """Readiness: 200 cuando el calentamiento del arranque ha terminado, 503 mientras tanto."""
+    return JSONResponse(readiness.status(), status_code=200 if readiness.ready else 503)
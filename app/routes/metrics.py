@@ -0,0 +1,65 @@
+import hmac
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from app import database, replicas, shards
+from app.services import pool_metrics, request_metrics, task_cache
+
+# Si se define, los endpoints de métricas exigen "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+def require_metrics_access(request: Request):
+    """
+    Los endpoints de métricas solo existen con METRICS_ENABLED (desactivado por defecto)
+    y, si hay METRICS_TOKEN, solo responden a quien lo presente.
+    """
+    if not request_metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if METRICS_TOKEN:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+            raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+
+router = APIRouter(tags=["metrics"], dependencies=[Depends(require_metrics_access)])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Métricas de peticiones, consultas SQL, pools y caché en el formato de texto de Prometheus."""
+    return PlainTextResponse(request_metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/metrics/pool")
+def pool_stats():
+    """Estado de los pools de conexiones: latencia de checkout, esperas y conexiones en uso."""
+    return {
+        "config": {
+            "pool_size": database.DB_POOL_SIZE,
+            "max_overflow": database.DB_MAX_OVERFLOW,
+            "pool_timeout": database.DB_POOL_TIMEOUT,
+            "pool_recycle": database.DB_POOL_RECYCLE,
+            "pool_pre_ping": database.DB_POOL_PRE_PING,
+            "statement_timeout_ms": database.DB_STATEMENT_TIMEOUT_MS,
+        },
+        "pools": pool_metrics.snapshot(),
+    }
+
+
+@router.get("/metrics/cache")
+def cache_stats():
+    """Caché de lecturas de tareas: aciertos por nivel, cargas agrupadas y latencias."""
+    return task_cache.cache.stats()
+
+
+@router.get("/metrics/replicas")
+def replica_stats():
+    """Réplicas de lectura: salud, retraso, lecturas servidas y lecturas desviadas al primario."""
+    return replicas.replica_set.stats()
+
+
+@router.get("/metrics/shards")
+def shard_stats():
+    """Shards configurados y caché del directorio de ubicaciones de usuarios."""
+    return shards.shard_router.stats()
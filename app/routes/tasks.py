@@ -1,51 +1,412 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import hashlib
+import os
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app import models, schemas
-from app.database import get_db
+from starlette.concurrency import iterate_in_threadpool
+from app import schemas
+from app.database import run_db
+from app import replicas
+from app.replicas import get_read_db, read_db_at
+from app.shards import get_user_db
+from app.responses import FastJSONResponse, dumps
 from app.routes.auth import get_current_user
-from app.services.task_service import update_task, delete_task
+from app.services.principal_cache import Principal
+from app.services import events, export_service, import_service, task_cache, task_service
+from app.services.query_budget import budget
+from app.services.task_service import update_task, delete_task, list_tasks, InvalidCursor
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Las páginas profundas de una búsqueda por relevancia se paginan con OFFSET: lo limitamos
+MAX_SEARCH_OFFSET = 10_000
+# Máximo de elementos por petición en los endpoints /tasks/bulk
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "500"))
+# Filas que se leen de la BD (y se envían) de una vez en GET /tasks/export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+# Filas por lote (COPY o executemany) y errores que se devuelven en POST /tasks/import
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
 
 
 router = APIRouter(tags=["tasks"])
 
 
+def _set_sync_headers(response: Response, cursor: int | None, changes: int = 1):
+    """
+    X-Sync-Cursor es el cursor tras la mutación y X-Sync-Base el anterior a ella.
+    Si X-Sync-Base coincide con el cursor del cliente, este puede aplicar la respuesta
+    localmente y avanzar; si no, hubo otros cambios y debe pedir GET /tasks/changes.
+    """
+    if cursor is not None:
+        response.headers["X-Sync-Cursor"] = str(cursor)
+        response.headers["X-Sync-Base"] = str(cursor - changes)
+
+
+def _task_entry(task) -> dict:
+    # Lo que se guarda en la caché para GET /tasks/{id}: el cuerpo ya serializado y su versión
+    return {"body": dumps(task_service.task_dict(task)).decode(), "version": task.change_seq}
+
+
+async def _publish(user_id: int, type_: str, cursor: int | None, changes: int = 1, tasks=(), ids=()):
+    """
+    Da a conocer una mutación ya confirmada: invalida la caché de lecturas del usuario
+    (guardando las tareas escritas) y la publica para las conexiones de /ws/tasks.
+    El evento lleva el mismo cursor/base que las cabeceras X-Sync-*, para que el cliente
+    sepa si puede aplicarlo directamente o debe pedir GET /tasks/changes.
+    """
+    if cursor is None:
+        return
+    # Las réplicas pueden no tener aún la escritura: el usuario lee del primario un rato
+    await replicas.replica_set.mark_write(user_id)
+    await task_cache.cache.write_through(user_id, cursor, {("task", task.id): _task_entry(task) for task in tasks})
+    event = {"type": type_, "cursor": cursor, "base": cursor - changes}
+    if tasks:
+        event["tasks"] = [task_service.task_dict(task) for task in tasks]
+    if ids:
+        event["ids"] = list(ids)
+    await events.broker.publish(user_id, event)
+
+
+def _task_etag(task_id: int, version: int) -> str:
+    return f'"t{task_id}.{version}"'
+
+
+def _query_hash(request: Request) -> str:
+    return hashlib.sha1(str(sorted(request.query_params.multi_items())).encode()).hexdigest()[:16]
+
+
+def _collection_etag(user_id: int, version: int, request: Request) -> str:
+    # La misma versión de la colección con distintos filtros o páginas da cuerpos distintos
+    return f'"c{user_id}.{version}.{_query_hash(request)}"'
+
+
+async def _user_version(db, user_id: int) -> tuple[int, int | None]:
+    """
+    Versión (change_seq) del usuario: de la caché compartida si la conoce, si no de la BD.
+    Devuelve también la versión leída de `db` (None si vino de la caché).
+    """
+    version = await task_cache.cache.version(user_id)
+    if version is not None:
+        return version, None
+    version = await run_db(db, task_service.current_change_seq, user_id)
+    await task_cache.cache.set_version(user_id, version)
+    return version, version
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Comparación débil de If-None-Match (RFC 9110), como exige un GET condicional."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+def _not_modified(etag: str, headers: dict | None = None) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "private, no-cache", **(headers or {})})
+
+
 @router.post("/", response_model=schemas.Task, status_code=201)
-def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_task = models.Task(**task.dict(), user_id=current_user.id)
-    db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
-    return db_task
+@budget(4)
+async def create_task(task: schemas.TaskCreate, response: Response, db: Session = Depends(get_user_db), current_user: Principal = Depends(get_current_user)):
+    created = await run_db(db, task_service.create_task, task.dict(), current_user)
+    _set_sync_headers(response, created.change_seq)
+    response.headers["ETag"] = _task_etag(created.id, created.change_seq)
+    await _publish(current_user.id, "created", created.change_seq, tasks=[created])
+    return created
+
+
+def _check_bulk_size(items: list):
+    if not items:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Empty batch")
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"A batch can contain at most {BULK_MAX_ITEMS} items")
+
+
+def _check_unique_ids(ids: list[int]):
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Duplicate task ids in batch")
+
+
+@router.post("/bulk", response_model=list[schemas.Task], status_code=201)
+@budget(4)
+async def bulk_create_tasks(tasks: list[schemas.TaskCreate], response: Response, db: Session = Depends(get_user_db), current_user: Principal = Depends(get_current_user)):
+    """Crea varias tareas en una sola transacción. Devuelve las tareas en el mismo orden."""
+    _check_bulk_size(tasks)
+    created = await run_db(db, task_service.bulk_create_tasks, [task.dict() for task in tasks], current_user)
+    _set_sync_headers(response, created[-1].change_seq, changes=len(created))
+    await _publish(current_user.id, "created", created[-1].change_seq, changes=len(created), tasks=created)
+    return created
+
+
+@router.patch("/bulk", response_model=list[schemas.TaskBulkUpdateResult])
+@budget(4 + task_service.RESTORE_QUERIES)
+async def bulk_update_tasks(tasks: list[schemas.TaskBulkUpdate], response: Response, db: Session = Depends(get_user_db), current_user: Principal = Depends(get_current_user)):
+    """Actualiza varias tareas en una sola transacción, con un resultado por elemento."""
+    _check_bulk_size(tasks)
+    _check_unique_ids([task.id for task in tasks])
+    items = [task.dict(exclude_unset=True) for task in tasks]
+    updated, sync_cursor = await run_db(db, task_service.bulk_update_tasks, items, current_user)
+    _set_sync_headers(response, sync_cursor)
+    await _publish(current_user.id, "updated", sync_cursor, tasks=[task for task in updated.values() if task is not None])
+    return [
+        {"id": task.id, "status": "not_found" if updated[task.id] is None else "updated", "task": updated[task.id]}
+        for task in tasks
+    ]
+
+
+@router.delete("/bulk", response_model=list[schemas.TaskBulkDeleteResult])
+@budget(4 + task_service.RESTORE_QUERIES)
+async def bulk_delete_tasks(request: schemas.TaskBulkDelete, response: Response, db: Session = Depends(get_user_db), current_user: Principal = Depends(get_current_user)):
+    """Elimina varias tareas en una sola transacción, con un resultado por elemento."""
+    _check_bulk_size(request.ids)
+    _check_unique_ids(request.ids)
+    deleted, sync_cursor = await run_db(db, task_service.bulk_delete_tasks, request.ids, current_user)
+    _set_sync_headers(response, sync_cursor)
+    await _publish(current_user.id, "deleted", sync_cursor, ids=[task_id for task_id in request.ids if task_id in deleted])
+    return [{"id": task_id, "status": "deleted" if task_id in deleted else "not_found"} for task_id in request.ids]
+
+
+@router.get("/export")
+@budget(2)
+async def export_tasks(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    include_archived: bool = True,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Descarga todas las tareas del usuario en NDJSON o CSV, en streaming (chunked):
+    las filas se leen con un cursor del servidor y se envían por lotes, así que la
+    memoria por petición es constante. Si el cliente acepta gzip, se comprime al vuelo.
+    Incluye las tareas archivadas salvo con include_archived=false.
+    """
+    if isinstance(db, AsyncSession):
+        partitions = task_service.aiter_task_rows(db.bind, current_user.id, EXPORT_CHUNK_SIZE, include_archived)
+    else:
+        partitions = iterate_in_threadpool(task_service.iter_task_rows(db.get_bind(), current_user.id, EXPORT_CHUNK_SIZE, include_archived))
+    chunks = export_service.ndjson_chunks(partitions) if format == "ndjson" else export_service.csv_chunks(partitions)
+
+    media_type, extension = export_service.FORMATS[format]
+    headers = {"Content-Disposition": f'attachment; filename="tasks.{extension}"', "Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        chunks = export_service.gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+
+@router.post("/import", response_model=schemas.TaskImportResult)
+async def import_tasks(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    db: Session = Depends(get_user_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Importa tareas desde un cuerpo NDJSON o CSV (con cabecera) enviado en streaming,
+    opcionalmente comprimido con gzip. Cada fila se valida con TaskImport según llega
+    y las válidas se insertan por lotes de IMPORT_BATCH_SIZE, cada uno en su transacción:
+    la memoria no depende del tamaño del fichero. Las filas inválidas no detienen la
+    importación; se informa de ellas (con su número de línea) en la respuesta. Un registro
+    demasiado grande, o un cuerpo gzip que descomprimido supera IMPORT_MAX_BYTES, sí la
+    detiene con un 413 (los lotes anteriores ya están guardados).
+    """
+    chunks = request.stream()
+    if request.headers.get("content-encoding", "").lower() == "gzip":
+        chunks = import_service.gunzip_chunks(chunks)
+    records = import_service.ndjson_records(chunks) if format == "ndjson" else import_service.csv_records(chunks)
+
+    result = {"imported": 0, "failed": 0, "batches": 0, "errors": [], "cursor": None}
+    batch = []
+
+    async def flush():
+        result["cursor"] = await run_db(db, task_service.import_tasks, batch, current_user)
+        # Un lote puede ser grande: se avisa del cambio y el cliente lo pide a /tasks/changes
+        await _publish(current_user.id, "changed", result["cursor"], changes=len(batch))
+        result["imported"] += len(batch)
+        result["batches"] += 1
+        batch.clear()
+
+    try:
+        async for line, record, error in records:
+            if error is None:
+                try:
+                    batch.append(schemas.TaskImport(**record).dict())
+                except ValidationError as exc:
+                    error = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+            if error is not None:
+                result["failed"] += 1
+                if len(result["errors"]) < IMPORT_MAX_ERRORS:
+                    result["errors"].append({"line": line, "error": error})
+            elif len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+    except import_service.ImportTooLarge as exc:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"{exc}; {result['imported']} tasks were imported before it",
+        )
+    if batch:
+        await flush()
+    return result
+
+
+@router.get("/search", response_model=list[schemas.Task], response_class=FastJSONResponse)
+@budget(2)
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    db: Session = Depends(get_read_db),
+    user: Principal = Depends(get_current_user),
+):
+    """
+    Busca en el título y la descripción de las tareas del usuario, por relevancia.
+    No incluye las tareas archivadas: se consultan con GET /tasks/?include_archived=true.
+    Si hay más resultados, la cabecera X-Next-Offset trae el offset de la siguiente página.
+    """
+    tasks, has_more = await run_db(db, task_service.search_tasks, user.id, q, limit, offset)
+    headers = {"X-Next-Offset": str(offset + limit)} if has_more else {}
+    return FastJSONResponse([task._asdict() for task in tasks], headers=headers)
+
+
+@router.get("/stats", response_model=schemas.TaskStats)
+@budget(3)
+async def get_stats(
+    days: int = Query(30, ge=1, le=366),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Totales, porcentaje completado e histograma de tareas creadas por día (UTC)."""
+    return await run_db(db, task_service.task_stats, current_user.id, days)
+
+
+@router.get("/changes", response_model=schemas.TaskChanges)
+@budget(2)
+async def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Devuelve las tareas creadas/modificadas y los ids borrados o archivados desde el cursor
+    `since`. El cliente guarda `cursor` para la siguiente llamada y repite mientras `has_more`.
+    """
+    changed, deleted, archived, cursor, has_more = await run_db(db, task_service.list_changes, current_user.id, since, limit)
+    return {"cursor": cursor, "has_more": has_more, "changed": changed, "deleted": deleted, "archived": archived}
 
 
 @router.get("/{task_id}", response_model=schemas.Task)
-def read_task(task_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.user_id == current_user.id).first()
+@budget(2)
+async def read_task(task_id: int, request: Request, response: Response, db: Session = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
+    # Con caché compartida la versión del usuario no cuesta una consulta y la tarea puede
+    # servirse sin tocar la BD; sin ella, leer la versión costaría lo mismo que la tarea.
+    version = await task_cache.cache.version(current_user.id)
+    if version is not None:
+        async def load():
+            read_db = await read_db_at(request, db, current_user.id, version)
+            task = await run_db(read_db, task_service.find_task, task_id, current_user)
+            return None if task is None else _task_entry(task)
+
+        entry = await task_cache.cache.get_or_load(current_user.id, version, ("task", task_id), load)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        etag = _task_etag(task_id, entry["version"])
+        if _etag_matches(request, etag):
+            return _not_modified(etag)
+        return Response(entry["body"], media_type=FastJSONResponse.media_type, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    if request.headers.get("if-none-match"):
+        # GET condicional: basta con leer la versión de la fila para responder 304
+        version = await run_db(db, task_service.get_task_version, task_id, current_user)
+        if version is not None and _etag_matches(request, _task_etag(task_id, version)):
+            return _not_modified(_task_etag(task_id, version))
+    task = await run_db(db, task_service.find_task, task_id, current_user)
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
+    response.headers["ETag"] = _task_etag(task.id, task.change_seq)
+    response.headers["Cache-Control"] = "private, no-cache"
     return task
 
 
-@router.get("/", response_model=list[schemas.Task])
-def get_tasks(db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
-    """Obtiene todas las tareas del usuario autenticado."""
-    return db.query(models.Task).filter(models.Task.user_id == user.id).all()
+@router.get("/", response_model=list[schemas.Task], response_class=FastJSONResponse)
+@budget(3)
+async def get_tasks(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    completed: bool | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    title_prefix: str | None = Query(None, max_length=200),
+    include_archived: bool = False,
+    db: Session = Depends(get_read_db),
+    user: Principal = Depends(get_current_user),
+):
+    """
+    Obtiene una página de tareas del usuario autenticado, ordenadas por creación.
+    Las completadas hace tiempo están archivadas y solo se incluyen con include_archived.
+    Si hay más resultados, la cabecera X-Next-Cursor trae el cursor de la siguiente página.
+    Cada respuesta incluye en X-Sync-Cursor el cursor para GET /tasks/changes y un ETag
+    derivado de ese cursor: si no hubo cambios, If-None-Match se responde con 304
+    leyendo solo la fila del usuario, sin tocar la tabla tasks.
+    Las filas vienen de la BD con las columnas de schemas.Task, así que se serializan
+    directamente con FastJSONResponse en lugar de validarlas una a una con pydantic.
+    Cada página ya serializada se guarda en la caché de tareas bajo esa misma versión.
+    """
+    # Se lee antes que la lista: como mucho, el cliente recibirá dos veces algún cambio
+    version, known = await _user_version(db, user.id)
+    etag = _collection_etag(user.id, version, request)
+    if _etag_matches(request, etag):
+        return _not_modified(etag, {"X-Sync-Cursor": str(version)})
+
+    async def load():
+        # La página se guarda bajo `version`: no puede venir de una réplica que vaya por detrás
+        read_db = await read_db_at(request, db, user.id, version, known)
+        try:
+            tasks, next_cursor = await run_db(
+                read_db, list_tasks, user.id, limit, cursor=cursor, completed=completed,
+                created_after=created_after, created_before=created_before, title_prefix=title_prefix,
+                include_archived=include_archived,
+            )
+        except InvalidCursor:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        return {"body": dumps([task._asdict() for task in tasks]).decode(), "next_cursor": next_cursor}
+
+    page = await task_cache.cache.get_or_load(user.id, version, ("list", _query_hash(request)), load)
+    headers = {"X-Sync-Cursor": str(version), "ETag": etag, "Cache-Control": "private, no-cache"}
+    if page["next_cursor"] is not None:
+        headers["X-Next-Cursor"] = page["next_cursor"]
+    return Response(page["body"], media_type=FastJSONResponse.media_type, headers=headers)
 
 
 @router.put("/{task_id}", response_model=schemas.Task)
-def update_task_endpoint(task_id: int, task_update: schemas.TaskUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+@budget(4 + task_service.RESTORE_QUERIES)
+async def update_task_endpoint(task_id: int, task_update: schemas.TaskUpdate, response: Response, db: Session = Depends(get_user_db), current_user: Principal = Depends(get_current_user)):
     #Convertimos el esquema a dict, excluyendo los campos que no se han enviado
     task_data = task_update.dict(exclude_unset=True)
-    updated_task = update_task(db, task_id, task_data, current_user)
+    updated_task = await run_db(db, update_task, task_id, task_data, current_user)
     if updated_task is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found or not permitted")
+    if task_data:
+        _set_sync_headers(response, updated_task.change_seq)
+        await _publish(current_user.id, "updated", updated_task.change_seq, tasks=[updated_task])
+    response.headers["ETag"] = _task_etag(updated_task.id, updated_task.change_seq)
     return updated_task
 
 
 @router.delete("/{task_id}", status_code=204)
-def delete_task_endpoint(task_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    deleted_task = delete_task(db, task_id, current_user)
-    if deleted_task is None:
+@budget(4 + task_service.RESTORE_QUERIES)
+async def delete_task_endpoint(task_id: int, response: Response, db: Session = Depends(get_user_db), current_user: Principal = Depends(get_current_user)):
+    sync_cursor = await run_db(db, delete_task, task_id, current_user)
+    if sync_cursor is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found or not permitted")
-    return None
\ No newline at end of file
+    _set_sync_headers(response, sync_cursor)
+    await _publish(current_user.id, "deleted", sync_cursor, ids=[task_id])
+    return None
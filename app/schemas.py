@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, validator
+from datetime import date, datetime
 from typing import Optional
 
 
@@ -12,6 +12,16 @@ class TaskCreate(TaskBase):
     pass
 
 
+class TaskImport(TaskCreate):
+    """Fila de POST /tasks/import: admite el estado que trae GET /tasks/export."""
+    completed: bool = False
+
+    @validator("completed", pre=True)
+    def empty_is_pending(cls, value):
+        # En CSV una columna vacía llega como ""
+        return False if value in ("", None) else value
+
+
 class TaskUpdate(TaskBase):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -25,11 +35,66 @@ class Task(TaskBase):
     id: int
     completed: bool
     created_at: datetime
+    updated_at: Optional[datetime] = None
     user_id: int
 
     class Config:
         orm_mode = True
 
+class TaskBulkUpdate(TaskUpdate):
+    id: int
+
+
+class TaskBulkDelete(BaseModel):
+    ids: list[int]
+
+
+class TaskBulkUpdateResult(BaseModel):
+    id: int
+    status: str  # "updated" | "not_found"
+    task: Optional[Task] = None
+
+
+class TaskBulkDeleteResult(BaseModel):
+    id: int
+    status: str  # "deleted" | "not_found"
+
+
+class TaskChanges(BaseModel):
+    cursor: int
+    has_more: bool
+    changed: list[Task]
+    deleted: list[int]
+    archived: list[int] = []  # Pasadas a tasks_archive: fuera de los listados por defecto
+
+
+class TaskStatsDay(BaseModel):
+    day: date
+    created: int
+    completed: int  # De las creadas ese día, las que están completadas
+
+
+class TaskStats(BaseModel):
+    total: int
+    completed: int
+    pending: int
+    completion_ratio: float
+    created_per_day: list[TaskStatsDay]
+
+
+class TaskImportError(BaseModel):
+    line: int
+    error: str
+
+
+class TaskImportResult(BaseModel):
+    imported: int
+    failed: int
+    batches: int
+    errors: list[TaskImportError]  # Los primeros IMPORT_MAX_ERRORS errores
+    cursor: Optional[int] = None  # Cursor de sincronización tras el último lote
+
+
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
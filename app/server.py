@@ -0,0 +1,182 @@
+"""
+Punto de entrada de producción: arranca varios workers de la aplicación.
+
+Con gunicorn instalado se usa gunicorn con workers de uvicorn y preload_app: la
+aplicación se importa una vez en el proceso maestro y los workers la heredan al
+hacer fork (el engine, el pool de bcrypt y las conexiones se crean después, en cada
+worker, porque son perezosos). Sin gunicorn se usa el supervisor de uvicorn, que
+importa la aplicación en cada worker. En ambos casos uvloop y httptools se usan si
+están instalados (uvicorn[standard]).
+
+El tamaño del pool de conexiones de cada worker se ajusta para que el total quede por
+debajo de DB_MAX_CONNECTIONS (el max_connections de PostgreSQL).
+
+    python -m app.server [--dry-run]
+"""
+import importlib.util
+import json
+import os
+import sys
+from sqlalchemy.engine import make_url
+from app import database
+from app.services import events
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+# Número de workers; 0 = uno por CPU
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))
+# "auto" (gunicorn si está instalado), "gunicorn" o "uvicorn"
+SERVER_BACKEND = os.getenv("SERVER_BACKEND", "auto")
+# Cada worker se reinicia tras atender este número de peticiones (más un extra aleatorio
+# de hasta el jitter, para que no se reinicien todos a la vez). 0 lo desactiva
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", "10000"))
+SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "1000"))
+# Segundos que un worker tiene para terminar las peticiones en curso al apagarse
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+SERVER_KEEPALIVE = int(os.getenv("SERVER_KEEPALIVE", "5"))
+# Conexiones que admite PostgreSQL y cuántas se dejan libres (superusuario, migraciones, psql)
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+DB_RESERVED_CONNECTIONS = int(os.getenv("DB_RESERVED_CONNECTIONS", "10"))
+
+
+def worker_count() -> int:
+    return WEB_CONCURRENCY or os.cpu_count() or 1
+
+
+def pool_sizes(workers: int, max_connections: int, reserved: int, pool_size: int, max_overflow: int,
+               extra_per_worker: int = 0) -> tuple[int, int]:
+    """
+    (pool_size, max_overflow) de cada worker para que
+    workers * (pool_size + max_overflow + extra_per_worker) <= max_connections - reserved.
+    Los valores configurados se mantienen si ya caben; si no, se recorta primero el overflow.
+    """
+    budget = (max_connections - reserved) // workers - extra_per_worker
+    if budget < 1:
+        raise ValueError(
+            f"{workers} workers need at least {workers * (extra_per_worker + 1)} connections, "
+            f"but only {max_connections - reserved} are available (DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS)"
+        )
+    pool_size = min(pool_size, budget)
+    return pool_size, min(max_overflow, budget - pool_size)
+
+
+def _extra_connections_per_worker() -> int:
+    """Conexiones que cada worker abre fuera del pool principal."""
+    extra = 0
+    if events.EVENTS_BROKER == "postgres":
+        extra += 1  # conexión dedicada a LISTEN
+    if database.DATABASE_MODE == "async":
+        extra += 1  # el warm-up comprueba el esquema con el engine síncrono
+    return extra
+
+
+def _backend() -> str:
+    if SERVER_BACKEND != "auto":
+        return SERVER_BACKEND
+    return "gunicorn" if importlib.util.find_spec("gunicorn") is not None else "uvicorn"
+
+
+def _worker_class() -> str:
+    # uvicorn.workers está obsoleto en favor del paquete uvicorn-worker
+    if importlib.util.find_spec("uvicorn_worker") is not None:
+        return "uvicorn_worker.UvicornWorker"
+    return "uvicorn.workers.UvicornWorker"
+
+
+def configure(workers: int = None) -> dict:
+    """
+    Configuración efectiva del servidor. Las variables de entorno que ajusta (pool de la BD,
+    procesos de bcrypt) se devuelven en "env" para aplicarlas antes de cargar la aplicación.
+    """
+    workers = workers or worker_count()
+    env = {}
+    if make_url(database.DATABASE_URL).get_backend_name() == "postgresql":
+        pool_size, max_overflow = pool_sizes(
+            workers, DB_MAX_CONNECTIONS, DB_RESERVED_CONNECTIONS,
+            database.DB_POOL_SIZE, database.DB_MAX_OVERFLOW, _extra_connections_per_worker(),
+        )
+        env["DB_POOL_SIZE"], env["DB_MAX_OVERFLOW"] = str(pool_size), str(max_overflow)
+    if "PASSWORD_HASH_WORKERS" not in os.environ:
+        # Los procesos de bcrypt de todos los workers se reparten las CPU
+        env["PASSWORD_HASH_WORKERS"] = str(max(1, (os.cpu_count() or 1) // workers))
+    return {
+        "backend": _backend(),
+        "bind": f"{HOST}:{PORT}",
+        "workers": workers,
+        "uvloop": importlib.util.find_spec("uvloop") is not None,
+        "httptools": importlib.util.find_spec("httptools") is not None,
+        "max_requests": SERVER_MAX_REQUESTS,
+        "max_requests_jitter": SERVER_MAX_REQUESTS_JITTER,
+        "graceful_timeout": SERVER_GRACEFUL_TIMEOUT,
+        "env": env,
+    }
+
+
+def _apply(settings: dict):
+    os.environ.update(settings["env"])
+    # app.database ya está importado en este proceso: con preload los workers heredan sus valores
+    for name in ("DB_POOL_SIZE", "DB_MAX_OVERFLOW"):
+        if name in settings["env"]:
+            setattr(database, name, int(settings["env"][name]))
+
+
+def _run_gunicorn(settings: dict):
+    from gunicorn.app.base import BaseApplication
+
+    options = {
+        "bind": settings["bind"],
+        "workers": settings["workers"],
+        "worker_class": _worker_class(),
+        "preload_app": True,
+        "max_requests": settings["max_requests"],
+        "max_requests_jitter": settings["max_requests_jitter"],
+        "graceful_timeout": settings["graceful_timeout"],
+        "keepalive": SERVER_KEEPALIVE,
+        "accesslog": "-",
+    }
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+            return app
+
+    Application().run()
+
+
+def _run_uvicorn(settings: dict):
+    import uvicorn
+
+    uvicorn.run(
+        "app.main:app",
+        host=HOST,
+        port=PORT,
+        workers=settings["workers"],
+        loop="auto",
+        http="auto",
+        limit_max_requests=settings["max_requests"] or None,
+        limit_max_requests_jitter=settings["max_requests_jitter"],
+        timeout_graceful_shutdown=settings["graceful_timeout"],
+        timeout_keep_alive=SERVER_KEEPALIVE,
+        proxy_headers=True,
+    )
+
+
+def main(argv: list[str] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    settings = configure()
+    if "--dry-run" in argv:
+        print(json.dumps(settings, indent=2))
+        return
+    _apply(settings)
+    if settings["backend"] == "gunicorn":
+        _run_gunicorn(settings)
+    else:
+        _run_uvicorn(settings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Archivado de tareas completadas antiguas: las pasa de tasks a tasks_archive por lotes,
+en la BD principal y en cada shard, para que los listados por defecto solo recorran
+las tareas activas. Se ejecuta aparte del servidor (cron o un servicio propio):
+
+    python -m app.services.archive [--older-than-days N] [--every SEGUNDOS]
+
+Con --every se repite cada N segundos en lugar de terminar.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from app.services import shard_rebalance, task_cache, task_service
+
+# Días sin modificar tras los que una tarea completada se archiva
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+# Tareas por transacción: lotes cortos para no bloquear a los usuarios afectados
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+log = logging.getLogger("app.archive")
+
+
+def _archive_batch(engine, before: datetime, batch_size: int):
+    with Session(engine) as db:
+        return task_service.archive_completed_tasks(db, before, batch_size)
+
+
+async def archive(engines: dict, older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Archiva las tareas candidatas de cada BD; devuelve cuántas se han archivado."""
+    before = datetime.utcnow() - timedelta(days=older_than_days)
+    total = 0
+    for name, engine in engines.items():
+        archived_here = 0
+        while True:
+            archived, versions = await asyncio.to_thread(_archive_batch, engine, before, batch_size)
+            if not versions:
+                break
+            # Con caché compartida, los workers ven la nueva versión sin esperar a que caduque
+            for user_id, version in versions.items():
+                await task_cache.cache.set_version(user_id, version)
+            archived_here += archived
+        if archived_here:
+            log.info("Archived %d tasks in %s", archived_here, name)
+        total += archived_here
+    return total
+
+
+async def _run(args):
+    engines = shard_rebalance.engines_from_env()
+    try:
+        while True:
+            total = await archive(engines, args.older_than_days, args.batch_size)
+            log.info("Archived %d tasks completed more than %d days ago", total, args.older_than_days)
+            if not args.every:
+                return
+            await asyncio.sleep(args.every)
+    finally:
+        for engine in engines.values():
+            engine.dispose()
+        await task_cache.cache.close()
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.services.archive")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--every", type=float, default=0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,38 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
+import hashlib
+import time
 import jwt
 import os
-from dotenv import load_dotenv
+import threading
+import uuid
+from app.services import revocations
+from app.services.ttl_cache import TTLCache
 
-#Cargar variable de entorno
-load_dotenv()
+#Factor de coste de bcrypt. Los hashes con un coste menor se actualizan al hacer login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
+#Contexto para manejar hashing de contraseñas. Se crea en el primer uso (passlib tarda en importarse)
+_pwd_context = None
+_pwd_context_lock = threading.Lock()
 
-#Contexto para manejar hashing de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def get_pwd_context():
+    """CryptContext de bcrypt, creado (e importado passlib) la primera vez que se necesita."""
+    global _pwd_context
+    if _pwd_context is None:
+        with _pwd_context_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+                _pwd_context = CryptContext(
+                    schemes=["bcrypt"], deprecated="auto",
+                    bcrypt__default_rounds=BCRYPT_ROUNDS, bcrypt__min_rounds=BCRYPT_ROUNDS,
+                )
+    return _pwd_context
+
+
+def warm_up():
+    """Crea el CryptContext y carga el backend de bcrypt, para no pagarlo en el primer login."""
+    get_pwd_context().handler("bcrypt").get_backend()
 
 
 #Clave secreta para JWT (del .env)
@@ -17,46 +40,131 @@ SECRET_KEY = os.getenv("SECRET_KEY", "clave_secreta_por_defecto")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+# Tokens ya verificados (firma + claims), indexados por un digest del token.
+# Cada entrada vive como mucho hasta el "exp" del token.
+_verified_tokens = TTLCache(TOKEN_CACHE_SIZE, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+# Los tokens revocados (logout / rotación) están en revocations.revoked hasta que caducan
 
 def hash_password(password: str) -> str:
     """Hashea una contraseña usando bcrypt."""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica si la contraseña en texto plano coincide con el hash almacenado."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    """
+    Verifica la contraseña y, si el hash usa un coste obsoleto, devuelve uno nuevo.
+    Devuelve (es_valida, nuevo_hash_o_None).
+    """
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     """Genera un token de acceso JWT."""
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire, "iat": now, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def create_refresh_token(data: dict):
     """Genera un token de refresh JWT con expiración más larga"""
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "token_type": "refresh"})
+    to_encode.update({"exp": expire, "token_type": "refresh", "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def _token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def revocation_key(token: str, payload: dict) -> str:
+    """Clave del token en la lista de revocados: su "jti" o, si no lo tiene, un digest."""
+    return payload.get("jti") or _token_digest(token).hex()
+
+
 def decode_access_token(token: str):
-    """Decodifica y verifica un token JWT."""
+    """
+    Decodifica y verifica un token JWT.
+    Los tokens ya verificados se sirven desde caché hasta su "exp", que se
+    vuelve a comprobar en cada uso; los revocados se rechazan siempre.
+    """
+    digest = _token_digest(token)
+    now = time.time()
+    payload = _verified_tokens.get(digest)
+    if payload is not None:
+        if payload["exp"] <= now:
+            _verified_tokens.pop(digest)
+            return None  # Token expirado
+        if revocation_key(token, payload) in revocations.revoked:
+            return None  # Token revocado
+        return payload
+
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.ExpiredSignatureError:
         return None  # Token expirado
     except jwt.InvalidTokenError:
         return None  # Token inválido
-    
+
+    if revocation_key(token, payload) in revocations.revoked:
+        return None  # Token revocado
+    if isinstance(payload.get("exp"), (int, float)):
+        _verified_tokens.set(digest, payload, ttl=payload["exp"] - now)
+    return payload
+
+
+def revoke_token(token: str):
+    """
+    Revoca un token (logout o rotación) en este worker y lo saca de la caché de verificados.
+    Devuelve (clave, caducidad) para guardarla con revocations.store, o None si el token
+    ya no se acepta (inválido o expirado).
+    """
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.InvalidTokenError:
+        return None
+    _verified_tokens.pop(_token_digest(token))
+    key = revocation_key(token, payload)
+    # Sin "exp" el token no caduca nunca: la revocación dura lo que un token de refresh
+    expires_at = payload.get("exp") or time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+    revocations.revoked.add(key, expires_at)
+    return key, expires_at
+
+
+def revoke_tokens(db, tokens: list[str]):
+    """Revoca los tokens en este worker y los guarda en la BD para los demás."""
+    revoked = dict(filter(None, map(revoke_token, tokens)))
+    if revoked:
+        revocations.store(db, revoked)
+
+
+def token_cache_stats() -> dict:
+    return {**_verified_tokens.stats(), "revoked": len(revocations.revoked)}
+
+
+def clear_token_cache():
+    _verified_tokens.clear()
+    revocations.revoked.clear()
+
+
 def decode_refresh_token(token: str):
-    """Decodifica y verifica un token de refresh JWT"""
+    """
+    Decodifica y verifica un token de refresh JWT. Solo consulta las revocaciones que
+    conoce este worker: POST /auth/refresh-token comprueba además la BD (revocations.is_stored).
+    """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         #Verificar token de refresh
         if payload.get("token_type") != "refresh":
             return None
+        if revocation_key(token, payload) in revocations.revoked:
+            return None #Token revocado
         return payload
     except jwt.ExpiredSignatureError:
         return None #Token expirado
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from sqlalchemy.engine import make_url
+from app.responses import dumps
+
+
+# Broker de eventos: "memory" (un solo proceso) o "postgres" (LISTEN/NOTIFY entre workers)
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "memory")
+# Eventos pendientes por conexión; si un cliente no los consume, se descartan y recibe "resync"
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+
+# Canal de NOTIFY y tamaño máximo de su payload en PostgreSQL (8000 bytes)
+NOTIFY_CHANNEL = "taskflow_task_events"
+NOTIFY_MAX_BYTES = 7900
+
+
+class Subscription:
+    """
+    Cola acotada de eventos de un usuario para una conexión.
+    Publicar nunca espera al cliente: si la cola está llena, el evento se descarta y
+    el siguiente que se lea es {"type": "resync"}, para que el cliente pida
+    GET /tasks/changes desde su cursor.
+    """
+
+    def __init__(self, user_id: int, max_size: int):
+        self.user_id = user_id
+        self._queue = asyncio.Queue(max_size)
+        self.overflowed = False
+        self.dropped = 0
+
+    def put(self, event: dict):
+        if self.overflowed:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.dropped += 1
+
+    async def get(self) -> dict:
+        if self._queue.empty() and self.overflowed:
+            # Todo lo anterior al desbordamiento ya se entregó: el resto lo cubre la resincronización
+            self.overflowed = False
+            return {"type": "resync"}
+        return await self._queue.get()
+
+
+class Broker(ABC):
+    """
+    Pub/sub de eventos de tareas por usuario. Las suscripciones son locales al proceso;
+    las subclases deciden cómo llega un evento publicado en un worker a los demás.
+    """
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def publish(self, user_id: int, event: dict):
+        """Entrega el evento a las suscripciones del usuario en todos los workers."""
+
+    def subscribe(self, user_id: int, max_size: int = None) -> Subscription:
+        subscription = Subscription(user_id, max_size or EVENTS_QUEUE_SIZE)
+        self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def _deliver(self, user_id: int, event: dict):
+        for subscription in list(self._subscriptions.get(user_id, ())):
+            subscription.put(event)
+
+    def stats(self) -> dict:
+        return {
+            "broker": type(self).__name__,
+            "users": len(self._subscriptions),
+            "subscriptions": sum(len(subs) for subs in self._subscriptions.values()),
+        }
+
+
+class InMemoryBroker(Broker):
+    """Entrega los eventos a las conexiones de este proceso (un solo worker)."""
+
+    async def publish(self, user_id: int, event: dict):
+        self._deliver(user_id, event)
+
+
+class PostgresBroker(Broker):
+    """
+    Reparte los eventos entre workers con LISTEN/NOTIFY sobre una conexión asyncpg propia.
+    Cada worker escucha el canal y entrega a sus conexiones, incluidos sus propios eventos.
+    """
+
+    def __init__(self, database_url: str):
+        super().__init__()
+        self._dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._connection = None
+        self._lock = asyncio.Lock()
+        self.publish_errors = 0
+
+    async def start(self):
+        import asyncpg
+        self._connection = await asyncpg.connect(self._dsn)
+        await self._connection.add_listener(NOTIFY_CHANNEL, self._on_notify)
+
+    async def stop(self):
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def publish(self, user_id: int, event: dict):
+        payload = dumps({"user_id": user_id, "event": event}).decode()
+        if len(payload.encode()) > NOTIFY_MAX_BYTES:
+            # No cabe en un NOTIFY: se envía sin datos y el cliente los pide a /tasks/changes
+            changed = {"type": "changed", "cursor": event.get("cursor"), "base": event.get("base")}
+            payload = dumps({"user_id": user_id, "event": changed}).decode()
+        try:
+            # Una conexión asyncpg no admite operaciones concurrentes
+            async with self._lock:
+                await self._connection.execute("SELECT pg_notify($1, $2)", NOTIFY_CHANNEL, payload)
+        except Exception:
+            # La mutación ya está confirmada: los clientes recuperan el cambio con /tasks/changes
+            self.publish_errors += 1
+
+    def _on_notify(self, connection, pid, channel, payload):
+        message = json.loads(payload)
+        self._deliver(message["user_id"], message["event"])
+
+    def stats(self) -> dict:
+        return {**super().stats(), "publish_errors": self.publish_errors}
+
+
+def create_broker() -> Broker:
+    if EVENTS_BROKER == "postgres":
+        from app.database import DATABASE_URL
+        return PostgresBroker(DATABASE_URL)
+    return InMemoryBroker()
+
+
+broker = create_broker()
@@ -0,0 +1,46 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+from app.responses import dumps
+from app.services.task_service import TASK_FIELDS
+
+# Formato -> (media type, extensión del fichero descargado)
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+async def ndjson_chunks(partitions):
+    """Un objeto JSON por línea; un bloque de bytes por cada lote de filas."""
+    async for rows in partitions:
+        yield b"".join(dumps(row._asdict()) + b"\n" for row in rows)
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def csv_chunks(partitions):
+    """CSV con cabecera; un bloque de bytes por cada lote de filas."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(TASK_FIELDS)
+    async for rows in partitions:
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Colección vacía: solo la cabecera
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def gzip_chunks(chunks, level: int = 6):
+    """Comprime al vuelo: cada bloque se emite en cuanto el compresor tiene salida."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
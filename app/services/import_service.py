@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import os
+import zlib
+
+
+# Tamaño máximo de un registro (una línea NDJSON o un registro CSV, con sus saltos de línea)
+IMPORT_MAX_RECORD_BYTES = int(os.getenv("IMPORT_MAX_RECORD_BYTES", str(1024 * 1024)))
+# Tamaño máximo del cuerpo una vez descomprimido (Content-Encoding: gzip)
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(1024 ** 3)))
+# Bytes que se descomprimen de una vez: acota la memoria aunque un trozo comprima mucho
+GUNZIP_CHUNK_SIZE = 64 * 1024
+
+
+class ImportTooLarge(ValueError):
+    """El cuerpo de la importación supera uno de los límites de tamaño (413)."""
+
+
+async def gunzip_chunks(chunks):
+    """
+    Descomprime al vuelo un cuerpo enviado con Content-Encoding: gzip, en trozos de como
+    mucho GUNZIP_CHUNK_SIZE bytes. Si el total supera IMPORT_MAX_BYTES lanza ImportTooLarge.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    total = 0
+
+    def check(data: bytes) -> bytes:
+        nonlocal total
+        total += len(data)
+        if total > IMPORT_MAX_BYTES:
+            raise ImportTooLarge(f"The decompressed body exceeds {IMPORT_MAX_BYTES} bytes")
+        return data
+
+    async for chunk in chunks:
+        while True:
+            data = check(decompressor.decompress(chunk, GUNZIP_CHUNK_SIZE))
+            if data:
+                yield data
+            # Lo que no cabía queda en unconsumed_tail; con la salida llena puede quedar más
+            chunk = decompressor.unconsumed_tail
+            if not chunk and len(data) < GUNZIP_CHUNK_SIZE:
+                break
+    yield check(decompressor.flush())
+
+
+def _record_too_large(number: int):
+    return ImportTooLarge(f"Line {number} exceeds the maximum record size of {IMPORT_MAX_RECORD_BYTES} bytes")
+
+
+async def _lines(chunks):
+    """
+    (número de línea, bytes) de cada línea del cuerpo, sin cargarlo entero en memoria.
+    Los trozos de una línea partida se guardan en una lista y se unen una sola vez; una
+    línea de más de IMPORT_MAX_RECORD_BYTES lanza ImportTooLarge sin esperar a su final.
+    """
+    parts, size = [], 0
+    number = 0
+    async for chunk in chunks:
+        start = 0
+        while (end := chunk.find(b"\n", start)) != -1:
+            if size + end - start > IMPORT_MAX_RECORD_BYTES:
+                raise _record_too_large(number + 1)
+            line = b"".join([*parts, chunk[start:end]]) if parts else chunk[start:end]
+            parts, size = [], 0
+            number += 1
+            yield number, line.rstrip(b"\r")
+            start = end + 1
+        if start < len(chunk):
+            size += len(chunk) - start
+            if size > IMPORT_MAX_RECORD_BYTES:
+                raise _record_too_large(number + 1)
+            parts.append(chunk[start:])
+    pending = b"".join(parts)
+    if pending.strip():
+        yield number + 1, pending.rstrip(b"\r")
+
+
+async def ndjson_records(chunks):
+    """Genera (línea, dict, None) por cada objeto JSON, o (línea, None, error) si no es válido."""
+    async for number, line in _lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, None, f"Invalid JSON: {exc}"
+            continue
+        if isinstance(record, dict):
+            yield number, record, None
+        else:
+            yield number, None, "Each line must be a JSON object"
+
+
+async def csv_records(chunks):
+    """
+    Como ndjson_records, para CSV con cabecera. Un campo entre comillas puede contener
+    saltos de línea: el registro termina cuando el número de comillas acumulado es par.
+    Un registro de varias líneas tampoco puede superar IMPORT_MAX_RECORD_BYTES.
+    """
+    fields = None
+    record, start, size, quotes = [], None, 0, 0
+    async for number, line in _lines(chunks):
+        if not record:
+            start, size, quotes = number, 0, 0
+        record.append(line)
+        size += len(line) + 1
+        if size > IMPORT_MAX_RECORD_BYTES:
+            raise _record_too_large(start)
+        quotes += line.count(b'"')
+        if quotes % 2:
+            continue
+        raw, record = b"\n".join(record), []
+        if not raw.strip():
+            continue
+        try:
+            row = next(csv.reader(io.StringIO(raw.decode("utf-8"))))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            yield start, None, f"Invalid CSV: {exc}"
+            continue
+        if fields is None:
+            fields = row
+        elif len(row) != len(fields):
+            yield start, None, f"Expected {len(fields)} fields, got {len(row)}"
+        else:
+            yield start, dict(zip(fields, row)), None
+    if record:
+        yield start, None, "Unterminated quoted field"
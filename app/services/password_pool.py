@@ -0,0 +1,71 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from app.services import auth_service
+
+
+#Procesos dedicados a bcrypt; con 0 se usa el threadpool por defecto (útil sin multiprocessing)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+#Máximo de operaciones en curso o en cola antes de rechazar nuevas peticiones
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(max(1, PASSWORD_HASH_WORKERS) * 8)))
+
+
+class PasswordPoolBusy(Exception):
+    """La cola de hashing está llena; el cliente debe reintentar más tarde."""
+
+
+_executor = None
+_pending = 0
+
+
+def _get_executor():
+    global _executor
+    if _executor is None and PASSWORD_HASH_WORKERS > 0:
+        # spawn evita heredar hilos y conexiones del proceso del servidor
+        _executor = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+async def _submit(fn, *args):
+    """Ejecuta fn en el pool aplicando control de admisión."""
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        raise PasswordPoolBusy()
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    """Hashea una contraseña con bcrypt fuera del event loop y del threadpool."""
+    return await _submit(auth_service.hash_password, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str):
+    """Versión asíncrona de auth_service.verify_and_update_password."""
+    return await _submit(auth_service.verify_and_update_password, plain_password, hashed_password)
+
+
+async def warm_up():
+    """Arranca los procesos del pool y prepara bcrypt en cada uno antes de la primera petición."""
+    if PASSWORD_HASH_WORKERS <= 0:
+        return await asyncio.to_thread(auth_service.warm_up)
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(_get_executor(), auth_service.warm_up) for _ in range(PASSWORD_HASH_WORKERS)))
+
+
+def stats() -> dict:
+    return {"workers": PASSWORD_HASH_WORKERS, "pending": _pending, "max_pending": PASSWORD_HASH_MAX_PENDING}
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,124 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+# Límites (en segundos) del histograma de latencia de checkout
+CHECKOUT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolMetrics:
+    """Contadores y latencias de checkout de un pool de conexiones."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.engine = None
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.checkout_seconds_sum = 0.0
+        self.checkout_seconds_max = 0.0
+        self.checkout_buckets = [0] * (len(CHECKOUT_BUCKETS) + 1)
+
+    def observe_checkout(self, seconds: float, waited: bool, timed_out: bool):
+        with self._lock:
+            self.checkout_seconds_sum += seconds
+            self.checkout_seconds_max = max(self.checkout_seconds_max, seconds)
+            for i, bound in enumerate(CHECKOUT_BUCKETS):
+                if seconds <= bound:
+                    self.checkout_buckets[i] += 1
+                    break
+            else:
+                self.checkout_buckets[-1] += 1
+            if waited:
+                self.waits += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        gauges = {}
+        if self.engine is not None:
+            pool = self.engine.pool
+            gauges = {"pool_class": type(pool).__name__, "in_use": pool.checkedout()}
+            if isinstance(pool, QueuePool):
+                gauges.update(size=pool.size(), idle=pool.checkedin(), overflow=pool.overflow(), max_overflow=pool._max_overflow)
+        timed = sum(self.checkout_buckets)
+        return {
+            **gauges,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "waits": self.waits,
+            "timeouts": self.timeouts,
+            "checkout_seconds_avg": self.checkout_seconds_sum / timed if timed else 0.0,
+            "checkout_seconds_max": self.checkout_seconds_max,
+            "checkout_seconds_buckets": dict(zip([str(b) for b in CHECKOUT_BUCKETS] + ["+Inf"], self.checkout_buckets)),
+        }
+
+
+# Métricas de todos los pools instrumentados, por nombre ("primary", ...)
+registry: dict[str, PoolMetrics] = {}
+
+
+def _instrumented(base):
+    class InstrumentedPool(base):
+        """Pool que mide cuánto tarda cada checkout y si tuvo que esperar por una conexión."""
+        metrics: PoolMetrics = None
+
+        def _do_get(self):
+            # Sin conexiones libres y sin overflow disponible, el checkout tiene que esperar
+            waited = self.checkedin() == 0 and self._max_overflow > -1 and self.overflow() >= self._max_overflow
+            start = time.perf_counter()
+            timed_out = False
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                timed_out = True
+                raise
+            finally:
+                self.metrics.observe_checkout(time.perf_counter() - start, waited, timed_out)
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+def pool_class(name: str, async_: bool = False):
+    """Clase de pool instrumentada para create_engine(poolclass=...)."""
+    cls = _instrumented(AsyncAdaptedQueuePool if async_ else QueuePool)
+    cls.metrics = registry.setdefault(name, PoolMetrics(name))
+    return cls
+
+
+def instrument(engine, name: str) -> PoolMetrics:
+    """Registra los eventos del pool de un engine (síncrono) bajo el nombre dado."""
+    metrics = registry.setdefault(name, PoolMetrics(name))
+    metrics.engine = engine
+
+    # engine.dispose() sustituye el pool; los eventos se registran en el engine para conservarlos
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts += 1
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        metrics.checkins += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
+
+    return metrics
+
+
+def snapshot() -> dict:
+    return {name: metrics.snapshot() for name, metrics in registry.items()}
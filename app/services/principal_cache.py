@@ -0,0 +1,80 @@
+import os
+import time
+from dataclasses import dataclass
+from sqlalchemy import event, inspect
+from app import models
+from app.services.ttl_cache import TTLCache
+from app.services.auth_service import ACCESS_TOKEN_EXPIRE_MINUTES
+
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+# Cada cuánto se vuelve a comprobar en la BD que el usuario sigue existiendo. Las
+# invalidaciones solo llegan al worker que hace el cambio: en los demás (o si el usuario
+# se borra desde fuera de la aplicación) un principal puede seguir valiendo hasta este TTL
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Usuario autenticado, sin sesión de base de datos asociada."""
+    id: int
+    email: str
+
+
+# Principales comprobados en la BD, indexados por el "sub" del token
+_principals = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+# Momento en que se invalidó cada sujeto. Los tokens emitidos antes de esa marca
+# ya no pueden usar el camino sin consulta; basta con guardarla mientras viva un token.
+_invalidated = TTLCache(PRINCIPAL_CACHE_SIZE * 10, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+def get(subject: str):
+    return _principals.get(subject)
+
+
+def put(principal: Principal):
+    _principals.set(principal.email, principal)
+
+
+def is_stale(payload: dict) -> bool:
+    """
+    Indica si el token es anterior a una invalidación de su sujeto (o no trae "iat"):
+    entonces no puede usar la caché y hay que comprobar el usuario en la base de datos.
+    """
+    invalidated_at = _invalidated.get(payload.get("sub"))
+    if invalidated_at is None:
+        return False
+    issued_at = payload.get("iat")
+    return issued_at is None or issued_at <= invalidated_at
+
+
+def invalidate(subject: str):
+    """Olvida el principal de un sujeto (usuario borrado, cambio de contraseña o de email)."""
+    _principals.pop(subject)
+    _invalidated.set(subject, time.time())
+
+
+def stats() -> dict:
+    return _principals.stats()
+
+
+def clear():
+    _principals.clear()
+    _invalidated.clear()
+
+
+@event.listens_for(models.User, "after_update")
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    email_history = state.attrs.email.history
+    if email_history.deleted:
+        for old_email in email_history.deleted:
+            invalidate(old_email)
+    if email_history.deleted or state.attrs.hashed_password.history.has_changes():
+        invalidate(target.email)
+
+
+@event.listens_for(models.User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    invalidate(target.email)
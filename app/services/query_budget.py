@@ -0,0 +1,128 @@
+import logging
+import os
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+
+
+# Comprobación de presupuestos en cada petición: "off", "warn" (log) o "raise" (desarrollo y tests)
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off")
+# Repeticiones de una misma sentencia en una petición a partir de las cuales se considera N+1
+NPLUSONE_THRESHOLD = int(os.getenv("NPLUSONE_THRESHOLD", "3"))
+
+log = logging.getLogger("app.query_budget")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Una petición o un bloque ejecutó más sentencias de las declaradas, o repitió una (N+1)."""
+
+
+class QueryLog:
+    """Sentencias ejecutadas dentro de un bloque o de una petición."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int = None) -> dict[str, int]:
+        """Sentencias idénticas (salvo parámetros) ejecutadas al menos `threshold` veces."""
+        threshold = threshold or NPLUSONE_THRESHOLD
+        return {statement: n for statement, n in Counter(self.statements).items() if n >= threshold}
+
+    def check(self, max_queries: int, what: str = "block", threshold: int = None):
+        """Lanza QueryBudgetExceeded si se superó el presupuesto o hay un patrón N+1."""
+        problems = []
+        if self.count > max_queries:
+            problems.append(f"{what} ran {self.count} queries (budget {max_queries})")
+        for statement, n in self.repeated(threshold).items():
+            problems.append(f"{what} ran the same statement {n} times (possible N+1): {statement[:200]}")
+        if problems:
+            listing = "\n".join(f"  {i}. {statement}" for i, statement in enumerate(self.statements, 1))
+            raise QueryBudgetExceeded("; ".join(problems) + "\n" + listing)
+
+
+_current: ContextVar[QueryLog | None] = ContextVar("query_budget_log", default=None)
+_installed_engines = set()
+
+
+def install(engine):
+    """Registra en el engine (síncrono) el evento que anota las sentencias del bloque en curso."""
+    if id(engine) in _installed_engines:
+        return
+    _installed_engines.add(id(engine))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        query_log = _current.get()
+        if query_log is not None:
+            query_log.statements.append(" ".join(statement.split()))
+
+
+class count_queries:
+    """
+    Cuenta las sentencias ejecutadas dentro del bloque (también en el threadpool y en
+    run_sync, que heredan el contexto). Con max_queries, al salir comprueba el presupuesto:
+
+        with count_queries(engine, max_queries=2) as queries:
+            client.get("/tasks/")
+    """
+
+    def __init__(self, engine=None, max_queries: int = None, threshold: int = None):
+        if engine is not None:
+            install(engine)
+        self.max_queries = max_queries
+        self.threshold = threshold
+        self.log = QueryLog()
+
+    def __enter__(self) -> QueryLog:
+        self._token = _current.set(self.log)
+        return self.log
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        if exc_type is None and self.max_queries is not None:
+            self.log.check(self.max_queries, threshold=self.threshold)
+
+
+def budget(max_queries: int):
+    """
+    Declara cuántas sentencias puede ejecutar como mucho un endpoint. El presupuesto
+    incluye la consulta del usuario que hace get_current_user si no lo tiene en caché.
+    """
+    def decorator(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    """
+    Middleware de desarrollo: compara las sentencias de cada petición con el presupuesto
+    declarado con @budget en su endpoint y avisa (QUERY_BUDGET_MODE=warn) o falla (raise).
+    """
+
+    def __init__(self, app, mode: str = None):
+        self.app = app
+        self.mode = mode or QUERY_BUDGET_MODE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        query_log = QueryLog()
+        token = _current.set(query_log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+        max_queries = getattr(getattr(scope.get("route"), "endpoint", None), "query_budget", None)
+        if max_queries is None:
+            return
+        try:
+            query_log.check(max_queries, f"{scope['method']} {scope['path']}")
+        except QueryBudgetExceeded as exc:
+            if self.mode == "raise":
+                raise
+            log.warning("%s", exc)
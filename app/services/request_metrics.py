@@ -0,0 +1,221 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from app.services import pool_metrics, task_cache
+
+
+# Si está desactivado no se instala el middleware ni los eventos de SQLAlchemy (coste cero)
+# y los endpoints /metrics* y /auth/principal-cache responden 404
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+# Sentencias que tardan al menos esto se registran en el log "app.slow_query" (0 = todas)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# Límites de los histogramas: latencia (s), tamaño de respuesta (bytes) y consultas por petición
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+slow_query_log = logging.getLogger("app.slow_query")
+
+
+class Histogram:
+    """Histograma acumulativo al estilo de Prometheus, con una serie por combinación de etiquetas."""
+
+    def __init__(self, name: str, help_: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.help = help_
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        for label_values, counts, total in series:
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip([*map(str, self.buckets), "+Inf"], counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(self.labels + ("le",), label_values + (bound,))} {cumulative}')
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def _sample(name: str, type_: str, help_: str, samples: list[tuple[tuple, tuple, float]]) -> list[str]:
+    lines = [f"# HELP {name} {help_}", f"# TYPE {name} {type_}"]
+    lines.extend(f"{name}{_labels(names, values)} {value}" for names, values, value in samples)
+    return lines
+
+
+request_duration = Histogram(
+    "taskflow_http_request_duration_seconds", "Latencia de las peticiones HTTP.",
+    ("method", "route", "status"), LATENCY_BUCKETS,
+)
+response_size = Histogram(
+    "taskflow_http_response_size_bytes", "Tamaño del cuerpo de las respuestas HTTP.",
+    ("method", "route"), SIZE_BUCKETS,
+)
+queries_per_request = Histogram(
+    "taskflow_db_queries_per_request", "Sentencias SQL ejecutadas por petición.",
+    ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+statement_duration = Histogram(
+    "taskflow_db_statement_duration_seconds", "Duración de cada sentencia SQL.",
+    ("operation",), LATENCY_BUCKETS,
+)
+in_flight = 0
+slow_queries = 0
+
+
+class RequestStats:
+    """Consultas de la petición en curso. Se comparte con el threadpool a través del contexto."""
+    __slots__ = ("scope", "queries", "query_seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+def _route_label(scope) -> str:
+    """
+    Plantilla de la ruta ("/tasks/{task_id}") y no la URL, para acotar las series.
+    Se reconstruye desde la URL y los parámetros de ruta porque, con include_router,
+    la ruta resuelta no siempre conserva el prefijo con el que se montó.
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    params = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join(f"{{{params[segment]}}}" if segment in params else segment for segment in scope["path"].split("/"))
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide latencia, tamaño de respuesta y consultas SQL de cada petición HTTP."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global in_flight
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight -= 1
+            current_request.reset(token)
+            method, route = scope["method"], _route_label(scope)
+            request_duration.observe(elapsed, method, route, str(status))
+            response_size.observe(size, method, route)
+            queries_per_request.observe(stats.queries, method, route)
+
+
+_instrumented_engines = set()
+
+
+def instrument_engine(engine):
+    """Cuenta y cronometra las sentencias de un engine (síncrono) y registra las lentas."""
+    if id(engine) in _instrumented_engines:
+        return
+    _instrumented_engines.add(id(engine))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        global slow_queries
+        elapsed = time.perf_counter() - context._metrics_started
+        words = statement.split(None, 1)
+        statement_duration.observe(elapsed, words[0].upper() if words else "")
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            slow_queries += 1
+            route = _route_label(stats.scope) if stats is not None else "-"
+            slow_query_log.warning("Slow query (%.1f ms, %s): %s", elapsed * 1000, route, " ".join(statement.split())[:1000])
+
+
+def render() -> str:
+    """Todas las métricas en el formato de texto de Prometheus."""
+    lines = []
+    for histogram in (request_duration, response_size, queries_per_request, statement_duration):
+        lines.extend(histogram.render())
+    lines += _sample("taskflow_http_requests_in_flight", "gauge", "Peticiones HTTP en curso.", [((), (), in_flight)])
+    lines += _sample("taskflow_db_slow_queries_total", "counter", f"Sentencias de al menos {SLOW_QUERY_MS:g} ms.", [((), (), slow_queries)])
+
+    pools = pool_metrics.snapshot()
+    for key, type_, help_ in (
+        ("in_use", "gauge", "Conexiones prestadas por el pool."),
+        ("checkouts", "counter", "Conexiones obtenidas del pool."),
+        ("waits", "counter", "Checkouts que tuvieron que esperar."),
+        ("timeouts", "counter", "Checkouts que agotaron pool_timeout."),
+    ):
+        samples = [(("pool",), (name,), snapshot[key]) for name, snapshot in pools.items() if key in snapshot]
+        lines += _sample(f"taskflow_db_pool_{key}" + ("_total" if type_ == "counter" else ""), type_, help_, samples)
+
+    cache = task_cache.cache.stats()
+    lines += _sample("taskflow_task_cache_hit_ratio", "gauge", "Fracción de lecturas de la caché de tareas sin carga.", [((), (), cache["hit_ratio"])])
+    lines += _sample("taskflow_task_cache_loads_total", "counter", "Cargas de la caché de tareas desde la BD.", [((), (), cache["loads"])])
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    global in_flight, slow_queries
+    for histogram in (request_duration, response_size, queries_per_request, statement_duration):
+        histogram.clear()
+    in_flight = slow_queries = 0
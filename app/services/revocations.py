@@ -0,0 +1,149 @@
+"""
+Tokens revocados (logout, rotación). La fuente de verdad es la tabla revoked_tokens de
+la BD principal, con una fila por token (su "jti") hasta que caduca. Cada worker guarda
+en memoria las revocaciones vigentes, sin límite de tamaño: una revocación no se expulsa
+antes de que caduque su token. Las de los demás workers llegan cada REVOCATION_SYNC_SECONDS.
+"""
+import asyncio
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.orm import Session
+from app import database, models
+
+
+# Segundos entre lecturas de las revocaciones de otros workers (0 las desactiva: un solo worker)
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "2"))
+# Sin sincronizar durante más de esto, los tokens de acceso se rechazan (503): mejor que
+# aceptar uno que se revocó en otro worker
+REVOCATION_MAX_LAG = float(os.getenv("REVOCATION_MAX_LAG", "30"))
+# Cada sincronización vuelve a leer las revocaciones de este margen anterior, por si
+# los relojes de los workers no coinciden o una transacción tardó en confirmarse
+SYNC_OVERLAP = timedelta(seconds=60)
+
+log = logging.getLogger("app.revocations")
+
+
+class RevocationList:
+    """Claves revocadas con la caducidad (epoch) de su token; segura entre hilos."""
+
+    def __init__(self):
+        self._expiry = {}
+        self._heap = []
+        self._lock = threading.Lock()
+        self.synced_at = None
+        self.synced_until = None
+
+    def add(self, key: str, expires_at: float):
+        now = time.time()
+        with self._lock:
+            if expires_at <= now or self._expiry.get(key, 0) >= expires_at:
+                return
+            self._expiry[key] = expires_at
+            heapq.heappush(self._heap, (expires_at, key))
+            # Solo se retiran las revocaciones cuyo token ya ha caducado
+            while self._heap and self._heap[0][0] <= now:
+                expired_at, expired = heapq.heappop(self._heap)
+                if self._expiry.get(expired) == expired_at:
+                    del self._expiry[expired]
+
+    def __contains__(self, key: str) -> bool:
+        expires_at = self._expiry.get(key)
+        return expires_at is not None and expires_at > time.time()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def clear(self):
+        with self._lock:
+            self._expiry.clear()
+            self._heap.clear()
+            self.synced_at = self.synced_until = None
+
+
+revoked = RevocationList()
+_task = None
+
+
+def store(db: Session, revocations: dict[str, float]):
+    """Guarda revocaciones {clave: caducidad (epoch)} en la BD y borra las ya caducadas."""
+    now = datetime.utcnow()
+    known = set(db.scalars(select(models.RevokedToken.jti).where(models.RevokedToken.jti.in_(revocations))))
+    rows = [
+        {"jti": key, "expires_at": datetime.utcfromtimestamp(expires_at), "revoked_at": now}
+        for key, expires_at in revocations.items() if key not in known
+    ]
+    if rows:
+        db.execute(insert(models.RevokedToken), rows)
+    db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at <= now), execution_options={"synchronize_session": False})
+    db.commit()
+
+
+def is_stored(db: Session, key: str) -> bool:
+    """Indica si la BD tiene la revocación de `key` (lo haya revocado este worker u otro)."""
+    return db.execute(select(exists().where(
+        models.RevokedToken.jti == key, models.RevokedToken.expires_at > datetime.utcnow(),
+    ))).scalar()
+
+
+def sync(db: Session, revocations: RevocationList = None):
+    """Trae a memoria las revocaciones vigentes de la BD posteriores a la última lectura."""
+    if revocations is None:
+        revocations = revoked
+    started = datetime.utcnow()
+    query = select(models.RevokedToken.jti, models.RevokedToken.expires_at).where(models.RevokedToken.expires_at > started)
+    if revocations.synced_until is not None:
+        query = query.where(models.RevokedToken.revoked_at >= revocations.synced_until - SYNC_OVERLAP)
+    for key, expires_at in db.execute(query):
+        revocations.add(key, (expires_at - datetime(1970, 1, 1)).total_seconds())
+    db.rollback()
+    revocations.synced_until = started
+    revocations.synced_at = time.monotonic()
+
+
+def is_current(revocations: RevocationList = None) -> bool:
+    """
+    Indica si la lista en memoria está al día. Sin sincronización (un solo worker) siempre
+    lo está; con ella, si la última lectura de la BD no tiene más de REVOCATION_MAX_LAG segundos.
+    """
+    if revocations is None:
+        revocations = revoked
+    if _task is None:
+        return True
+    return revocations.synced_at is not None and time.monotonic() - revocations.synced_at <= REVOCATION_MAX_LAG
+
+
+def _sync_primary():
+    with Session(database.get_engine()) as db:
+        sync(db)
+
+
+async def _sync_loop():
+    while True:
+        try:
+            await asyncio.to_thread(_sync_primary)
+        except Exception as exc:
+            log.warning("Revocation sync failed: %s: %s", type(exc).__name__, exc)
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+
+
+def start():
+    """Lanza la sincronización periódica (llamar desde el lifespan)."""
+    global _task
+    if REVOCATION_SYNC_SECONDS > 0 and _task is None:
+        _task = asyncio.create_task(_sync_loop())
+
+
+async def stop():
+    global _task
+    task, _task = _task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,241 @@
+"""
+Herramienta de administración del sharding. Se ejecuta aparte del servidor, con
+engines síncronos sobre DATABASE_URL (directorio) y DATABASE_SHARDS:
+
+    python -m app.services.shard_rebalance init                 # migra los shards y reparte los ids
+    python -m app.services.shard_rebalance status               # usuarios por shard
+    python -m app.services.shard_rebalance move <user_id> <shard>
+    python -m app.services.shard_rebalance rebalance [--dry-run] [--limit N]
+
+`rebalance` traslada a los usuarios cuyo shard según el anillo no es el actual (p. ej.
+los que siguen en la BD principal o, tras añadir un shard, ~1/N de los demás).
+Los traslados son en línea: las lecturas siguen sirviéndose y las escrituras del
+usuario solo se rechazan (503) durante la copia.
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+from sqlalchemy import create_engine, delete, func, insert, select, text
+from sqlalchemy.orm import Session
+from app import database, models, shards
+from app.services import task_service
+from app.shards import PRIMARY, SHARD_DIRECTORY_TTL, HashRing
+
+# Los ids de tareas de cada BD avanzan de SHARD_ID_STRIDE en SHARD_ID_STRIDE, cada una
+# con su resto (0 la principal, 1.. los shards), para que una tarea trasladada no
+# choque con las del destino. Admite hasta SHARD_ID_STRIDE - 1 shards
+SHARD_ID_STRIDE = int(os.getenv("SHARD_ID_STRIDE", "16"))
+COPY_BATCH_SIZE = 1000
+# Contadores que mantiene el shard de un usuario; su fila en la BD principal conserva el resto
+USER_STATE = ("change_seq", "task_count", "completed_task_count")
+# Tablas con las tareas de un usuario que se trasladan con él
+TASK_TABLES = (models.Task, models.TaskArchive)
+
+log = logging.getLogger("app.shard_rebalance")
+
+
+class MoveError(Exception):
+    """El traslado no puede hacerse o la copia no coincide con el origen."""
+
+
+def engines_from_env() -> dict:
+    """Engines síncronos de la BD principal y de cada shard, por nombre."""
+    engines = {PRIMARY: create_engine(database.DATABASE_URL)}
+    for name, url in shards.parse_shards(shards.DATABASE_SHARDS).items():
+        if name != PRIMARY:
+            engines[name] = create_engine(url)
+    return engines
+
+
+def shard_index(names: list[str], name: str) -> int:
+    return 0 if name == PRIMARY else [n for n in names if n != PRIMARY].index(name) + 1
+
+
+def _stride_task_ids(engine, index: int):
+    # Solo PostgreSQL: los shards SQLite son para pruebas
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        current = connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM tasks")).scalar()
+        start = current + 1 + (index - current - 1) % SHARD_ID_STRIDE
+        connection.execute(text(f"ALTER SEQUENCE tasks_id_seq INCREMENT BY {SHARD_ID_STRIDE} RESTART WITH {start}"))
+
+
+def init(engines: dict, names: list[str]):
+    """Aplica las migraciones en cada shard y reparte los rangos de ids de tareas."""
+    if len([name for name in names if name != PRIMARY]) >= SHARD_ID_STRIDE:
+        raise MoveError(f"At most {SHARD_ID_STRIDE - 1} shards are supported (SHARD_ID_STRIDE)")
+    for name, engine in engines.items():
+        if name != PRIMARY:
+            url = engine.url.render_as_string(hide_password=False)
+            subprocess.run([sys.executable, "-m", "alembic", "-x", f"url={url}", "upgrade", "head"], check=True)
+        _stride_task_ids(engine, shard_index(names, name))
+
+
+def placements(directory) -> dict[int, tuple[str, str | None]]:
+    """(shard, moving_to) de cada usuario; los que no están en el directorio, en la principal."""
+    with Session(directory) as db:
+        rows = db.execute(
+            select(models.User.id, models.UserShard.shard, models.UserShard.moving_to)
+            .outerjoin(models.UserShard, models.UserShard.user_id == models.User.id)
+        ).all()
+    return {user_id: (shard or PRIMARY, moving_to) for user_id, shard, moving_to in rows}
+
+
+def plan(directory, ring: HashRing, limit: int = None) -> list[tuple[int, str, str]]:
+    """Traslados (user_id, origen, destino) que dejan a cada usuario en su shard del anillo."""
+    moves = []
+    for user_id, (shard, moving_to) in sorted(placements(directory).items()):
+        target = ring.get(user_id)
+        if moving_to is None and shard != target:
+            moves.append((user_id, shard, target))
+            if limit and len(moves) >= limit:
+                break
+    return moves
+
+
+def _set_placement(directory, user_id: int, shard: str, moving_to: str | None):
+    with Session(directory) as db:
+        row = db.get(models.UserShard, user_id)
+        if row is None:
+            row = models.UserShard(user_id=user_id)
+            db.add(row)
+        row.shard, row.moving_to = shard, moving_to
+        db.commit()
+
+
+def _copy_user_data(source, target, user_id: int, target_is_primary: bool):
+    """Copia la fila del usuario y todas sus tareas (también las borradas y las archivadas) en una transacción."""
+    with Session(source) as src, Session(target) as dst:
+        user = src.get(models.User, user_id)
+        if user is None:
+            raise MoveError(f"User {user_id} not found in the source shard")
+        # Restos de un traslado anterior interrumpido
+        for model in TASK_TABLES:
+            dst.execute(delete(model).where(model.user_id == user_id))
+        existing = dst.get(models.User, user_id)
+        if existing is None:
+            if target_is_primary:
+                raise MoveError(f"User {user_id} not found in the primary database")
+            dst.add(models.User(**{column.key: getattr(user, column.key) for column in models.User.__table__.columns}))
+        else:
+            for key in USER_STATE:
+                setattr(existing, key, getattr(user, key))
+        dst.flush()
+
+        copied = 0
+        for model in TASK_TABLES:
+            if model is models.TaskArchive and target.dialect.name == "postgresql":
+                years = src.execute(select(func.extract("year", model.created_at)).where(model.user_id == user_id).distinct()).scalars()
+                task_service.ensure_archive_partitions(dst, {int(year) for year in years})
+            rows_copied = 0
+            result = src.execute(select(*model.__table__.columns).where(model.user_id == user_id).order_by(model.id).execution_options(yield_per=COPY_BATCH_SIZE))
+            for rows in result.partitions():
+                dst.execute(insert(model), [row._asdict() for row in rows])
+                rows_copied += len(rows)
+
+            expected = src.execute(select(func.count()).select_from(model).where(model.user_id == user_id)).scalar()
+            if rows_copied != expected:
+                raise MoveError(f"Copied {rows_copied} rows of {model.__tablename__} for user {user_id}, source has {expected}")
+            copied += rows_copied
+        dst.commit()
+    return copied
+
+
+def _purge_user_data(engine, user_id: int, keep_user: bool):
+    with Session(engine) as db:
+        for model in TASK_TABLES:
+            db.execute(delete(model).where(model.user_id == user_id))
+        if not keep_user:
+            db.execute(delete(models.User).where(models.User.id == user_id))
+        db.commit()
+
+
+def move_user(engines: dict, user_id: int, target: str, wait: float = SHARD_DIRECTORY_TTL) -> bool:
+    """
+    Traslada en línea las tareas de un usuario a `target`:
+
+    1. Marca el traslado en el directorio y espera `wait` (lo que los workers cachean
+       la ubicación): a partir de ahí ninguno acepta escrituras del usuario.
+    2. Copia su fila y sus tareas al destino y comprueba la copia.
+    3. Apunta el directorio al destino y vuelve a esperar, hasta que ningún worker
+       lea del origen; después borra los datos del origen.
+
+    Si falla antes del paso 3, quita la marca y los datos del origen siguen intactos.
+    Devuelve False si el usuario ya estaba en `target`.
+    """
+    directory = engines[PRIMARY]
+    if target not in engines:
+        raise MoveError(f"Unknown shard {target!r}")
+    source, moving_to = placements(directory).get(user_id, (None, None))
+    if source is None:
+        raise MoveError(f"User {user_id} does not exist")
+    if moving_to is not None and moving_to != target:
+        raise MoveError(f"User {user_id} is already being moved to {moving_to!r}")
+    if source == target:
+        return False
+
+    _set_placement(directory, user_id, source, target)
+    try:
+        time.sleep(wait)
+        copied = _copy_user_data(engines[source], engines[target], user_id, target == PRIMARY)
+    except Exception:
+        _set_placement(directory, user_id, source, None)
+        raise
+    _set_placement(directory, user_id, target, None)
+    time.sleep(wait)
+    _purge_user_data(engines[source], user_id, keep_user=source == PRIMARY)
+    log.info("Moved user %s from %s to %s (%d tasks)", user_id, source, target, copied)
+    return True
+
+
+def status(engines: dict) -> dict[str, int]:
+    counts = {name: 0 for name in engines}
+    for shard, _ in placements(engines[PRIMARY]).values():
+        counts[shard] = counts.get(shard, 0) + 1
+    return counts
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.services.shard_rebalance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init")
+    commands.add_parser("status")
+    move = commands.add_parser("move")
+    move.add_argument("user_id", type=int)
+    move.add_argument("shard")
+    rebalance = commands.add_parser("rebalance")
+    rebalance.add_argument("--dry-run", action="store_true")
+    rebalance.add_argument("--limit", type=int)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    router = shards.shard_router
+    if not router.enabled:
+        parser.error("DATABASE_SHARDS is not configured")
+    engines = engines_from_env()
+    try:
+        if args.command == "init":
+            init(engines, router.names)
+        elif args.command == "status":
+            for name, count in status(engines).items():
+                print(f"{name:<20} {count:>10} users")
+        elif args.command == "move":
+            move_user(engines, args.user_id, args.shard)
+        else:
+            moves = plan(engines[PRIMARY], router.ring, args.limit)
+            for user_id, source, target in moves:
+                print(f"user {user_id}: {source} -> {target}")
+                if not args.dry_run:
+                    move_user(engines, user_id, target)
+            print(f"{len(moves)} users {'to move' if args.dry_run else 'moved'}")
+    finally:
+        for engine in engines.values():
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
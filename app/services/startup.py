@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from sqlalchemy import text
+from app import database
+from app.services import password_pool
+
+
+# Calentamiento en segundo plano al arrancar (conexión a la BD, esquema, bcrypt).
+# Desactivado, el servidor se declara listo en cuanto arranca el lifespan.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes")
+# Comprobación de la versión del esquema frente a las migraciones de Alembic:
+# "off", "warn" (solo log) o "strict" (no se declara listo hasta que el esquema esté al día)
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "warn")
+# Segundos entre reintentos si la BD no responde o el esquema no está al día (modo strict)
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+log = logging.getLogger("app.startup")
+
+
+class SchemaOutOfDate(Exception):
+    """La revisión de la BD no coincide con la última migración de Alembic."""
+
+
+class Readiness:
+    """Estado del calentamiento: /ready responde 200 solo cuando `ready` es cierto."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.ready = False
+        self.checks = {}
+        self.error = None
+        self.attempts = 0
+        self.started = time.perf_counter()
+        self.warmup_seconds = None
+        self._task = None
+
+    def mark_ready(self):
+        self.ready = True
+        self.error = None
+        self.warmup_seconds = time.perf_counter() - self.started
+
+    def status(self) -> dict:
+        return {
+            "status": "ready" if self.ready else "starting",
+            "checks": self.checks,
+            "error": self.error,
+            "attempts": self.attempts,
+            "warmup_ms": None if self.warmup_seconds is None else round(self.warmup_seconds * 1000, 1),
+        }
+
+
+readiness = Readiness()
+
+
+@lru_cache(maxsize=1)
+def head_revision() -> str | None:
+    """Última revisión de las migraciones (se lee una vez de migrations/versions)."""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+def current_revision(connection) -> str | None:
+    """Revisión aplicada en la BD según la tabla alembic_version, o None si no existe."""
+    try:
+        return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except Exception:
+        # Sin la tabla (BD sin migrar); en PostgreSQL hay que deshacer la transacción abortada
+        connection.rollback()
+        return None
+
+
+def check_database(engine=None, mode: str = None) -> dict:
+    """
+    Abre una conexión (que queda en el pool) y compara la revisión del esquema con la
+    de las migraciones. En modo strict, un esquema desfasado lanza SchemaOutOfDate.
+    """
+    engine = engine or database.get_engine()
+    mode = mode or SCHEMA_CHECK
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        if mode == "off":
+            return {"database": "ok"}
+        current, head = current_revision(connection), head_revision()
+    schema = {"current": current, "head": head, "up_to_date": current == head}
+    if current != head:
+        message = f"Database schema is at revision {current}, migrations are at {head}; run `alembic upgrade head`"
+        if mode == "strict":
+            raise SchemaOutOfDate(message)
+        log.warning("%s", message)
+    return {"database": "ok", "schema": schema}
+
+
+async def _warm_async_engine():
+    async with database.get_async_engine().connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+async def warm_up(state: Readiness = None):
+    """Calienta conexiones, esquema y bcrypt; reintenta hasta conseguirlo y marca el servidor como listo."""
+    state = state or readiness
+    while True:
+        state.attempts += 1
+        try:
+            state.checks.update(await asyncio.to_thread(check_database))
+            if database.DATABASE_MODE == "async":
+                await _warm_async_engine()
+            await password_pool.warm_up()
+            state.checks["password_hashing"] = "ok"
+            state.mark_ready()
+            log.info("Ready after %.0f ms", state.warmup_seconds * 1000)
+            return
+        except Exception as exc:
+            state.error = f"{type(exc).__name__}: {exc}"
+            log.warning("Warm-up failed (attempt %d), retrying in %g s: %s", state.attempts, WARMUP_RETRY_SECONDS, state.error)
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+
+
+def start(state: Readiness = None):
+    """Lanza el calentamiento sin bloquear el arranque (llamar desde el lifespan)."""
+    state = state or readiness
+    state.reset()
+    if not STARTUP_WARMUP:
+        state.mark_ready()
+        return
+    state._task = asyncio.create_task(warm_up(state))
+
+
+async def stop(state: Readiness = None):
+    state = state or readiness
+    task, state._task = state._task, None
+    state.ready = False
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
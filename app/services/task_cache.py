@@ -0,0 +1,226 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from app.responses import dumps
+from app.services.ttl_cache import TTLCache
+
+
+# Entradas en la caché local de cada worker (0 la desactiva) y su duración en segundos
+TASK_CACHE_SIZE = int(os.getenv("TASK_CACHE_SIZE", "10000"))
+TASK_CACHE_TTL = float(os.getenv("TASK_CACHE_TTL", "60"))
+# Caché compartida entre workers: "" (ninguna), "memory" (sustituto local, para pruebas) o una URL redis://
+TASK_CACHE_SHARED = os.getenv("TASK_CACHE_SHARED", "")
+
+# Resultado de una carga cuya petición se canceló: quien la esperaba carga por su cuenta
+_HANDOVER = object()
+
+
+class MemoryBackend:
+    """
+    Sustituto en proceso de la caché compartida, con la misma interfaz que RedisBackend.
+    Todos los TaskCache del proceso que lo usen se comportan como workers distintos.
+    """
+
+    def __init__(self, maxsize: int = 100_000):
+        self._data = TTLCache(maxsize, TASK_CACHE_TTL)
+        self._lock = threading.Lock()
+
+    async def get(self, key: str):
+        return self._data.get(key)
+
+    async def set(self, key: str, value, ttl: float):
+        self._data.set(key, value, ttl)
+
+    async def set_max(self, key: str, value: int, ttl: float):
+        with self._lock:
+            current = self._data.get(key)
+            if current is None or current < value:
+                self._data.set(key, value, ttl)
+
+    async def close(self):
+        pass
+
+
+class RedisBackend:
+    """Caché compartida en Redis (requiere el paquete redis). Los valores se guardan como JSON."""
+
+    # Solo sube el valor: una versión leída de la BD antes de una escritura no pisa la nueva
+    _SET_MAX = """
+    local current = tonumber(redis.call('GET', KEYS[1]))
+    if current == nil or current < tonumber(ARGV[1]) then
+        redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    end
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio
+        self._redis = redis.asyncio.from_url(url)
+        self._set_max = self._redis.register_script(self._SET_MAX)
+
+    async def get(self, key: str):
+        value = await self._redis.get(key)
+        return None if value is None else json.loads(value)
+
+    async def set(self, key: str, value, ttl: float):
+        await self._redis.set(key, dumps(value), px=int(ttl * 1000))
+
+    async def set_max(self, key: str, value: int, ttl: float):
+        await self._set_max(keys=[key], args=[value, int(ttl * 1000)])
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class TaskCache:
+    """
+    Caché de lecturas de tareas en dos niveles: un LRU local por worker y, opcionalmente,
+    una caché compartida. Las claves incluyen la versión del usuario (users.change_seq),
+    así que una escritura invalida todas sus entradas sin borrarlas: basta con publicar
+    la nueva versión, y las entradas antiguas caducan o las expulsa el LRU.
+
+    La versión vive en la caché compartida; sin ella hay que leerla de la BD, por lo que
+    solo compensa cachear consultas más caras que esa lectura (los listados).
+    Las cargas concurrentes de una misma clave en un worker se agrupan en una sola.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, shared=None):
+        self.ttl = ttl
+        self.shared = shared
+        self._local = TTLCache(maxsize, ttl)
+        self._inflight = {}
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.coalesced = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.lookup_seconds = 0.0
+        self.lookups = 0
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        return f"tasks:{user_id}:version"
+
+    @staticmethod
+    def _entry_key(user_id: int, version: int, key: tuple) -> str:
+        return ":".join(["tasks", str(user_id), str(version), *map(str, key)])
+
+    async def version(self, user_id: int):
+        """Versión del usuario según la caché compartida, o None si no se conoce."""
+        if self.shared is None:
+            return None
+        return await self.shared.get(self._version_key(user_id))
+
+    async def set_version(self, user_id: int, version: int):
+        """Publica una versión del usuario; nunca la hace retroceder."""
+        if self.shared is not None:
+            await self.shared.set_max(self._version_key(user_id), version, self.ttl)
+
+    async def get_or_load(self, user_id: int, version: int, key: tuple, loader):
+        """
+        Valor de `key` para la versión dada del usuario; si no está en ningún nivel,
+        lo calcula `await loader()`. Un resultado None (p. ej. 404) no se guarda.
+        Si se cancela la petición que está cargando, una de las que esperaban ese mismo
+        valor toma el relevo con su propio loader (y su propia sesión).
+        """
+        entry_key = self._entry_key(user_id, version, key)
+        started = time.perf_counter()
+        try:
+            while True:
+                value = self._local.get(entry_key)
+                if value is not None:
+                    return value
+                inflight = self._inflight.get(entry_key)
+                if inflight is None:
+                    break
+                value = await asyncio.shield(inflight)
+                if value is not _HANDOVER:
+                    self.coalesced += 1
+                    return value
+        finally:
+            self.lookups += 1
+            self.lookup_seconds += time.perf_counter() - started
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[entry_key] = future
+        try:
+            value = await self.shared.get(entry_key) if self.shared is not None else None
+            if value is not None:
+                self.shared_hits += 1
+            else:
+                if self.shared is not None:
+                    self.shared_misses += 1
+                started = time.perf_counter()
+                value = await loader()
+                self.loads += 1
+                self.load_seconds += time.perf_counter() - started
+                if value is not None and self.shared is not None:
+                    await self.shared.set(entry_key, value, self.ttl)
+            if value is not None:
+                self._local.set(entry_key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.set_result(_HANDOVER)
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Si nadie más esperaba esta carga, evita el aviso de excepción no recuperada
+            future.exception()
+            raise
+        finally:
+            del self._inflight[entry_key]
+
+    async def write_through(self, user_id: int, version: int, entries: dict):
+        """
+        Tras una escritura confirmada en `version`, publica esa versión (lo que invalida
+        las entradas anteriores del usuario en todos los workers) y guarda directamente
+        los valores ya conocidos, p. ej. las tareas recién creadas o modificadas.
+        """
+        for key, value in entries.items():
+            entry_key = self._entry_key(user_id, version, key)
+            self._local.set(entry_key, value)
+            if self.shared is not None:
+                await self.shared.set(entry_key, value, self.ttl)
+        await self.set_version(user_id, version)
+
+    def stats(self) -> dict:
+        local = self._local.stats()
+        hits = local["hits"] + self.shared_hits + self.coalesced
+        return {
+            "local": local,
+            "shared": None if self.shared is None else {
+                "backend": type(self.shared).__name__,
+                "hits": self.shared_hits,
+                "misses": self.shared_misses,
+            },
+            "hit_ratio": hits / self.lookups if self.lookups else 0.0,
+            "coalesced": self.coalesced,
+            "loads": self.loads,
+            "avg_load_ms": 1000 * self.load_seconds / self.loads if self.loads else 0.0,
+            "avg_lookup_ms": 1000 * self.lookup_seconds / self.lookups if self.lookups else 0.0,
+        }
+
+    async def close(self):
+        if self.shared is not None:
+            await self.shared.close()
+
+    def clear(self):
+        self._local.clear()
+        self._inflight.clear()
+        self.shared_hits = self.shared_misses = self.coalesced = self.loads = self.lookups = 0
+        self.load_seconds = self.lookup_seconds = 0.0
+
+
+def create_cache() -> TaskCache:
+    if TASK_CACHE_SHARED == "memory":
+        shared = MemoryBackend()
+    elif TASK_CACHE_SHARED:
+        shared = RedisBackend(TASK_CACHE_SHARED)
+    else:
+        shared = None
+    return TaskCache(TASK_CACHE_SIZE, TASK_CACHE_TTL, shared)
+
+
+cache = create_cache()
@@ -1,42 +1,726 @@
+import base64
+import io
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import case, cast, column, delete, exists, false, func, insert, literal, literal_column, or_, select, table, text, true, tuple_, union_all, update
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
 from app import models
+from app.services.principal_cache import Principal
 
 
-def update_task(db:Session, task_id: int, task_data: dict, current_user:models.User):
+class InvalidCursor(ValueError):
+    """El cursor de paginación recibido no se puede decodificar."""
+
+
+def encode_cursor(task: models.Task) -> str:
+    """Codifica la posición (created_at, id) de una tarea como cursor opaco."""
+    raw = f"{task.created_at.isoformat()}|{task.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Decodifica un cursor generado por encode_cursor en (created_at, id)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, task_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(task_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Las tareas borradas se conservan como lápidas para GET /tasks/changes
+_active = models.Task.deleted_at.is_(None)
+
+
+# Columnas de schemas.Task: los listados se leen como tuplas, sin objetos ORM
+TASK_COLUMNS = (
+    models.Task.id,
+    models.Task.title,
+    models.Task.description,
+    models.Task.completed,
+    models.Task.created_at,
+    models.Task.updated_at,
+    models.Task.user_id,
+)
+TASK_FIELDS = [column.key for column in TASK_COLUMNS]
+
+
+def task_dict(task) -> dict:
+    """Tarea (entidad ORM o fila) como diccionario con los campos de schemas.Task."""
+    return {field: getattr(task, field) for field in TASK_FIELDS}
+
+
+def _returning_supported(db: Session, kind: str) -> bool:
+    """Indica si el dialecto soporta INSERT/UPDATE ... RETURNING (SQLite < 3.35 no)."""
+    dialect = db.get_bind().dialect
+    return {
+        "insert": dialect.insert_executemany_returning_sort_by_parameter_order,
+        "update": dialect.update_returning,
+    }[kind]
+
+
+def _detach(db: Session, objects):
+    """
+    Saca los objetos de la sesión antes del commit para que no caduquen:
+    así se pueden serializar sin volver a consultarlos uno a uno.
+    """
+    for obj in objects:
+        db.expunge(obj)
+    return objects
+
+
+# Opciones de las sentencias UPDATE ... RETURNING: no sincronizamos la sesión
+# (ya tenemos las filas devueltas) y sobrescribimos cualquier copia en memoria.
+_DML_OPTIONS = {"synchronize_session": False, "populate_existing": True}
+
+
+def _next_change_seq(db: Session, user_id: int, count: int = 1, tasks: int = 0, completed: int = 0) -> int:
+    """
+    Reserva `count` posiciones de la secuencia de cambios del usuario y devuelve la última.
+    El UPDATE bloquea la fila del usuario hasta el commit, así que los cambios de un
+    mismo usuario se confirman en el orden de su secuencia.
+    Si ya se conocen, aplica en la misma sentencia las variaciones de los contadores.
+    """
+    stmt = update(models.User).where(models.User.id == user_id).values(
+        change_seq=models.User.change_seq + count,
+        task_count=models.User.task_count + tasks,
+        completed_task_count=models.User.completed_task_count + completed,
+    )
+    if _returning_supported(db, "update"):
+        return db.execute(stmt.returning(models.User.change_seq), execution_options=_DML_OPTIONS).scalar_one()
+    db.execute(stmt, execution_options={"synchronize_session": False})
+    return db.query(models.User.change_seq).filter(models.User.id == user_id).scalar()
+
+
+def _adjust_counters(db: Session, user_id: int, tasks: int = 0, completed: int = 0):
+    """Aplica variaciones de los contadores de tareas del usuario (en la transacción actual)."""
+    if tasks or completed:
+        db.execute(
+            update(models.User).where(models.User.id == user_id).values(
+                task_count=models.User.task_count + tasks,
+                completed_task_count=models.User.completed_task_count + completed,
+            ),
+            execution_options={"synchronize_session": False},
+        )
+
+
+def _update_returning(db: Session, scope, values: dict):
+    """
+    UPDATE ... RETURNING de las tareas de scope. Devuelve (tareas, variación de completadas).
+    Si cambia completed, el valor anterior se lee en la misma sentencia desde una CTE
+    materializada, que se evalúa antes de modificar las filas.
+    """
+    stmt = update(models.Task).where(*scope).values(**values)
+    if "completed" not in values:
+        return db.scalars(stmt.returning(models.Task), execution_options=_DML_OPTIONS).all(), 0
+    old = select(models.Task.id, models.Task.completed).where(*scope).cte("old_tasks").prefix_with("MATERIALIZED")
+    was_completed = select(old.c.completed).where(old.c.id == models.Task.id).scalar_subquery()
+    rows = db.execute(
+        stmt.add_cte(old).where(models.Task.id.in_(select(old.c.id))).returning(models.Task, was_completed),
+        execution_options=_DML_OPTIONS,
+    ).all()
+    return [task for task, _ in rows], sum(int(bool(task.completed)) - int(bool(was)) for task, was in rows)
+
+
+def current_change_seq(db: Session, user_id: int) -> int:
+    """Cursor de sincronización actual del usuario (solo lee la tabla users)."""
+    return db.query(models.User.change_seq).filter(models.User.id == user_id).scalar() or 0
+
+
+# Sentencias de más en una escritura que encuentra tareas archivadas: el intento fallido
+# sobre tasks, el INSERT ... SELECT y el DELETE de _restore_archived
+RESTORE_QUERIES = 3
+
+
+def _restore_archived(db: Session, user_id: int, task_ids: list[int], seq: int) -> int:
+    """
+    Devuelve a tasks las tareas archivadas de task_ids para que se puedan modificar
+    (tasks_archive es de solo lectura), con la posición `seq` de la secuencia: GET
+    /tasks/changes las vuelve a dar como activas. Se llama después de _next_change_seq,
+    con la fila del usuario ya bloqueada, como en el archivado. Los contadores no
+    cambian: ya incluían las archivadas. Devuelve cuántas tareas se han movido.
+    """
+    if not task_ids:
+        return 0
+    archive = models.TaskArchive
+    scope = (archive.user_id == user_id, archive.id.in_(task_ids))
+    columns = [literal(seq) if field == "change_seq" else getattr(archive, field) for field in ARCHIVE_FIELDS]
+    moved = db.execute(insert(models.Task).from_select(ARCHIVE_FIELDS, select(*columns).where(*scope))).rowcount
+    if moved:
+        db.execute(delete(archive).where(*scope), execution_options={"synchronize_session": False})
+    return moved
+
+
+def create_task(db: Session, task_data: dict, current_user: Principal):
+    """Crea una tarea para el usuario autenticado y la devuelve."""
+    seq = _next_change_seq(db, current_user.id, tasks=1, completed=int(bool(task_data.get("completed"))))
+    task = models.Task(**task_data, user_id=current_user.id, change_seq=seq)
+    db.add(task)
+    db.commit()
+    db.refresh(task)
+    return task
+
+
+def get_task(db: Session, task_id: int, current_user: Principal):
+    """Devuelve la tarea si existe y pertenece al usuario autenticado, o None."""
+    return db.query(models.Task).filter(
+        models.Task.id == task_id,
+        models.Task.user_id == current_user.id,
+        _active,
+    ).first()
+
+
+def get_task_version(db: Session, task_id: int, current_user: Principal):
+    """
+    Posición de la tarea en la secuencia de cambios (su versión), o None si no existe.
+    Como find_task, busca también entre las archivadas.
+    """
+    archive = models.TaskArchive
+    return db.execute(union_all(
+        select(models.Task.change_seq).where(models.Task.id == task_id, models.Task.user_id == current_user.id, _active),
+        select(archive.change_seq).where(archive.id == task_id, archive.user_id == current_user.id),
+    )).scalar()
+
+
+def find_task(db: Session, task_id: int, current_user: Principal):
+    """
+    Tarea del usuario para GET /tasks/{id}: la activa o, si se archivó, su copia en
+    tasks_archive, con una sola consulta. Fila con TASK_COLUMNS y change_seq, o None.
+    """
+    archive = models.TaskArchive
+    return db.execute(union_all(
+        select(*TASK_COLUMNS, models.Task.change_seq).where(models.Task.id == task_id, models.Task.user_id == current_user.id, _active),
+        select(*(getattr(archive, field) for field in TASK_FIELDS), archive.change_seq).where(archive.id == task_id, archive.user_id == current_user.id),
+    )).first()
+
+
+def _list_filters(model, cursor: str | None, completed: bool | None, created_after: datetime | None,
+                  created_before: datetime | None, title_prefix: str | None) -> list:
+    """Condiciones de GET /tasks/ sobre `model` (tasks o tasks_archive, con las mismas columnas)."""
+    filters = []
+    if cursor is not None:
+        created_at, task_id = decode_cursor(cursor)
+        filters.append(tuple_(model.created_at, model.id) > tuple_(created_at, task_id))
+    if completed is not None:
+        filters.append(model.completed == completed)
+    if created_after is not None:
+        filters.append(model.created_at >= created_after)
+    if created_before is not None:
+        filters.append(model.created_at < created_before)
+    if title_prefix:
+        filters.append(model.title.like(_escape_like(title_prefix) + "%", escape="\\"))
+    return filters
+
+
+def list_tasks(db: Session, user_id: int, limit: int, cursor: str | None = None,
+               completed: bool | None = None, created_after: datetime | None = None,
+               created_before: datetime | None = None, title_prefix: str | None = None,
+               include_archived: bool = False):
+    """
+    Devuelve una página de tareas del usuario ordenada por (created_at, id).
+    La paginación es por cursor (keyset) sobre el índice (user_id, created_at, id),
+    así que el coste de cada página no depende de lo profundo que esté el cursor.
+    Solo lee la tabla tasks; con include_archived también tasks_archive: cada tabla
+    aporta su propia página por su índice y se mezclan en una única consulta.
+    Las tareas se devuelven como filas con las columnas de TASK_COLUMNS (no entidades ORM).
+    Devuelve (tareas, siguiente_cursor); siguiente_cursor es None en la última página.
+    """
+    filters = (cursor, completed, created_after, created_before, title_prefix)
+    stmt = select(*TASK_COLUMNS).where(models.Task.user_id == user_id, _active, *_list_filters(models.Task, *filters))
+    if include_archived:
+        archive = models.TaskArchive
+        archived = select(*(getattr(archive, field) for field in TASK_FIELDS)).where(
+            archive.user_id == user_id, *_list_filters(archive, *filters),
+        )
+        pages = [
+            select(page) for page in (
+                stmt.order_by(models.Task.created_at, models.Task.id).limit(limit + 1).subquery(),
+                archived.order_by(archive.created_at, archive.id).limit(limit + 1).subquery(),
+            )
+        ]
+        merged = union_all(*pages).subquery()
+        stmt = select(merged).order_by(merged.c.created_at, merged.c.id)
+    else:
+        stmt = stmt.order_by(models.Task.created_at, models.Task.id)
+
+    # Pedimos una fila de más para saber si hay otra página sin hacer un COUNT
+    tasks = db.execute(stmt.limit(limit + 1)).all()
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        return tasks, encode_cursor(tasks[-1])
+    return tasks, None
+
+
+def _export_statement(user_id: int, include_archived: bool):
+    stmt = select(*TASK_COLUMNS).where(models.Task.user_id == user_id, _active)
+    if include_archived:
+        archive = models.TaskArchive
+        merged = union_all(
+            stmt, select(*(getattr(archive, field) for field in TASK_FIELDS)).where(archive.user_id == user_id),
+        ).subquery()
+        return select(merged).order_by(merged.c.created_at, merged.c.id)
+    return stmt.order_by(models.Task.created_at, models.Task.id)
+
+
+def iter_task_rows(bind, user_id: int, chunk_size: int, include_archived: bool = True):
+    """
+    Genera todas las tareas del usuario (también las archivadas, salvo include_archived=False)
+    en lotes de chunk_size filas (TASK_COLUMNS), leyendo de un cursor del servidor
+    (yield_per activa stream_results): la memoria no depende del número de tareas. Usa
+    una sesión propia, que vive lo que dure el recorrido y no lo que dure la petición.
+    """
+    with Session(bind) as db:
+        result = db.execute(_export_statement(user_id, include_archived), execution_options={"yield_per": chunk_size})
+        yield from result.partitions()
+
+
+async def aiter_task_rows(bind, user_id: int, chunk_size: int, include_archived: bool = True):
+    """Versión asíncrona de iter_task_rows para el modo DATABASE_MODE=async."""
+    async with AsyncSession(bind) as db:
+        result = await db.stream(_export_statement(user_id, include_archived), execution_options={"yield_per": chunk_size})
+        async for rows in result.partitions():
+            yield rows
+
+
+# Objetos de búsqueda creados por DDL (ver models.SEARCH_CONFIG), fuera del modelo ORM
+_search_vector = literal_column("tasks.search_vector")
+_tasks_fts = table("tasks_fts", column("rowid"))
+
+
+def _fts5_query(user_id: int, terms: list[str]) -> str:
+    # Los términos van entre comillas para que no se interpreten como sintaxis de FTS5
+    phrases = " AND ".join(f'"{term}"' for term in terms)
+    return f"owner:u{user_id} AND {{title description}}:({phrases})"
+
+
+def search_tasks(db: Session, user_id: int, q: str, limit: int, offset: int = 0):
+    """
+    Busca tareas del usuario por título y descripción, ordenadas por relevancia.
+    PostgreSQL usa la columna search_vector (índice GIN con user_id) y SQLite la tabla
+    FTS5 tasks_fts (con el dueño como token); en ambos casos el filtro por usuario se
+    resuelve dentro del índice. Las tareas archivadas no tienen índice de búsqueda y no
+    se buscan. Devuelve (filas con TASK_COLUMNS, hay_mas).
+    """
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return [], False
+
+    query = select(*TASK_COLUMNS).where(models.Task.user_id == user_id, _active)
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        tsquery = func.websearch_to_tsquery(cast(literal(models.SEARCH_CONFIG), REGCONFIG), q)
+        query = query.where(_search_vector.op("@@")(tsquery)).order_by(
+            func.ts_rank_cd(_search_vector, tsquery).desc(), models.Task.id,
+        )
+    elif dialect == "sqlite":
+        query = query.join(_tasks_fts, _tasks_fts.c.rowid == models.Task.id).where(
+            text("tasks_fts MATCH :match").bindparams(match=_fts5_query(user_id, terms)),
+        ).order_by(text("bm25(tasks_fts, 10.0, 5.0, 0.0)"), models.Task.id)
+    else:
+        # Sin índice de texto: cada término tiene que aparecer en el título o en la descripción
+        for term in terms:
+            pattern = f"%{_escape_like(term)}%"
+            query = query.where(or_(
+                models.Task.title.ilike(pattern, escape="\\"),
+                models.Task.description.ilike(pattern, escape="\\"),
+            ))
+        query = query.order_by(models.Task.created_at, models.Task.id)
+
+    rows = db.execute(query.limit(limit + 1).offset(offset)).all()
+    return rows[:limit], len(rows) > limit
+
+
+def _change_rows(user_id: int, where, limit: int = None):
+    """
+    Tareas de tasks y tasks_archive del usuario que cumplen where(modelo), con las columnas
+    de TASK_COLUMNS, change_seq y las marcas deleted y archived. Con `limit`, cada tabla
+    aporta solo sus primeras filas por (change_seq, id), que lee de su índice.
+    """
+    archive = models.TaskArchive
+    parts = [
+        select(*TASK_COLUMNS, models.Task.change_seq, models.Task.deleted_at.is_not(None).label("deleted"), false().label("archived"))
+        .where(models.Task.user_id == user_id, where(models.Task)),
+        select(*(getattr(archive, field) for field in TASK_FIELDS), archive.change_seq, false().label("deleted"), true().label("archived"))
+        .where(archive.user_id == user_id, where(archive)),
+    ]
+    if limit is not None:
+        parts = [
+            select(part.order_by(model.change_seq, model.id).limit(limit).subquery())
+            for part, model in zip(parts, (models.Task, archive))
+        ]
+    return union_all(*parts).subquery()
+
+
+def list_changes(db: Session, user_id: int, since: int, limit: int):
+    """
+    Devuelve los cambios del usuario posteriores al cursor `since`, en orden de secuencia.
+    Un mismo número de secuencia (p. ej. un lote) nunca se parte entre dos respuestas.
+    Las tareas archivadas después de `since` aparecen como archivadas: el cliente debe
+    quitarlas igual que las borradas.
+    Devuelve (tareas_cambiadas, ids_borrados, ids_archivados, nuevo_cursor, hay_mas).
+    """
+    changes = _change_rows(user_id, lambda model: model.change_seq > since, limit + 1)
+    rows = db.execute(select(changes).order_by(changes.c.change_seq, changes.c.id).limit(limit + 1)).all()
+    has_more = False
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        same_seq = _change_rows(user_id, lambda model: (model.change_seq == last.change_seq) & (model.id > last.id))
+        rows += db.execute(select(same_seq).order_by(same_seq.c.id)).all()
+        later = _change_rows(user_id, lambda model: model.change_seq > last.change_seq, 1)
+        has_more = db.execute(select(exists(select(later)))).scalar()
+
+    changed = [task for task in rows if not task.deleted and not task.archived]
+    deleted = [task.id for task in rows if task.deleted]
+    archived = [task.id for task in rows if task.archived]
+    cursor = rows[-1].change_seq if rows else since
+    return changed, deleted, archived, cursor, has_more
+
+
+def update_task(db:Session, task_id: int, task_data: dict, current_user: Principal):
     """
     Actualiza una tarea: busca la tarea por ID y que pertenezca al usuario autenticado.
     Si se encuentra, actualiza los campos enviados, hace commit y devuelve la tarea.
     Si no, devuelve None.
+    Con RETURNING son dos sentencias: el UPDATE de users que reserva la posición en la
+    secuencia (y bloquea la fila del usuario) y un UPDATE ... RETURNING de la tarea.
+    Si cambia completed, el primer UPDATE ya aplica al contador la variación esperada
+    (la tarea pasa al estado enviado); solo si la tarea ya estaba en ese estado hace
+    falta un tercer UPDATE que la corrija.
+    Si la tarea está archivada, vuelve antes a tasks y se actualiza allí.
     """
-    task = db.query(models.Task).filter(
-        models.Task.id == task_id,
-        models.Task.user_id == current_user.id
-    ).first()
+    scope = (models.Task.id == task_id, models.Task.user_id == current_user.id, _active)
+    if not task_data:
+        return find_task(db, task_id, current_user)
+
+    expected = 0
+    if "completed" in task_data:
+        expected = 1 if task_data["completed"] else -1
+    seq = _next_change_seq(db, current_user.id, completed=expected)
+    if _returning_supported(db, "update"):
+        tasks, completed = _update_returning(db, scope, {**task_data, "change_seq": seq})
+        if not tasks and _restore_archived(db, current_user.id, [task_id], seq):
+            tasks, completed = _update_returning(db, scope, {**task_data, "change_seq": seq})
+        if not tasks:
+            db.rollback()
+            return None
+        _adjust_counters(db, current_user.id, completed=completed - expected)
+        _detach(db, tasks)
+        db.commit()
+        return tasks[0]
+
+    task = db.query(models.Task).filter(*scope).first()
+    if not task and _restore_archived(db, current_user.id, [task_id], seq):
+        task = db.query(models.Task).filter(*scope).first()
     if not task:
+        db.rollback()
         return None
-    
 
+    was_completed = bool(task.completed)
     #Actualiza únicamente los campos que se han enviado
     for key, value in task_data.items():
         setattr(task, key, value)
+    task.change_seq = seq
+    _adjust_counters(db, current_user.id, completed=int(bool(task.completed)) - int(was_completed) - expected)
 
     db.commit()
     db.refresh(task)
     return task
 
-def delete_task(db: Session, task_id: int, current_user: models.User):
+def _soft_delete(db: Session, scope, seq: int) -> dict:
+    """Marca como borradas las tareas de scope. Devuelve {id: estaba completada}."""
+    values = {"deleted_at": datetime.utcnow(), "change_seq": seq}
+    if _returning_supported(db, "update"):
+        rows = db.execute(
+            update(models.Task).where(*scope).values(**values).returning(models.Task.id, models.Task.completed),
+            execution_options=_DML_OPTIONS,
+        ).all()
+    else:
+        rows = db.query(models.Task.id, models.Task.completed).filter(*scope).all()
+        db.execute(update(models.Task).where(models.Task.id.in_([row.id for row in rows])).values(**values), execution_options={"synchronize_session": False})
+    return {task_id: bool(completed) for task_id, completed in rows}
+
+
+def delete_task(db: Session, task_id: int, current_user: Principal):
     """
-    Busca la tarea por ID que pertenezca al usuario autenticado.
-    Si la encuentra, la elimina y realiza commit en la base de datos.
-    Devuelve la tarea eliminada, o None si no se encontró.
+    Borra (lógicamente) la tarea por ID si pertenece al usuario autenticado y realiza commit.
+    La fila queda como lápida para que GET /tasks/changes informe del borrado; si la
+    tarea estaba archivada, vuelve antes a tasks.
+    Devuelve el nuevo cursor de sincronización, o None si no se encontró.
     """
-    task = db.query(models.Task).filter(
-        models.Task.id == task_id,
-        models.Task.user_id == current_user.id
-    ).first()
-    if not task:
+    scope = (models.Task.id == task_id, models.Task.user_id == current_user.id, _active)
+    seq = _next_change_seq(db, current_user.id)
+    deleted = _soft_delete(db, scope, seq)
+    if not deleted and _restore_archived(db, current_user.id, [task_id], seq):
+        deleted = _soft_delete(db, scope, seq)
+    if not deleted:
+        db.rollback()
         return None
-    
-    db.delete(task)
+    _adjust_counters(db, current_user.id, tasks=-len(deleted), completed=-sum(deleted.values()))
+    db.commit()
+    return seq
+
+
+def bulk_create_tasks(db: Session, items: list[dict], current_user: Principal):
+    """
+    Crea varias tareas en una sola transacción con un INSERT multi-fila ... RETURNING.
+    Devuelve las tareas creadas en el mismo orden que items.
+    """
+    completed = sum(bool(item.get("completed")) for item in items)
+    last_seq = _next_change_seq(db, current_user.id, len(items), tasks=len(items), completed=completed)
+    first_seq = last_seq - len(items) + 1
+    rows = [{**item, "user_id": current_user.id, "change_seq": first_seq + i} for i, item in enumerate(items)]
+    if _returning_supported(db, "insert"):
+        # Sin sort_by_parameter_order: en SQLite obligaría a un INSERT por fila. El orden
+        # de RETURNING no está garantizado, pero change_seq es creciente en el orden de items.
+        tasks = sorted(db.scalars(insert(models.Task).returning(models.Task), rows).all(), key=lambda task: task.change_seq)
+    else:
+        tasks = [models.Task(**row) for row in rows]
+        db.add_all(tasks)
+        db.flush()
+    _detach(db, tasks)
+    db.commit()
+    return tasks
+
+
+# Columnas que se cargan en cada fila importada (el orden es el de COPY)
+_IMPORT_COLUMNS = ("title", "description", "completed", "created_at", "updated_at", "change_seq", "user_id")
+
+
+def _copy_value(value) -> str:
+    # En COPY ... (FORMAT csv) un campo vacío sin comillas es NULL y "" es la cadena vacía
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+
+def _copy_rows(db: Session, rows: list[tuple]):
+    """Carga filas en tasks con COPY ... FROM STDIN, en la conexión de la transacción actual."""
+    driver_connection = db.connection().connection.driver_connection
+    if db.get_bind().dialect.driver == "asyncpg":
+        # En modo async los servicios corren en run_sync: await_only espera la corrutina de asyncpg
+        await_only(driver_connection.copy_records_to_table("tasks", records=rows, columns=_IMPORT_COLUMNS))
+        return
+    buffer = io.StringIO("".join(",".join(map(_copy_value, row)) + "\n" for row in rows))
+    with driver_connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY tasks ({', '.join(_IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def import_tasks(db: Session, items: list[dict], current_user: Principal) -> int:
+    """
+    Inserta un lote de tareas ya validadas y hace commit; devuelve el cursor de sincronización.
+    En PostgreSQL se usa COPY; en el resto de bases de datos, un executemany.
+    """
+    completed = sum(1 for item in items if item.get("completed"))
+    last_seq = _next_change_seq(db, current_user.id, len(items), tasks=len(items), completed=completed)
+    first_seq = last_seq - len(items) + 1
+    now = datetime.utcnow()
+    rows = [
+        (item["title"], item.get("description"), bool(item.get("completed")), now, now, first_seq + i, current_user.id)
+        for i, item in enumerate(items)
+    ]
+    if db.get_bind().dialect.name == "postgresql":
+        _copy_rows(db, rows)
+    else:
+        db.execute(insert(models.Task), [dict(zip(_IMPORT_COLUMNS, row)) for row in rows])
+    db.commit()
+    return last_seq
+
+
+def bulk_update_tasks(db: Session, items: list[dict], current_user: Principal):
+    """
+    Actualiza varias tareas del usuario en una sola transacción.
+    Los items con los mismos cambios se agrupan en un único UPDATE ... WHERE id IN (...),
+    de modo que "marcar todas como hechas" es una sola sentencia.
+    Todo el lote comparte un mismo número de secuencia de cambios.
+    Las tareas que no están en tasks pueden estar archivadas: vuelven a tasks y se
+    actualizan allí.
+    Devuelve ({id: tarea actualizada o None si no existe o no pertenece al usuario}, cursor).
+    """
+    groups = defaultdict(list)
+    for item in items:
+        changes = {key: value for key, value in item.items() if key != "id"}
+        groups[tuple(sorted(changes.items()))].append(item["id"])
+
+    seq = None
+    if any(groups):
+        seq = _next_change_seq(db, current_user.id)
+
+    results = {item["id"]: None for item in items}
+    updated = 0
+    completed = 0
+
+    def apply(changes, ids):
+        nonlocal updated, completed
+        scope = (models.Task.user_id == current_user.id, models.Task.id.in_(ids), _active)
+        if not changes:
+            # Sin cambios: solo comprobamos que las tareas existen
+            tasks = db.query(models.Task).filter(*scope).all()
+        elif _returning_supported(db, "update"):
+            tasks, delta = _update_returning(db, scope, {**dict(changes), "change_seq": seq})
+            updated += len(tasks)
+            completed += delta
+        else:
+            was_completed = sum(1 for (done,) in db.query(models.Task.completed).filter(*scope) if done)
+            db.execute(update(models.Task).where(*scope).values(**dict(changes), change_seq=seq), execution_options={"synchronize_session": False})
+            tasks = db.query(models.Task).filter(*scope).populate_existing().all()
+            updated += len(tasks)
+            completed += sum(1 for task in tasks if task.completed) - was_completed
+        for task in tasks:
+            results[task.id] = task
+
+    for changes, ids in groups.items():
+        apply(changes, ids)
+    missing = {changes: [task_id for task_id in ids if results[task_id] is None] for changes, ids in groups.items()}
+    if seq is not None and _restore_archived(db, current_user.id, [task_id for ids in missing.values() for task_id in ids], seq):
+        for changes, ids in missing.items():
+            if ids:
+                apply(changes, ids)
+    _detach(db, {task for task in results.values() if task is not None})
+    if updated == 0:
+        # Nada cambió: no consumimos un número de secuencia
+        db.rollback()
+        return results, None
+    _adjust_counters(db, current_user.id, completed=completed)
+    db.commit()
+    return results, seq
+
+
+def bulk_delete_tasks(db: Session, task_ids: list[int], current_user: Principal):
+    """
+    Borra (lógicamente) varias tareas del usuario con un único UPDATE ... WHERE id IN (...).
+    Las que no están en tasks pueden estar archivadas: vuelven a tasks y se borran allí.
+    Devuelve (conjunto de ids realmente eliminados, cursor).
+    """
+    scope = (models.Task.user_id == current_user.id, models.Task.id.in_(task_ids), _active)
+    seq = _next_change_seq(db, current_user.id)
+    deleted = _soft_delete(db, scope, seq)
+    missing = [task_id for task_id in task_ids if task_id not in deleted]
+    if missing and _restore_archived(db, current_user.id, missing, seq):
+        deleted.update(_soft_delete(db, (models.Task.user_id == current_user.id, models.Task.id.in_(missing), _active), seq))
+    if not deleted:
+        db.rollback()
+        return set(), None
+    _adjust_counters(db, current_user.id, tasks=-len(deleted), completed=-sum(deleted.values()))
+    db.commit()
+    return set(deleted), seq
+
+
+def task_stats(db: Session, user_id: int, days: int):
+    """
+    Estadísticas del usuario: los totales salen de los contadores de la fila users
+    (O(1)); el histograma de tareas creadas por día, de un GROUP BY de los últimos
+    `days` días sobre los índices (user_id, completed, created_at) de tasks y
+    (user_id, created_at, id) de tasks_archive. Ambos incluyen las tareas archivadas.
+    """
+    total, completed = db.query(models.User.task_count, models.User.completed_task_count).filter(
+        models.User.id == user_id,
+    ).one()
+
+    today = datetime.utcnow().date()
+    first_day = today - timedelta(days=days - 1)
+    since = datetime.combine(first_day, datetime.min.time())
+    archive = models.TaskArchive
+    created = union_all(
+        select(models.Task.created_at, models.Task.completed).where(models.Task.user_id == user_id, _active, models.Task.created_at >= since),
+        select(archive.created_at, archive.completed).where(archive.user_id == user_id, archive.created_at >= since),
+    ).subquery()
+    day = func.date(created.c.created_at)
+    rows = db.execute(
+        select(day, func.count(), func.sum(case((created.c.completed, 1), else_=0))).group_by(day)
+    ).all()
+    # SQLite devuelve el día como texto y PostgreSQL como date
+    per_day = {str(created_day): (created, done or 0) for created_day, created, done in rows}
+
+    histogram = []
+    for offset in range(days):
+        current = first_day + timedelta(days=offset)
+        created, done = per_day.get(current.isoformat(), (0, 0))
+        histogram.append({"day": current, "created": created, "completed": done})
+    return {
+        "total": total,
+        "completed": completed,
+        "pending": total - completed,
+        "completion_ratio": completed / total if total else 0.0,
+        "created_per_day": histogram,
+    }
+
+
+# Columnas que se copian de tasks a tasks_archive
+ARCHIVE_FIELDS = ("id", "title", "description", "completed", "created_at", "updated_at", "change_seq", "user_id")
+# Identificador del advisory lock de PostgreSQL que impide dos archivados a la vez
+ARCHIVE_LOCK_ID = 0x7461736B
+
+
+def _archivable(before: datetime) -> list:
+    return [
+        models.Task.completed.is_(True),
+        _active,
+        models.Task.created_at.is_not(None),
+        models.Task.updated_at < before,
+    ]
+
+
+def ensure_archive_partitions(db: Session, years: set[int]):
+    """Crea las particiones anuales de tasks_archive que falten (solo PostgreSQL)."""
+    for year in sorted(years):
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS tasks_archive_{year} PARTITION OF tasks_archive "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        ))
+
+
+def archive_completed_tasks(db: Session, before: datetime, batch_size: int):
+    """
+    Pasa a tasks_archive un lote de hasta batch_size tareas completadas y sin modificar
+    desde `before`, en una transacción. Los contadores del usuario no cambian (las
+    tareas siguen siendo suyas), pero sí su versión: así caducan los listados cacheados
+    y sus ETag, y las tareas archivadas entran en GET /tasks/changes.
+    Las filas de los usuarios se bloquean antes que las de las tareas, en el mismo orden
+    que en las escrituras (_next_change_seq), y las condiciones se comprueban de nuevo
+    con ellas bloqueadas: una tarea modificada mientras tanto no se archiva.
+    Devuelve (tareas archivadas, {user_id: nueva versión}); sin candidatas, (0, {}).
+    """
+    postgres = db.get_bind().dialect.name == "postgresql"
+    if postgres and not db.execute(select(func.pg_try_advisory_xact_lock(ARCHIVE_LOCK_ID))).scalar():
+        return 0, {}
+    candidates = db.execute(
+        select(models.Task.id, models.Task.user_id, models.Task.created_at)
+        .where(*_archivable(before)).order_by(models.Task.id).limit(batch_size)
+    ).all()
+    if not candidates:
+        db.rollback()
+        return 0, {}
+
+    user_ids = sorted({row.user_id for row in candidates})
+    bump = update(models.User).where(models.User.id.in_(user_ids)).values(change_seq=models.User.change_seq + 1)
+    if _returning_supported(db, "update"):
+        versions = dict(db.execute(bump.returning(models.User.id, models.User.change_seq), execution_options={"synchronize_session": False}).all())
+    else:
+        db.execute(bump, execution_options={"synchronize_session": False})
+        versions = dict(db.execute(select(models.User.id, models.User.change_seq).where(models.User.id.in_(user_ids))).all())
+
+    if postgres:
+        ensure_archive_partitions(db, {row.created_at.year for row in candidates})
+    scope = (models.Task.id.in_([row.id for row in candidates]), *_archivable(before))
+    # Cada tarea archivada toma la nueva versión de su usuario: GET /tasks/changes la
+    # devuelve como archivada a los clientes con un cursor anterior
+    version = select(models.User.change_seq).where(models.User.id == models.Task.user_id).scalar_subquery()
+    columns = [version if field == "change_seq" else getattr(models.Task, field) for field in ARCHIVE_FIELDS]
+    db.execute(insert(models.TaskArchive).from_select(
+        [*ARCHIVE_FIELDS, "archived_at"],
+        select(*columns, literal(datetime.utcnow())).where(*scope),
+    ))
+    archived = db.execute(delete(models.Task).where(*scope), execution_options={"synchronize_session": False}).rowcount
     db.commit()
-    return task
\ No newline at end of file
+    return archived, versions
@@ -0,0 +1,239 @@
+import bisect
+import hashlib
+import os
+from dataclasses import dataclass
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security.utils import get_authorization_scheme_param
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app import database, models
+from app.database import get_db, run_db
+from app.services import principal_cache
+from app.services.auth_service import decode_access_token
+from app.services.ttl_cache import TTLCache
+
+
+# Shards de tareas: "nombre=url,nombre=url". "primary" (sin URL) incluye la BD principal
+# en el anillo. Sin shards, todo vive en la BD principal. Los nombres no deben cambiar:
+# el anillo se calcula con ellos, y su posición fija el rango de ids de cada shard
+DATABASE_SHARDS = os.getenv("DATABASE_SHARDS", "")
+# Segundos que un worker reutiliza la ubicación de un usuario leída del directorio.
+# El traslado de un usuario espera este tiempo para que todos los workers lo vean
+SHARD_DIRECTORY_TTL = float(os.getenv("SHARD_DIRECTORY_TTL", "5"))
+# Puntos de cada shard en el anillo: más puntos, reparto más uniforme
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+
+PRIMARY = "primary"
+
+
+def parse_shards(value: str) -> dict[str, str | None]:
+    shards = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, url = item.partition("=")
+        shards[name.strip()] = url.strip() or None
+    return shards
+
+
+class HashRing:
+    """
+    Hashing consistente: cada shard ocupa `vnodes` puntos del anillo y una clave va al
+    primer punto que la sigue. Al añadir un shard solo cambian de sitio ~1/N de las claves.
+    """
+
+    def __init__(self, names, vnodes: int = SHARD_VNODES):
+        points = sorted((self._hash(f"{name}#{i}"), name) for name in names for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def get(self, key) -> str:
+        i = bisect.bisect(self._hashes, self._hash(str(key))) % len(self._hashes)
+        return self._names[i]
+
+
+@dataclass(frozen=True)
+class Placement:
+    shard: str
+    moving_to: str | None = None
+
+
+class Shard:
+    """Una BD con el esquema completo que guarda las tareas (y los contadores) de sus usuarios."""
+
+    def __init__(self, name: str, url: str, mode: str):
+        self.name = name
+        self.url = url
+        self.mode = mode
+        self._engine = None
+        self._sessionmaker = None
+
+    def session(self):
+        if self._engine is None:
+            self._engine, self._sessionmaker = database.create_engines(self.url, f"shard_{self.name}", self.mode)
+        return self._sessionmaker()
+
+    async def dispose(self):
+        if self._engine is not None:
+            await database.dispose_engine(self._engine)
+            self._engine = self._sessionmaker = None
+
+
+def _directory_lookup(db, user_id: int):
+    return db.execute(
+        select(models.UserShard.shard, models.UserShard.moving_to).where(models.UserShard.user_id == user_id)
+    ).first()
+
+
+def _user_id_by_email(db, email: str):
+    return db.execute(select(models.User.id).where(models.User.email == email)).scalar()
+
+
+def _assign(db, user_id: int, shard: str):
+    db.add(models.UserShard(user_id=user_id, shard=shard))
+    db.commit()
+
+
+def _copy_user(db, user: dict):
+    db.add(models.User(**user))
+    db.commit()
+
+
+class ShardRouter:
+    """
+    Decide en qué BD viven las tareas de cada usuario. La ubicación se guarda en el
+    directorio (user_shards, en la BD principal) y los usuarios nuevos se colocan con el
+    anillo de hashing consistente; los que no tienen fila siguen en la BD principal.
+    Cada shard tiene su propio engine y pool, creados en el primer uso.
+    """
+
+    def __init__(self, shards: dict[str, str | None], mode: str = None, directory_ttl: float = SHARD_DIRECTORY_TTL):
+        mode = mode or database.DATABASE_MODE
+        self.names = list(shards)
+        self.shards = {name: Shard(name, url, mode) for name, url in shards.items() if name != PRIMARY}
+        self.ring = HashRing(self.names) if self.names else None
+        self._directory = TTLCache(100_000, directory_ttl)
+        self.directory_lookups = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ring is not None
+
+    async def placement(self, db, user_id: int) -> Placement:
+        """Ubicación del usuario según el directorio (cacheada durante directory_ttl)."""
+        placement = self._directory.get(user_id)
+        if placement is None:
+            self.directory_lookups += 1
+            row = await run_db(db, _directory_lookup, user_id)
+            placement = Placement(*row) if row else Placement(PRIMARY)
+            self._directory.set(user_id, placement)
+        return placement
+
+    def invalidate(self, user_id: int = None):
+        if user_id is None:
+            self._directory.clear()
+        else:
+            self._directory.pop(user_id)
+
+    def session(self, name: str):
+        return self.shards[name].session()
+
+    async def place_new_user(self, db, user: models.User):
+        """
+        Coloca a un usuario recién registrado en su shard: primero la copia de su fila
+        (mismo id, contadores a cero) en el shard y después la entrada del directorio.
+        """
+        if not self.enabled:
+            return
+        name = self.ring.get(user.id)
+        if name != PRIMARY:
+            session = self.session(name)
+            try:
+                await run_db(session, _copy_user, {"id": user.id, "email": user.email, "hashed_password": user.hashed_password})
+            finally:
+                await _close(session)
+        await run_db(db, _assign, user.id, name)
+        self._directory.set(user.id, Placement(name))
+
+    async def close(self):
+        for shard in self.shards.values():
+            await shard.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "shards": {
+                name: None if name == PRIMARY else make_url(self.shards[name].url).render_as_string(hide_password=True)
+                for name in self.names
+            },
+            "directory": self._directory.stats(),
+            "directory_lookups": self.directory_lookups,
+        }
+
+
+async def _close(session):
+    if isinstance(session, AsyncSession):
+        await session.close()
+    else:
+        await run_in_threadpool(session.close)
+
+
+def _token_payload(request: Request) -> dict | None:
+    """Payload del token Bearer de la petición (decodificación cacheada), o None."""
+    scheme, token = get_authorization_scheme_param(request.headers.get("authorization"))
+    return decode_access_token(token) if scheme.lower() == "bearer" and token else None
+
+
+async def resolve_user_id(request: Request, db) -> int | None:
+    """
+    Id del usuario del token Bearer de la petición, o None si no hay token válido o su
+    usuario no existe. Los tokens sin `uid` se resuelven por su `sub` (el email): de la
+    caché de usuarios o, si no está, de la BD principal (`db`). Se guarda en la petición.
+    """
+    if hasattr(request.state, "user_id"):
+        return request.state.user_id
+    payload = _token_payload(request)
+    user_id = payload.get("uid") if payload else None
+    if user_id is None and payload and payload.get("sub"):
+        principal = None if principal_cache.is_stale(payload) else principal_cache.get(payload["sub"])
+        user_id = principal.id if principal else await run_db(db, _user_id_by_email, payload["sub"])
+    request.state.user_id = user_id
+    return user_id
+
+
+async def get_user_db(request: Request, db=Depends(get_db)):
+    """
+    Sesión de la BD que guarda las tareas del usuario autenticado: la de su shard o,
+    sin sharding o si sigue en la BD principal, `db`. Mientras se traslada a otro shard
+    se sirven las lecturas desde el origen y se rechazan las escrituras con un 503.
+    """
+    if not shard_router.enabled:
+        yield db
+        return
+    user_id = await resolve_user_id(request, db)
+    if user_id is None:
+        # Sin usuario no se sabe qué shard leer: get_current_user responderá 401
+        yield db
+        return
+    placement = await shard_router.placement(db, user_id)
+    if placement.moving_to is not None and request.method not in ("GET", "HEAD"):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="User data is being moved, retry shortly",
+            headers={"Retry-After": str(max(1, round(SHARD_DIRECTORY_TTL)))},
+        )
+    if placement.shard == PRIMARY:
+        yield db
+        return
+    request.state.shard = placement.shard
+    session = shard_router.session(placement.shard)
+    try:
+        yield session
+    finally:
+        await _close(session)
+
+
+shard_router = ShardRouter(parse_shards(DATABASE_SHARDS))
@@ -0,0 +1,53 @@
+"""
+Micro-benchmark del coste de autenticación por petición.
+
+Compara la verificación completa del JWT (jwt.decode en cada petición) con la
+caché de tokens verificados de auth_service, y el camino completo hasta el
+principal (decode + caché de principales).
+
+    python -m benchmarks.bench_auth [iteraciones]
+"""
+import sys
+import timeit
+from app.services import auth_service, principal_cache
+from app.services.auth_service import create_access_token, decode_access_token, clear_token_cache
+
+
+def _per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 20000):
+    token = create_access_token(data={"sub": "bench@example.com", "uid": 1})
+
+    def uncached():
+        clear_token_cache()
+        return decode_access_token(token)
+
+    def full_jwt_decode():
+        return auth_service.jwt.decode(token, auth_service.SECRET_KEY, algorithms=[auth_service.ALGORITHM])
+
+    clear_token_cache()
+    decode_access_token(token)
+    principal_cache.put(principal_cache.Principal(id=1, email="bench@example.com"))
+
+    def cached():
+        return decode_access_token(token)
+
+    def principal_path():
+        payload = decode_access_token(token)
+        return None if principal_cache.is_stale(payload) else principal_cache.get(payload["sub"])
+
+    results = {
+        "jwt.decode (antes)": _per_call_us(full_jwt_decode, number),
+        "decode_access_token sin caché": _per_call_us(uncached, number),
+        "decode_access_token con caché": _per_call_us(cached, number),
+        "token + principal con caché": _per_call_us(principal_path, number),
+    }
+    for name, us in results.items():
+        print(f"{name:<35} {us:8.2f} µs/petición")
+    print(f"Aceleración: x{results['jwt.decode (antes)'] / results['decode_access_token con caché']:.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
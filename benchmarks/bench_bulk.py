@@ -0,0 +1,54 @@
+"""
+Compara el rendimiento de los endpoints por elemento (POST/PUT/DELETE /tasks/{id})
+con los endpoints en lote (/tasks/bulk).
+
+    python -m benchmarks.bench_bulk [num_tareas] [tamaño_lote]
+"""
+import sys
+from benchmarks.harness import bench_client, timed
+
+
+def _per_item(client, headers, n):
+    _, create_s = timed(lambda: [client.post("/tasks/", json={"title": f"T{i}", "description": "D"}, headers=headers) for i in range(n)])
+    ids = [task["id"] for task in client.get("/tasks/", params={"limit": 500}, headers=headers).json()]
+    _, update_s = timed(lambda: [client.put(f"/tasks/{task_id}", json={"completed": True}, headers=headers) for task_id in ids])
+    _, delete_s = timed(lambda: [client.delete(f"/tasks/{task_id}", headers=headers) for task_id in ids])
+    return create_s, update_s, delete_s, len(ids)
+
+
+def _bulk(client, headers, n, batch):
+    ids = []
+
+    def create():
+        for start in range(0, n, batch):
+            items = [{"title": f"T{i}", "description": "D"} for i in range(start, min(n, start + batch))]
+            ids.extend(task["id"] for task in client.post("/tasks/bulk", json=items, headers=headers).json())
+
+    def mark_done():
+        for start in range(0, len(ids), batch):
+            client.patch("/tasks/bulk", json=[{"id": task_id, "completed": True} for task_id in ids[start:start + batch]], headers=headers)
+
+    def remove():
+        for start in range(0, len(ids), batch):
+            client.request("DELETE", "/tasks/bulk", json={"ids": ids[start:start + batch]}, headers=headers)
+
+    _, create_s = timed(create)
+    _, update_s = timed(mark_done)
+    _, delete_s = timed(remove)
+    return create_s, update_s, delete_s, len(ids)
+
+
+def main(n: int = 500, batch: int = 100):
+    with bench_client("bench_bulk_items") as (client, headers, _):
+        per_item = _per_item(client, headers, min(n, 500))
+    with bench_client("bench_bulk_batches") as (client, headers, _):
+        bulk = _bulk(client, headers, n, batch)
+
+    print(f"{'operación':<12}{'por elemento (tareas/s)':>26}{'lote de ' + str(batch) + ' (tareas/s)':>26}")
+    for i, name in enumerate(("crear", "actualizar", "eliminar")):
+        print(f"{name:<12}{per_item[3] / per_item[i]:>26.0f}{bulk[3] / bulk[i]:>26.0f}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,83 @@
+"""
+Mide GET /tasks/ sobre colecciones de 1k, 10k y 100k tareas recorridas página a página
+(limit=500, siguiendo X-Next-Cursor como hace el frontend), y compara el coste de
+serializar la colección completa por la ruta antigua (entidades ORM + pydantic +
+jsonable_encoder) y por la nueva (tuplas + FastJSONResponse).
+
+    python -m benchmarks.bench_list [tamaño ...]
+"""
+import sys
+from datetime import datetime, timedelta
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from benchmarks.harness import bench_client, percentile, timed
+from app import models, schemas
+from app.responses import FastJSONResponse
+from app.services.task_service import TASK_COLUMNS
+
+PAGE_SIZE = 500
+
+
+def _seed(engine, n):
+    with Session(engine) as db:
+        user_id = db.query(models.User.id).scalar()
+        start = datetime(2024, 1, 1)
+        rows = [
+            {"title": f"Tarea {i}", "description": "Descripción de prueba", "completed": i % 3 == 0,
+             "created_at": start + timedelta(seconds=i), "updated_at": start + timedelta(seconds=i),
+             "change_seq": i + 1, "user_id": user_id}
+            for i in range(n)
+        ]
+        db.execute(insert(models.Task), rows)
+        db.query(models.User).filter(models.User.id == user_id).update({"change_seq": n})
+        db.commit()
+        return user_id
+
+
+def _walk(client, headers):
+    """Recorre la colección entera; devuelve (tareas, latencias por petición)."""
+    latencies, total, cursor = [], 0, None
+    while True:
+        params = {"limit": PAGE_SIZE, **({"cursor": cursor} if cursor else {})}
+        response, seconds = timed(lambda: client.get("/tasks/", params=params, headers=headers))
+        latencies.append(seconds)
+        total += len(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return total, latencies
+
+
+def _serialize(engine, user_id):
+    """Segundos para serializar toda la colección por la ruta antigua y por la nueva."""
+    with Session(engine) as db:
+        def legacy():
+            tasks = db.query(models.Task).filter(models.Task.user_id == user_id).all()
+            return FastJSONResponse(jsonable_encoder([schemas.Task.model_validate(task, from_attributes=True) for task in tasks]))
+
+        def fast():
+            rows = db.query(*TASK_COLUMNS).filter(models.Task.user_id == user_id).all()
+            return FastJSONResponse([row._asdict() for row in rows])
+
+        _, legacy_s = timed(legacy)
+        db.expunge_all()
+        _, fast_s = timed(fast)
+    return legacy_s, fast_s
+
+
+def main(sizes=(1_000, 10_000, 100_000)):
+    print(f"{'tareas':>8}{'peticiones':>12}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'ORM+pydantic s':>16}{'tuplas+orjson s':>17}")
+    for n in sizes:
+        with bench_client(f"bench_list_{n}") as (client, headers, engine):
+            user_id = _seed(engine, n)
+            (total, latencies), seconds = timed(lambda: _walk(client, headers))
+            assert total == n, total
+            legacy_s, fast_s = _serialize(engine, user_id)
+        print(f"{n:>8}{len(latencies):>12}{len(latencies) / seconds:>9.1f}"
+              f"{percentile(latencies, 0.5) * 1000:>9.1f}{percentile(latencies, 0.99) * 1000:>9.1f}"
+              f"{legacy_s:>16.3f}{fast_s:>17.3f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]]
+    main(*([sizes] if sizes else []))
@@ -0,0 +1,90 @@
+"""
+Latencia de GET /tasks/search sobre una tabla con muchas tareas (por defecto 1M,
+repartidas entre 100 usuarios), comparada con filtrar con LIKE '%término%', que es
+lo único que se podía hacer sin índice de texto. Ambas se miden también sin HTTP.
+Las palabras siguen una distribución de Zipf: hay términos muy comunes y términos raros.
+
+    python -m benchmarks.bench_search [num_tareas] [num_usuarios]
+"""
+import itertools
+import random
+import sys
+from datetime import datetime
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+from benchmarks.harness import bench_client, percentile, timed
+from app import models
+from app.services import task_service
+
+WORDS = (
+    "comprar pagar llamar revisar enviar preparar limpiar reunión informe factura banco "
+    "cliente proyecto equipo correo viaje médico coche casa jardín regalo presupuesto "
+    "contrato entrega lista documento presentación cumpleaños oficina compra pedido"
+).split()
+# Vocabulario: las palabras reales son las más frecuentes, seguidas de términos poco comunes
+VOCABULARY = WORDS + [f"termino{i}" for i in range(20_000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+QUERIES = ["comprar", "revisar informe", "termino50", "termino5000", "factura termino200", "inexistente"]
+BATCH = 20_000
+
+
+def _sentences(rng, count, words):
+    sample = rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=count * words)
+    return [" ".join(sample[i:i + words]) for i in range(0, len(sample), words)]
+
+
+def _seed(engine, n, users):
+    rng = random.Random(42)
+    with Session(engine) as db:
+        bench_user = db.query(models.User.id).scalar()
+        db.execute(insert(models.User), [{"email": f"user{i}@example.com", "hashed_password": "x"} for i in range(users - 1)])
+        user_ids = [user_id for (user_id,) in db.query(models.User.id)]
+        now = datetime.utcnow()
+        for start in range(0, n, BATCH):
+            count = min(n, start + BATCH) - start
+            titles, descriptions = _sentences(rng, count, 3), _sentences(rng, count, 12)
+            db.execute(insert(models.Task), [
+                {"title": titles[i], "description": descriptions[i], "completed": False,
+                 "created_at": now, "updated_at": now, "change_seq": start + i, "user_id": user_ids[(start + i) % len(user_ids)]}
+                for i in range(count)
+            ])
+        db.commit()
+    return bench_user
+
+
+def _like(engine, user_id, q):
+    clauses = " AND ".join(f"(title LIKE :t{i} OR description LIKE :t{i})" for i in range(len(q.split())))
+    params = {f"t{i}": f"%{term}%" for i, term in enumerate(q.split())}
+    with engine.connect() as conn:
+        return conn.execute(
+            text(f"SELECT id FROM tasks WHERE user_id = :user_id AND deleted_at IS NULL AND {clauses} LIMIT 100"),
+            {"user_id": user_id, **params},
+        ).all()
+
+
+def _search(engine, user_id, q):
+    with Session(engine) as db:
+        return task_service.search_tasks(db, user_id, q, 100)
+
+
+def main(n: int = 1_000_000, users: int = 100, repeat: int = 20):
+    with bench_client("bench_search") as (client, headers, engine):
+        user_id, seed_s = timed(lambda: _seed(engine, n, users))
+        print(f"{n} tareas, {users} usuarios (carga e indexación: {seed_s:.1f}s)")
+        print(f"{'consulta':<22}{'resultados':>11}{'HTTP p50 ms':>13}{'HTTP p99 ms':>13}"
+              f"{'FTS p50 ms':>12}{'FTS p99 ms':>12}{'LIKE p50 ms':>13}{'LIKE p99 ms':>13}")
+        for q in QUERIES:
+            http, fts, like = [], [], []
+            for _ in range(repeat):
+                response, seconds = timed(lambda: client.get("/tasks/search", params={"q": q}, headers=headers))
+                http.append(seconds)
+                fts.append(timed(lambda: _search(engine, user_id, q))[1])
+                like.append(timed(lambda: _like(engine, user_id, q))[1])
+            print(f"{q:<22}{len(response.json()):>11}"
+                  + "".join(f"{percentile(values, p) * 1000:>{width}.2f}"
+                            for values, width in ((http, 13), (fts, 12), (like, 13)) for p in (0.5, 0.99)))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
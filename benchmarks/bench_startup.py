@@ -0,0 +1,99 @@
+"""
+Mide el arranque en frío de un worker, cada vez en un proceso nuevo:
+
+- import: lo que tarda `import app.main` (antes incluía create_all contra la BD).
+- lifespan: desde el import hasta que el servidor acepta peticiones.
+- ready: desde el inicio del proceso hasta que /ready responde 200 (calentamiento terminado).
+- primer login: latencia de la primera petición real, con y sin calentamiento
+  (sin él, paga la conexión a la BD y el arranque de los procesos de bcrypt).
+
+La BD es un SQLite temporal migrado con Alembic. Para ver qué módulos pesan más:
+`python -X importtime -c "import app.main"`.
+
+    python -m benchmarks.bench_startup [repeticiones]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix="taskflow-startup-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/startup.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+EMAIL = "startup@example.com"
+PASSWORD = "benchpassword"
+
+# Se ejecuta en un proceso nuevo; imprime una línea JSON con los tiempos en ms
+CHILD = f"""
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+from app.services import startup
+imported = time.perf_counter()
+import httpx
+
+async def run():
+    async with app.router.lifespan_context(app):
+        serving = time.perf_counter()
+        while not startup.readiness.ready:
+            await asyncio.sleep(0.001)
+        ready = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            response = await client.post("/auth/login", json={{"email": {EMAIL!r}, "password": {PASSWORD!r}}})
+            assert response.status_code == 200, response.text
+        login = time.perf_counter() - ready
+    return serving, ready, login
+
+serving, ready, login = asyncio.run(run())
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "lifespan_ms": (serving - imported) * 1000,
+    "ready_ms": (ready - started) * 1000,
+    "first_login_ms": login * 1000,
+}}))
+"""
+
+
+def _prepare_database():
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import create_engine, insert
+    from app import models
+    from app.services.auth_service import hash_password
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    config = Config(os.path.join(root, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(root, "migrations"))
+    command.upgrade(config, "head")
+    engine = create_engine(os.environ["DATABASE_URL"])
+    with engine.begin() as connection:
+        connection.execute(insert(models.User).values(email=EMAIL, hashed_password=hash_password(PASSWORD)))
+    engine.dispose()
+
+
+def _run(warmup: bool) -> dict:
+    env = {**os.environ, "STARTUP_WARMUP": "true" if warmup else "false", "SCHEMA_CHECK": "strict"}
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def main(repeat: int = 5):
+    _prepare_database()
+    columns = ("import_ms", "lifespan_ms", "ready_ms", "first_login_ms", "process_ms")
+    print(f"{'':<16}" + "".join(f"{name:>16}" for name in columns))
+    for warmup in (True, False):
+        runs = [_run(warmup) for _ in range(repeat)]
+        medians = {name: statistics.median(run[name] for run in runs) for name in columns}
+        label = "con warm-up" if warmup else "sin warm-up"
+        print(f"{label:<16}" + "".join(f"{medians[name]:>16.1f}" for name in columns))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
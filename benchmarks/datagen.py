@@ -0,0 +1,86 @@
+"""
+Generador de datos para los benchmarks: N usuarios con M tareas cada uno, más un
+usuario por cada tamaño de lista pedido (para medir GET /tasks/ a distintos tamaños).
+Rellena también los contadores y el cursor de sincronización de cada usuario, como
+lo harían los endpoints. Todos los usuarios tienen la contraseña PASSWORD.
+
+    python -m benchmarks.datagen [usuarios] [tareas_por_usuario]
+"""
+import random
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from benchmarks.harness import bench_engine, timed
+from app import models
+from app.services.auth_service import hash_password
+
+PASSWORD = "benchpassword"
+BATCH = 10_000
+WORDS = "comprar pagar llamar revisar enviar preparar limpiar reunión informe factura cliente proyecto".split()
+
+
+@dataclass
+class Dataset:
+    users: list[tuple[int, str]] = field(default_factory=list)  # (id, email) de los usuarios normales
+    list_users: dict[int, tuple[int, str]] = field(default_factory=dict)  # tamaño -> (id, email)
+    tasks: int = 0
+
+
+def _create_users(db, emails: list[str], hashed: str) -> list[int]:
+    if not emails:
+        return []
+    rows = db.execute(insert(models.User).returning(models.User.id, sort_by_parameter_order=True),
+                      [{"email": email, "hashed_password": hashed} for email in emails])
+    return [user_id for (user_id,) in rows]
+
+
+def _create_tasks(db, rng, user_id: int, count: int, start: datetime):
+    completed = 0
+    for offset in range(0, count, BATCH):
+        rows = []
+        for i in range(offset, min(count, offset + BATCH)):
+            done = rng.random() < 0.4
+            completed += done
+            created = start + timedelta(minutes=i)
+            rows.append({
+                "title": " ".join(rng.choices(WORDS, k=3)), "description": " ".join(rng.choices(WORDS, k=10)),
+                "completed": done, "created_at": created, "updated_at": created, "change_seq": i + 1, "user_id": user_id,
+            })
+        db.execute(insert(models.Task), rows)
+    db.execute(update(models.User).where(models.User.id == user_id).values(
+        change_seq=count, task_count=count, completed_task_count=completed,
+    ))
+
+
+def generate(engine, users: int, tasks_per_user: int, list_sizes=(), seed: int = 42) -> Dataset:
+    """Carga los datos en `engine` (que debe tener las tablas vacías)."""
+    rng = random.Random(seed)
+    hashed = hash_password(PASSWORD)
+    start = datetime(2024, 1, 1)
+    dataset = Dataset()
+    with Session(engine) as db:
+        emails = [f"user{i}@bench.example.com" for i in range(users)]
+        dataset.users = list(zip(_create_users(db, emails, hashed), emails))
+        list_emails = [f"list{size}@bench.example.com" for size in list_sizes]
+        for size, user_id, email in zip(list_sizes, _create_users(db, list_emails, hashed), list_emails):
+            dataset.list_users[size] = (user_id, email)
+        for user_id, _ in dataset.users:
+            _create_tasks(db, rng, user_id, tasks_per_user, start)
+        for size, (user_id, _) in dataset.list_users.items():
+            _create_tasks(db, rng, user_id, size, start)
+        db.commit()
+    dataset.tasks = users * tasks_per_user + sum(list_sizes)
+    return dataset
+
+
+def main(users: int = 100, tasks_per_user: int = 100):
+    engine = bench_engine("datagen")
+    dataset, seconds = timed(lambda: generate(engine, users, tasks_per_user))
+    print(f"{len(dataset.users)} usuarios, {dataset.tasks} tareas en {seconds:.1f} s ({engine.url.render_as_string()})")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
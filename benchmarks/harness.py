@@ -0,0 +1,79 @@
+"""
+Utilidades comunes de los benchmarks: una instancia de la app en proceso
+sobre un fichero SQLite temporal (o la BD de BENCH_DATABASE_URL), con un
+usuario ya autenticado.
+"""
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+_tmp_dir = tempfile.mkdtemp(prefix="taskflow-bench-")
+# La app lee DATABASE_URL al importarse, así que tiene que estar fijada antes
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_dir}/bench.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# BD alternativa, p. ej. un PostgreSQL local. Sus tablas se borran y se recrean en cada benchmark
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.database import Base, get_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def bench_engine(name: str = "bench", database_url: str = None):
+    """Engine sobre una BD vacía: BENCH_DATABASE_URL si está definida o un SQLite temporal."""
+    database_url = database_url or BENCH_DATABASE_URL
+    if database_url:
+        engine = create_engine(database_url, pool_size=20, max_overflow=20)
+    else:
+        engine = create_engine(f"sqlite:///{_tmp_dir}/{name}.db", connect_args={"check_same_thread": False})
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@contextmanager
+def use_engine(engine):
+    """Hace que la app use `engine` en lugar del de DATABASE_URL."""
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield
+    finally:
+        app.dependency_overrides.clear()
+
+
+@contextmanager
+def bench_client(name: str = "bench", email: str = "bench@example.com"):
+    """Cliente de pruebas con BD propia y cabeceras de autenticación de un usuario nuevo."""
+    engine = bench_engine(name)
+    try:
+        with use_engine(engine), TestClient(app) as client:
+            client.post("/auth/register", json={"email": email, "password": "benchpassword"})
+            token = client.post("/auth/login", json={"email": email, "password": "benchpassword"}).json()["access_token"]
+            yield client, {"Authorization": f"Bearer {token}"}, engine
+    finally:
+        engine.dispose()
+
+
+def percentile(values, p):
+    """Percentil p (0-1) por el método del rango más cercano."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def timed(fn):
+    """Ejecuta fn() y devuelve (resultado, segundos)."""
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
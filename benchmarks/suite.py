@@ -0,0 +1,287 @@
+"""
+Suite de benchmarks de la API, reproducible y con resultados en JSON.
+
+Levanta la app en proceso (httpx + ASGITransport, sin red) sobre un SQLite temporal
+o sobre la BD de --db / BENCH_DATABASE_URL (p. ej. un PostgreSQL local: sus tablas se
+borran y se recrean), genera N usuarios con M tareas y mide cada carga de trabajo:
+
+    login, refresh          POST /auth/login y /auth/refresh-token
+    crud                    crear, leer, modificar y borrar una tarea
+    list_<n>, list_<n>_cached   GET /tasks/?limit=500 de un usuario con n tareas,
+                            sin y con la caché de lecturas
+    mixed                   usuarios concurrentes con una mezcla de lecturas y escrituras
+
+De cada una se obtiene el throughput, los percentiles p50/p95/p99 de latencia y las
+consultas SQL por petición. Con --baseline se comparan con unos resultados guardados
+y se sale con código 1 si alguna carga empeora más de --tolerance. La línea base
+guardada en el repositorio es de SQLite en una máquina de desarrollo: sirve para detectar
+cambios grandes y cualquier aumento de consultas; para comparar latencias con precisión,
+genera una línea base propia en la misma máquina con --save-baseline.
+
+    python -m benchmarks.suite [--db URL] [--users N] [--tasks M] [--repeat R] [--out results.json]
+                               [--baseline benchmarks/baseline.json] [--save-baseline]
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+import httpx
+from benchmarks.datagen import PASSWORD, generate
+from benchmarks.harness import bench_engine, percentile, use_engine
+from app.main import app
+from app.services import task_cache
+from app.services.query_budget import count_queries
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+LIST_SIZES = (10, 100, 1000)
+# Peso de cada operación en la carga mixta
+MIX = {"list": 60, "read": 20, "create": 10, "update": 7, "delete": 3}
+
+
+class Recorder:
+    """Latencias, consultas y errores de las peticiones de una carga de trabajo."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+
+    async def request(self, client, method: str, url: str, expected=(200, 201, 204), **kwargs):
+        with count_queries(self.engine) as queries:
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            self.latencies.append(time.perf_counter() - started)
+        self.queries.append(queries.count)
+        if response.status_code not in expected:
+            self.errors += 1
+        return response
+
+    def summary(self, seconds: float) -> dict:
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "throughput_rps": round(len(self.latencies) / seconds, 1),
+            "p50_ms": round(percentile(self.latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(self.latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(self.latencies, 0.99) * 1000, 3),
+            "queries_per_request": round(sum(self.queries) / len(self.queries), 2),
+        }
+
+
+async def _run(recorder: Recorder, workers) -> dict:
+    started = time.perf_counter()
+    await asyncio.gather(*workers)
+    return recorder.summary(time.perf_counter() - started)
+
+
+def _auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _login_all(client, emails) -> dict:
+    tokens = {}
+    for email in emails:
+        response = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+        response.raise_for_status()
+        tokens[email] = response.json()
+    return tokens
+
+
+async def bench_login(client, engine, dataset, requests: int, concurrency: int) -> dict:
+    recorder = Recorder(engine)
+    emails = [email for _, email in dataset.users]
+
+    async def worker(k):
+        for i in range(k, requests, concurrency):
+            await recorder.request(client, "POST", "/auth/login", json={"email": emails[i % len(emails)], "password": PASSWORD})
+
+    return await _run(recorder, [worker(k) for k in range(concurrency)])
+
+
+async def bench_refresh(client, engine, tokens, requests: int, concurrency: int) -> dict:
+    recorder = Recorder(engine)
+    refresh_tokens = [token["refresh_token"] for token in tokens.values()]
+
+    async def worker(k):
+        for i in range(k, requests, concurrency):
+            await recorder.request(client, "POST", "/auth/refresh-token", json={"refresh_token": refresh_tokens[i % len(refresh_tokens)]})
+
+    return await _run(recorder, [worker(k) for k in range(concurrency)])
+
+
+async def bench_crud(client, engine, tokens, cycles: int, concurrency: int) -> dict:
+    recorder = Recorder(engine)
+    headers = [_auth(token["access_token"]) for token in tokens.values()]
+
+    async def worker(k):
+        for i in range(k, cycles, concurrency):
+            auth = headers[i % len(headers)]
+            created = await recorder.request(client, "POST", "/tasks/", json={"title": f"Bench {i}", "description": "D"}, headers=auth)
+            task_id = created.json()["id"]
+            await recorder.request(client, "GET", f"/tasks/{task_id}", headers=auth)
+            await recorder.request(client, "PUT", f"/tasks/{task_id}", json={"completed": True}, headers=auth)
+            await recorder.request(client, "DELETE", f"/tasks/{task_id}", headers=auth)
+
+    return await _run(recorder, [worker(k) for k in range(concurrency)])
+
+
+async def bench_list(client, engine, token: dict, requests: int, cached: bool) -> dict:
+    recorder = Recorder(engine)
+
+    async def worker():
+        for _ in range(requests):
+            if not cached:
+                # Mide el camino hasta la BD, no la caché de lecturas
+                task_cache.cache.clear()
+            await recorder.request(client, "GET", "/tasks/", params={"limit": 500}, headers=_auth(token["access_token"]))
+
+    return await _run(recorder, [worker()])
+
+
+async def bench_mixed(client, engine, tokens, requests: int, concurrency: int, seed: int = 7) -> dict:
+    recorder = Recorder(engine)
+    users = list(tokens.values())
+
+    async def worker(k):
+        rng = random.Random(seed + k)
+        auth = _auth(users[k % len(users)]["access_token"])
+        page = (await client.get("/tasks/", params={"limit": 100}, headers=auth)).json()
+        ids = [task["id"] for task in page]
+        for _ in range(k, requests, concurrency):
+            operation = rng.choices(list(MIX), weights=list(MIX.values()))[0]
+            if operation == "list":
+                await recorder.request(client, "GET", "/tasks/", params={"limit": 100}, headers=auth)
+            elif operation == "create" or not ids:
+                created = await recorder.request(client, "POST", "/tasks/", json={"title": "Mixta", "description": "D"}, headers=auth)
+                ids.append(created.json()["id"])
+            elif operation == "read":
+                await recorder.request(client, "GET", f"/tasks/{rng.choice(ids)}", headers=auth)
+            elif operation == "update":
+                await recorder.request(client, "PUT", f"/tasks/{rng.choice(ids)}", json={"completed": rng.random() < 0.5}, headers=auth)
+            else:
+                await recorder.request(client, "DELETE", f"/tasks/{ids.pop(rng.randrange(len(ids)))}", headers=auth)
+
+    return await _run(recorder, [worker(k) for k in range(concurrency)])
+
+
+async def run_suite(engine, dataset, args) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        tokens = await _login_all(client, [email for _, email in dataset.users[:args.concurrency]])
+        list_tokens = await _login_all(client, [email for _, email in dataset.list_users.values()])
+        results = {
+            "login": await bench_login(client, engine, dataset, args.requests // 4, args.concurrency),
+            "refresh": await bench_refresh(client, engine, tokens, args.requests, args.concurrency),
+            "crud": await bench_crud(client, engine, tokens, args.requests // 4, args.concurrency),
+        }
+        for size, (_, email) in dataset.list_users.items():
+            results[f"list_{size}"] = await bench_list(client, engine, list_tokens[email], max(20, args.requests // 4), cached=False)
+            results[f"list_{size}_cached"] = await bench_list(client, engine, list_tokens[email], max(20, args.requests // 4), cached=True)
+        results["mixed"] = await bench_mixed(client, engine, tokens, args.requests, args.concurrency)
+    return results
+
+
+def _median_results(runs: list[dict]) -> dict:
+    """Mediana de cada métrica entre varias ejecuciones de la suite."""
+    return {
+        name: {key: statistics.median(run[name][key] for run in runs) for key in runs[0][name]}
+        for name in runs[0]
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Cargas que empeoran respecto a la línea base: más latencia mediana, menos throughput
+    o más consultas. Las colas (p95/p99) se informan pero no se comparan: en una misma
+    máquina varían demasiado entre ejecuciones, sobre todo con escrituras concurrentes en SQLite.
+    """
+    regressions = []
+    for name, current in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if current["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {base['p50_ms']} -> {current['p50_ms']} ms")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput_rps']} -> {current['throughput_rps']} req/s")
+        # Las consultas por petición no dependen de la máquina: cualquier aumento es una regresión
+        if current["queries_per_request"] > base["queries_per_request"] * 1.05 + 0.05:
+            regressions.append(f"{name}: queries/request {base['queries_per_request']} -> {current['queries_per_request']}")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {current['errors']}")
+    return regressions
+
+
+def _print_table(results: dict, baseline: dict | None):
+    print(f"{'carga':<18}{'peticiones':>11}{'errores':>9}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'consultas':>11}{'Δp50':>8}")
+    for name, r in results["results"].items():
+        base = (baseline or {}).get("results", {}).get(name)
+        delta = f"{(r['p50_ms'] / base['p50_ms'] - 1) * 100:+.0f}%" if base and base["p50_ms"] else ""
+        print(f"{name:<18}{r['requests']:>11}{r['errors']:>9}{r['throughput_rps']:>10.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+              f"{r['p99_ms']:>9.2f}{r['queries_per_request']:>11.2f}{delta:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="URL de la BD (por defecto BENCH_DATABASE_URL o un SQLite temporal)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--tasks", type=int, default=100, help="tareas por usuario")
+    parser.add_argument("--requests", type=int, default=400, help="peticiones de las cargas principales")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--out", type=Path, help="fichero JSON de resultados")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="guarda los resultados como nueva línea base")
+    parser.add_argument("--tolerance", type=float, default=0.4, help="empeoramiento admitido (0.4 = 40%%)")
+    parser.add_argument("--repeat", type=int, default=1, help="ejecuciones (con datos nuevos) de las que se toma la mediana")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for _ in range(args.repeat):
+        engine = bench_engine("suite", args.db)
+        dataset = generate(engine, args.users, args.tasks, LIST_SIZES)
+        try:
+            with use_engine(engine):
+                runs.append(asyncio.run(run_suite(engine, dataset, args)))
+        finally:
+            engine.dispose()
+        task_cache.cache.clear()
+    results = _median_results(runs)
+
+    output = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "database": engine.dialect.name,
+            "users": args.users, "tasks_per_user": args.tasks,
+            "requests": args.requests, "concurrency": args.concurrency, "repeat": args.repeat,
+            "python": platform.python_version(), "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() and not args.save_baseline else None
+    _print_table(output, baseline)
+    if args.out:
+        args.out.write_text(json.dumps(output, indent=2) + "\n")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(output, indent=2) + "\n")
+        print(f"Línea base guardada en {args.baseline}")
+        return 0
+    if baseline is None:
+        return 0
+    if baseline["meta"]["database"] != output["meta"]["database"]:
+        print(f"La línea base es de {baseline['meta']['database']}; no se compara.")
+        return 0
+    regressions = compare(output, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESIÓN {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
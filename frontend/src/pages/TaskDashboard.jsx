@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { useAuth } from "../contexts/AuthContext";
 import ThemeToggle from "../components/ThemeToggle";
 
@@ -9,7 +9,9 @@ function TaskDashboard() {
     const [error, setError] = useState("");
     const [isLoading, setIsLoading] = useState(false);
     const [isFormExpanded, setIsFormExpanded] = useState(false);
-    const { authFetch, logout, user } = useAuth();
+    const { authFetch, logout, user, accessToken } = useAuth();
+    // Cursor de GET /tasks/changes: posición de la última modificación aplicada localmente
+    const syncCursor = useRef(null);
 
     const API_URL = import.meta.env.VITE_API_URL || "https://special-fortnight-r95xx6g67pj3x6r7-8000.app.github.dev";
 
@@ -19,16 +21,31 @@ function TaskDashboard() {
         setError("");
         try {
             console.log("Fetching tasks from:", `${API_URL}/tasks/`);
-            
-            const response = await authFetch(`${API_URL}/tasks/`);
-            
-            if (!response.ok) {
-                const errorText = await response.text();
-                console.error("Error response:", errorText);
-                throw new Error(`Error al obtener tareas: ${response.status}`);
-            }
-            
-            const data = await response.json();
+
+            // El endpoint está paginado: seguimos X-Next-Cursor hasta la última página
+            let data = [];
+            let cursor = null;
+            let firstPage = true;
+            do {
+                const url = cursor
+                    ? `${API_URL}/tasks/?limit=500&cursor=${encodeURIComponent(cursor)}`
+                    : `${API_URL}/tasks/?limit=500`;
+                const response = await authFetch(url);
+
+                if (!response.ok) {
+                    const errorText = await response.text();
+                    console.error("Error response:", errorText);
+                    throw new Error(`Error al obtener tareas: ${response.status}`);
+                }
+
+                if (firstPage) {
+                    syncCursor.current = Number(response.headers.get("X-Sync-Cursor"));
+                    firstPage = false;
+                }
+                data = data.concat(await response.json());
+                cursor = response.headers.get("X-Next-Cursor");
+            } while (cursor);
+
             console.log("Tasks received:", data);
             setTasks(data);
         } catch(err) {
@@ -39,11 +56,108 @@ function TaskDashboard() {
         }
     };
 
+    // Trae solo las tareas cambiadas, borradas o archivadas desde el último cursor
+    const syncChanges = async () => {
+        if (syncCursor.current === null) {
+            return fetchTasks();
+        }
+        let changes;
+        do {
+            const response = await authFetch(`${API_URL}/tasks/changes?since=${syncCursor.current}`);
+            if (!response.ok) {
+                throw new Error(`Error al sincronizar tareas: ${response.status}`);
+            }
+            changes = await response.json();
+            const deleted = new Set([...changes.deleted, ...changes.archived]);
+            const changed = new Map(changes.changed.map((task) => [task.id, task]));
+            setTasks((current) => {
+                const kept = current
+                    .filter((task) => !deleted.has(task.id))
+                    .map((task) => changed.get(task.id) || task);
+                const known = new Set(kept.map((task) => task.id));
+                return kept.concat(changes.changed.filter((task) => !known.has(task.id)));
+            });
+            syncCursor.current = changes.cursor;
+        } while (changes.has_more);
+    };
+
+    // Aplica localmente el resultado de una mutación si no nos hemos perdido otros cambios;
+    // si X-Sync-Base no coincide con nuestro cursor, pedimos los cambios pendientes.
+    const applyMutation = async (response, patch) => {
+        const base = Number(response.headers.get("X-Sync-Base"));
+        if (syncCursor.current !== null && base === syncCursor.current) {
+            setTasks(patch);
+            syncCursor.current = Number(response.headers.get("X-Sync-Cursor"));
+        } else {
+            await syncChanges();
+        }
+    };
+
     // Se llama a fetchTasks al montar el componente
     useEffect(() => {
         fetchTasks();
     }, []);
 
+    // Cambios hechos desde otras pestañas o dispositivos, recibidos por /ws/tasks
+    const applyEvent = async (event) => {
+        if (event.type === "ping" || syncCursor.current === null) {
+            return;
+        }
+        if (event.type === "resync") {
+            return syncChanges();
+        }
+        if (event.cursor <= syncCursor.current) {
+            // Ya aplicado (por ejemplo, la respuesta de una mutación nuestra)
+            return;
+        }
+        if (event.type === "changed" || event.base !== syncCursor.current) {
+            return syncChanges();
+        }
+        if (event.type === "deleted") {
+            const deleted = new Set(event.ids);
+            setTasks((current) => current.filter((task) => !deleted.has(task.id)));
+        } else {
+            const changed = new Map(event.tasks.map((task) => [task.id, task]));
+            setTasks((current) => {
+                const kept = current.map((task) => changed.get(task.id) || task);
+                const known = new Set(kept.map((task) => task.id));
+                return kept.concat(event.tasks.filter((task) => !known.has(task.id)));
+            });
+        }
+        syncCursor.current = event.cursor;
+    };
+
+    // Se reconecta al renovarse el token (el servidor cierra la conexión cuando caduca)
+    useEffect(() => {
+        if (!accessToken) {
+            return;
+        }
+        let socket;
+        let retry;
+        let closed = false;
+        const connect = () => {
+            socket = new WebSocket(`${API_URL.replace(/^http/, "ws")}/ws/tasks?token=${encodeURIComponent(accessToken)}`);
+            socket.onmessage = (message) => {
+                applyEvent(JSON.parse(message.data)).catch((err) => console.error("Error applying task event:", err));
+            };
+            socket.onopen = () => {
+                // Lo ocurrido mientras estábamos desconectados
+                syncChanges().catch((err) => console.error("Error syncing tasks:", err));
+            };
+            socket.onclose = () => {
+                if (!closed) {
+                    retry = setTimeout(connect, 5000);
+                }
+            };
+        };
+        connect();
+        return () => {
+            closed = true;
+            clearTimeout(retry);
+            socket.close();
+        };
+    }, [accessToken]);
+
     // Función para crear una nueva tarea
     const handleCreateTask = async (e) => {
         e.preventDefault();
@@ -64,8 +178,9 @@ function TaskDashboard() {
                 throw new Error(`Error al crear tarea: ${response.status}`);
             }
 
-            // Actualiza la lista de tareas con la tarea recién creada
-            await fetchTasks();
+            // Añade la tarea recién creada a la lista
+            const created = await response.json();
+            await applyMutation(response, (current) => [...current, created]);
             setNewTaskTitle("");
             setNewTaskDescription("");
         } catch (err) {
@@ -88,8 +203,8 @@ function TaskDashboard() {
                 throw new Error(`Error al eliminar tarea: ${response.status}`);     
             }
 
-            // Actualiza la lista de tareas después de eliminar
-            await fetchTasks();
+            // Quita la tarea de la lista
+            await applyMutation(response, (current) => current.filter((task) => task.id !== taskId));
         } catch(err) {
             console.error("Error deleting task:", err);
             setError("Error al eliminar la tarea");
@@ -110,8 +225,9 @@ function TaskDashboard() {
                 throw new Error(`Error al actualizar tarea: ${response.status}`);
             }
 
-            // Actualiza la lista de tareas después de la actualización
-            await fetchTasks();
+            // Sustituye la tarea actualizada en la lista
+            const updated = await response.json();
+            await applyMutation(response, (current) => current.map((task) => (task.id === taskId ? updated : task)));
         } catch (err) {
             console.error("Error updating task:", err);
             setError("Error al actualizar la tarea");
@@ -5,7 +5,8 @@ from sqlalchemy import pool
 
 from alembic import context
 
-from app.database import Base
+from app.database import Base, DATABASE_URL
+from app import models  # noqa: F401  (registra las tablas en Base.metadata)
 
 
 # this is the Alembic Config object, which provides
@@ -17,6 +18,12 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# La aplicación ya no crea las tablas al arrancar: las migraciones usan la misma
+# DATABASE_URL que ella (alembic.ini solo aporta el valor por defecto)
+# `alembic -x url=...` migra otra BD con el mismo esquema, p. ej. cada shard
+url = context.get_x_argument(as_dictionary=True).get("url", DATABASE_URL)
+config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
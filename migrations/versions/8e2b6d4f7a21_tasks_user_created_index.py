@@ -0,0 +1,38 @@
+"""composite index for keyset pagination of tasks
+
+Revision ID: 8e2b6d4f7a21
+Revises: 3c1f0a9b2d10
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2b6d4f7a21'
+down_revision: Union[str, None] = '3c1f0a9b2d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # tasks.user_id no tenía índice: este índice compuesto sirve tanto para
+    # filtrar por usuario como para paginar por (created_at, id).
+    if op.get_bind().dialect.name == "postgresql":
+        # CONCURRENTLY no bloquea escrituras, pero no puede ir dentro de una transacción
+        with op.get_context().autocommit_block():
+            op.create_index(
+                "ix_tasks_user_id_created_at_id", "tasks", ["user_id", "created_at", "id"],
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+    else:
+        op.create_index("ix_tasks_user_id_created_at_id", "tasks", ["user_id", "created_at", "id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tasks_user_id_created_at_id", table_name="tasks")
@@ -0,0 +1,34 @@
+"""user -> shard directory for horizontal sharding of tasks
+
+Revision ID: a7c5e9b1d3f2
+Revises: f3a8d2c6b519
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c5e9b1d3f2'
+down_revision: Union[str, None] = 'f3a8d2c6b519'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Los usuarios sin fila siguen en la BD principal (su ubicación antes del sharding)
+    op.create_table(
+        "user_shards",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("shard", sa.String(length=64), nullable=False),
+        sa.Column("moving_to", sa.String(length=64), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("user_shards")
@@ -0,0 +1,56 @@
+"""archive table for old completed tasks, partitioned by creation year
+
+Revision ID: b9d4f1e6c2a8
+Revises: a7c5e9b1d3f2
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d4f1e6c2a8'
+down_revision: Union[str, None] = 'a7c5e9b1d3f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # En PostgreSQL, particionado declarativo por rango de created_at: el archivado crea
+    # una partición por año y las de años que ya no interesan se pueden separar o borrar
+    op.create_table(
+        "tasks_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("completed", sa.Boolean(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("change_seq", sa.BigInteger(), server_default="0", nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id", "created_at"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE TABLE IF NOT EXISTS tasks_archive_default PARTITION OF tasks_archive DEFAULT")
+    # En una tabla particionada el índice se crea en cada partición
+    op.create_index("ix_tasks_archive_user_id_created_at_id", "tasks_archive", ["user_id", "created_at", "id"])
+    # GET /tasks/changes devuelve las tareas archivadas después del cursor
+    op.create_index("ix_tasks_archive_user_id_change_seq", "tasks_archive", ["user_id", "change_seq"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Devuelve las tareas archivadas a tasks antes de borrar la tabla (y sus particiones)
+    op.execute("""
+        INSERT INTO tasks (id, title, description, completed, created_at, updated_at, change_seq, user_id)
+        SELECT id, title, description, completed, created_at, updated_at, change_seq, user_id FROM tasks_archive
+    """)
+    op.drop_index("ix_tasks_archive_user_id_change_seq", table_name="tasks_archive")
+    op.drop_index("ix_tasks_archive_user_id_created_at_id", table_name="tasks_archive")
+    op.drop_table("tasks_archive")
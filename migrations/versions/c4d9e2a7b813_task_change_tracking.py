@@ -0,0 +1,47 @@
+"""change tracking and soft-delete tombstones for delta sync
+
+Revision ID: c4d9e2a7b813
+Revises: 8e2b6d4f7a21
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d9e2a7b813'
+down_revision: Union[str, None] = '8e2b6d4f7a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("users", sa.Column("change_seq", sa.BigInteger(), nullable=False, server_default="0"))
+    op.add_column("tasks", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    op.add_column("tasks", sa.Column("deleted_at", sa.DateTime(), nullable=True))
+    op.add_column("tasks", sa.Column("change_seq", sa.BigInteger(), nullable=False, server_default="0"))
+
+    # Las tareas existentes reciben su id como posición inicial: los ids ya crecen
+    # por usuario, y cada usuario continúa su secuencia a partir del máximo.
+    op.execute("UPDATE tasks SET change_seq = id, updated_at = created_at")
+    op.execute(
+        "UPDATE users SET change_seq = COALESCE((SELECT MAX(tasks.id) FROM tasks WHERE tasks.user_id = users.id), 0)"
+    )
+    op.create_index("ix_tasks_user_id_change_seq", "tasks", ["user_id", "change_seq"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tasks_user_id_change_seq", table_name="tasks")
+    # Las lápidas no existen en el esquema anterior
+    op.execute("DELETE FROM tasks WHERE deleted_at IS NOT NULL")
+    with op.batch_alter_table("tasks") as batch_op:
+        batch_op.drop_column("change_seq")
+        batch_op.drop_column("deleted_at")
+        batch_op.drop_column("updated_at")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("change_seq")
@@ -0,0 +1,79 @@
+"""full-text search over task title and description
+
+Revision ID: e1b7c3d9f402
+Revises: c4d9e2a7b813
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1b7c3d9f402'
+down_revision: Union[str, None] = 'c4d9e2a7b813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        # btree_gin permite incluir user_id en el índice GIN: el filtro por usuario va dentro del índice
+        op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+        # Añadir una columna STORED reescribe la tabla; el índice se crea después sin bloquear escrituras
+        op.execute("""
+            ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+            ) STORED
+        """)
+        with op.get_context().autocommit_block():
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_user_id_search_vector "
+                "ON tasks USING gin (user_id, search_vector) WHERE deleted_at IS NULL"
+            )
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts "
+            "USING fts5(title, description, owner, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks WHEN new.deleted_at IS NULL BEGIN
+                INSERT INTO tasks_fts (rowid, title, description, owner) VALUES (new.id, new.title, new.description, 'u' || new.user_id);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description, deleted_at, user_id ON tasks BEGIN
+                DELETE FROM tasks_fts WHERE rowid = old.id;
+                INSERT INTO tasks_fts (rowid, title, description, owner)
+                    SELECT new.id, new.title, new.description, 'u' || new.user_id WHERE new.deleted_at IS NULL;
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+                DELETE FROM tasks_fts WHERE rowid = old.id;
+            END
+        """)
+        # Indexa las tareas existentes
+        op.execute("DELETE FROM tasks_fts")
+        op.execute(
+            "INSERT INTO tasks_fts (rowid, title, description, owner) "
+            "SELECT id, title, description, 'u' || user_id FROM tasks WHERE deleted_at IS NULL"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_tasks_user_id_search_vector")
+        op.execute("ALTER TABLE tasks DROP COLUMN IF EXISTS search_vector")
+    elif dialect == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS tasks_fts_insert")
+        op.execute("DROP TRIGGER IF EXISTS tasks_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS tasks_fts_delete")
+        op.execute("DROP TABLE IF EXISTS tasks_fts")
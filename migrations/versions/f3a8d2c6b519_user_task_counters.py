@@ -0,0 +1,49 @@
+"""per-user task counters and index for task statistics
+
+Revision ID: f3a8d2c6b519
+Revises: e1b7c3d9f402
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8d2c6b519'
+down_revision: Union[str, None] = 'e1b7c3d9f402'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("users", sa.Column("task_count", sa.BigInteger(), nullable=False, server_default="0"))
+    op.add_column("users", sa.Column("completed_task_count", sa.BigInteger(), nullable=False, server_default="0"))
+    # Desde aquí los mantiene la aplicación en cada mutación; se inicializan con un único recorrido
+    op.execute("""
+        UPDATE users SET
+            task_count = (SELECT COUNT(*) FROM tasks WHERE tasks.user_id = users.id AND tasks.deleted_at IS NULL),
+            completed_task_count = (
+                SELECT COUNT(*) FROM tasks
+                WHERE tasks.user_id = users.id AND tasks.deleted_at IS NULL AND tasks.completed
+            )
+    """)
+
+    index = ("ix_tasks_user_id_completed_created_at", "tasks", ["user_id", "completed", "created_at"])
+    where = sa.text("deleted_at IS NULL")
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(*index, postgresql_where=where, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index(*index, sqlite_where=where, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tasks_user_id_completed_created_at", table_name="tasks")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("completed_task_count")
+        batch_op.drop_column("task_count")
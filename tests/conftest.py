@@ -1,34 +1,90 @@
+import os
 import pytest
+
+# Los tests crean sus propias tablas y sustituyen get_db: el calentamiento del arranque
+# (conexión a DATABASE_URL, procesos de bcrypt) solo se activa en los tests que lo prueban
+os.environ.setdefault("STARTUP_WARMUP", "false")
+# Un solo proceso: las revocaciones se guardan en la BD de cada test y no hay que sincronizarlas
+os.environ.setdefault("REVOCATION_SYNC_SECONDS", "0")
+# Las métricas vienen desactivadas por defecto; los tests las activan sin token
+os.environ.setdefault("METRICS_ENABLED", "true")
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 from app.database import Base, get_db
 from app.models import User
-from app.routes.auth import hash_password
+from app.services.auth_service import hash_password
 from app.main import app
+from app.services import principal_cache, query_budget as query_budget_service, task_cache
+from app.services.auth_service import clear_token_cache
 from fastapi.testclient import TestClient
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="function", params=["sync", "async"])
+def db_mode(request):
+    """Cada test con base de datos se ejecuta en modo síncrono y en modo asíncrono (aiosqlite)."""
+    return request.param
+
+
+@pytest.fixture(scope="function")
+def engine(db_mode, tmp_path):
+    if db_mode == "sync":
+        engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        # aiosqlite no comparte una BD en memoria con el engine síncrono, así que usamos un fichero
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def async_engine(db_mode, tmp_path):
+    """Engine aiosqlite sobre el mismo fichero que `engine`, solo en modo asíncrono."""
+    if db_mode == "sync":
+        yield None
+    else:
+        yield create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=NullPool)
+
+
+@pytest.fixture(scope="function")
+def app_engine(engine, async_engine):
+    """Engine con el que la aplicación ejecuta las consultas (el síncrono subyacente en modo async)."""
+    return engine if async_engine is None else async_engine.sync_engine
+
 
 @pytest.fixture(scope="function")
-def db_session():
+def db_session(engine):
     # Crea las tablas al inicio del test
     Base.metadata.create_all(bind=engine)
-    session = TestingSessionLocal()
+    principal_cache.clear()
+    task_cache.cache.clear()
+    clear_token_cache()
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
     yield session
     session.close()
     # Limpia la base de datos al final del test
     Base.metadata.drop_all(bind=engine)
 
 @pytest.fixture(scope="function")
-def client(db_session):
-    def override_get_db():
-        yield db_session
+def client(db_session, async_engine):
+    if async_engine is None:
+        def override_get_db():
+            yield db_session
+    else:
+        AsyncTestingSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+        async def override_get_db():
+            async with AsyncTestingSession() as session:
+                yield session
     app.dependency_overrides[get_db] = override_get_db
     with TestClient(app) as c:
         yield c
+        if async_engine is not None:
+            # El engine asíncrono pertenece al event loop del cliente: se cierra en él
+            c.portal.call(async_engine.dispose)
+    app.dependency_overrides.clear()
 
 
 @pytest.fixture(scope="function")
@@ -47,3 +103,33 @@ def test_user(db_session):
     db_session.commit()
     db_session.refresh(new_user)
     return new_user
+
+
+@pytest.fixture(scope="function")
+def auth_headers(client):
+    """
+    Inicia sesión con /auth/login y devuelve la cabecera Authorization con el token.
+    Por defecto con test_user:
+
+        headers = auth_headers()
+        other_headers = auth_headers("otro@example.com", "otropassword")
+    """
+    def login(email: str = "test@example.com", password: str = "testpassword"):
+        login_response = client.post("/auth/login", json={"email": email, "password": password})
+        assert login_response.status_code == 200, f"Login failed: {login_response.json()}"
+        return {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    return login
+
+
+@pytest.fixture(scope="function")
+def query_budget(app_engine):
+    """
+    Bloque con presupuesto de consultas sobre el engine de la aplicación. Falla si el
+    bloque ejecuta más sentencias o repite una misma sentencia (patrón N+1):
+
+        with query_budget(2):
+            client.get("/tasks/", headers=headers)
+    """
+    def budget(max_queries: int):
+        return query_budget_service.count_queries(app_engine, max_queries=max_queries)
+    return budget
@@ -0,0 +1,189 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update
+from app.models import Task, TaskArchive, User
+from app.routes import tasks
+from app.services import archive, task_service
+
+
+def _create_tasks(client, headers, db_session):
+    """Cinco tareas creadas hace 500 días; las dos primeras, completadas y sin tocar desde entonces."""
+    ids = []
+    for i in range(5):
+        created = client.post("/tasks/", json={"title": f"Tarea {i}", "description": "x"}, headers=headers)
+        assert created.status_code == 201, created.json()
+        ids.append(created.json()["id"])
+        if i < 2:
+            client.put(f"/tasks/{ids[-1]}", json={"completed": True}, headers=headers)
+    old = datetime.utcnow() - timedelta(days=500)
+    for i, task_id in enumerate(ids):
+        db_session.execute(update(Task).where(Task.id == task_id).values(created_at=old + timedelta(seconds=i)))
+    db_session.execute(update(Task).where(Task.completed.is_(True)).values(updated_at=old))
+    db_session.commit()
+    return ids
+
+
+def _titles(client, headers, **params):
+    response = client.get("/tasks/", params=params, headers=headers)
+    assert response.status_code == 200, response.json()
+    return [task["title"] for task in response.json()]
+
+
+def test_archived_tasks_leave_default_list(client, test_user, db_session, auth_headers):
+    headers = auth_headers()
+    _create_tasks(client, headers, db_session)
+    before = client.get("/tasks/", headers=headers)
+
+    archived, versions = task_service.archive_completed_tasks(db_session, datetime.utcnow() - timedelta(days=365), 100)
+
+    assert archived == 2
+    assert db_session.scalar(select(func.count()).select_from(TaskArchive)) == 2
+    assert db_session.scalar(select(func.count()).select_from(Task)) == 3
+    # La versión del usuario sube: el listado cacheado y su ETag dejan de valer
+    assert versions == {test_user.id: db_session.get(User, test_user.id).change_seq}
+    response = client.get("/tasks/", headers={**headers, "If-None-Match": before.headers["ETag"]})
+    assert response.status_code == 200
+    assert [task["title"] for task in response.json()] == ["Tarea 2", "Tarea 3", "Tarea 4"]
+    assert _titles(client, headers, include_archived="true") == [f"Tarea {i}" for i in range(5)]
+    # Los contadores siguen incluyendo las archivadas
+    assert client.get("/tasks/stats", headers=headers).json()["total"] == 5
+
+
+def test_archived_tasks_are_reported_by_changes_feed(client, test_user, db_session, auth_headers):
+    headers = auth_headers()
+    ids = _create_tasks(client, headers, db_session)
+    cursor = client.get("/tasks/changes", headers=headers).json()["cursor"]
+
+    task_service.archive_completed_tasks(db_session, datetime.utcnow() - timedelta(days=365), 100)
+
+    # Los clientes sincronizados quitan las archivadas, como las borradas
+    changes = client.get("/tasks/changes", params={"since": cursor}, headers=headers).json()
+    assert (changes["changed"], changes["deleted"], changes["archived"]) == ([], [], ids[:2])
+    assert changes["cursor"] == db_session.get(User, test_user.id).change_seq
+    # Con límite, el lote no se parte y has_more también mira el archivo
+    page = client.get("/tasks/changes", params={"since": 0, "limit": 3}, headers=headers).json()
+    assert [task["id"] for task in page["changed"]] == ids[2:]
+    assert page["has_more"] is True
+    rest = client.get("/tasks/changes", params={"since": page["cursor"]}, headers=headers).json()
+    assert (rest["archived"], rest["has_more"]) == (ids[:2], False)
+    whole_batch = client.get("/tasks/changes", params={"since": 0, "limit": 4}, headers=headers).json()
+    assert (whole_batch["archived"], whole_batch["has_more"]) == (ids[:2], False)
+
+
+def test_archived_tasks_are_read_and_exported(client, test_user, db_session, auth_headers):
+    headers = auth_headers()
+    ids = _create_tasks(client, headers, db_session)
+    task_service.archive_completed_tasks(db_session, datetime.utcnow() - timedelta(days=365), 100)
+
+    response = client.get(f"/tasks/{ids[0]}", headers=headers)
+    assert response.status_code == 200
+    assert (response.json()["title"], response.json()["completed"]) == ("Tarea 0", True)
+    assert client.get(f"/tasks/{ids[0]}", headers={**headers, "If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    exported = client.get("/tasks/export", headers=headers).text.splitlines()
+    assert [json.loads(line)["title"] for line in exported] == [f"Tarea {i}" for i in range(5)]
+    exported = client.get("/tasks/export", params={"include_archived": "false"}, headers=headers).text.splitlines()
+    assert [json.loads(line)["title"] for line in exported] == ["Tarea 2", "Tarea 3", "Tarea 4"]
+    # La búsqueda solo recorre las activas
+    found = client.get("/tasks/search", params={"q": "Tarea"}, headers=headers).json()
+    assert sorted(task["id"] for task in found) == ids[2:]
+
+
+def test_stats_histogram_includes_archived_tasks(client, test_user, db_session, auth_headers):
+    headers = auth_headers()
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    db_session.add(Task(title="Activa", description="D", completed=True, user_id=test_user.id, created_at=today))
+    db_session.add(TaskArchive(id=1000, title="Archivada", completed=True, created_at=today, user_id=test_user.id))
+    db_session.commit()
+
+    histogram = client.get("/tasks/stats", params={"days": 1}, headers=headers).json()["created_per_day"]
+    assert [(day["created"], day["completed"]) for day in histogram] == [(2, 2)]
+
+
+def test_include_archived_paginates_across_both_tables(client, test_user, db_session, auth_headers):
+    headers = auth_headers()
+    _create_tasks(client, headers, db_session)
+    task_service.archive_completed_tasks(db_session, datetime.utcnow() - timedelta(days=365), 100)
+
+    titles, cursor = [], None
+    while True:
+        params = {"limit": 2, "include_archived": "true", **({"cursor": cursor} if cursor else {})}
+        response = client.get("/tasks/", params=params, headers=headers)
+        titles += [task["title"] for task in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert titles == [f"Tarea {i}" for i in range(5)]
+    assert _titles(client, headers, include_archived="true", completed="true") == ["Tarea 0", "Tarea 1"]
+    assert _titles(client, headers, include_archived="true", title_prefix="Tarea 1") == ["Tarea 1"]
+
+
+def test_recent_and_pending_tasks_are_not_archived(client, test_user, db_session, auth_headers):
+    headers = auth_headers()
+    ids = _create_tasks(client, headers, db_session)
+    # Completada hoy: aunque se creó hace tiempo, aún no se archiva
+    client.put(f"/tasks/{ids[2]}", json={"completed": True}, headers=headers)
+    client.delete(f"/tasks/{ids[0]}", headers=headers)
+
+    archived, _ = task_service.archive_completed_tasks(db_session, datetime.utcnow() - timedelta(days=365), 100)
+
+    assert archived == 1
+    assert db_session.scalars(select(TaskArchive.id)).all() == [ids[1]]
+    assert task_service.archive_completed_tasks(db_session, datetime.utcnow() - timedelta(days=365), 100) == (0, {})
+
+
+def test_archive_job_runs_in_batches(client, test_user, db_session, engine, auth_headers):
+    headers = auth_headers()
+    _create_tasks(client, headers, db_session)
+
+    assert asyncio.run(archive.archive({"primary": engine}, older_than_days=365, batch_size=1)) == 2
+    db_session.expire_all()
+    assert db_session.scalar(select(func.count()).select_from(TaskArchive)) == 2
+    assert _titles(client, headers) == ["Tarea 2", "Tarea 3", "Tarea 4"]
+
+
+def test_archived_tasks_can_be_updated_and_deleted(client, test_user, db_session, query_budget, auth_headers):
+    headers = auth_headers()
+    ids = _create_tasks(client, headers, db_session)
+    task_service.archive_completed_tasks(db_session, datetime.utcnow() - timedelta(days=365), 100)
+    cursor = client.get("/tasks/changes", headers=headers).json()["cursor"]
+
+    # Al modificarla, la tarea vuelve a tasks con una nueva versión
+    with query_budget(tasks.update_task_endpoint.query_budget):
+        response = client.put(f"/tasks/{ids[0]}", json={"title": "Reabierta", "completed": False}, headers=headers)
+    assert response.status_code == 200, response.json()
+    assert (response.json()["title"], response.json()["completed"]) == ("Reabierta", False)
+    assert "Reabierta" in _titles(client, headers)
+    changes = client.get("/tasks/changes", params={"since": cursor}, headers=headers).json()
+    assert ([task["id"] for task in changes["changed"]], changes["archived"]) == ([ids[0]], [])
+    stats = client.get("/tasks/stats", headers=headers).json()
+    assert (stats["total"], stats["completed"]) == (5, 1)
+
+    # Al borrarla deja de contar y queda como lápida en tasks
+    with query_budget(tasks.delete_task_endpoint.query_budget):
+        assert client.delete(f"/tasks/{ids[1]}", headers=headers).status_code == 204
+    assert client.get(f"/tasks/{ids[1]}", headers=headers).status_code == 404
+    assert client.delete(f"/tasks/{ids[1]}", headers=headers).status_code == 404
+    stats = client.get("/tasks/stats", headers=headers).json()
+    assert (stats["total"], stats["completed"]) == (4, 0)
+    db_session.expire_all()
+    assert db_session.scalar(select(func.count()).select_from(TaskArchive)) == 0
+
+
+def test_archived_tasks_can_be_bulk_updated_and_deleted(client, test_user, db_session, auth_headers):
+    headers = auth_headers()
+    ids = _create_tasks(client, headers, db_session)
+    task_service.archive_completed_tasks(db_session, datetime.utcnow() - timedelta(days=365), 100)
+
+    response = client.patch("/tasks/bulk", json=[{"id": ids[0], "completed": False}, {"id": ids[2], "completed": False}], headers=headers)
+    assert [item["status"] for item in response.json()] == ["updated", "updated"]
+    assert response.json()[0]["task"]["completed"] is False
+    assert _titles(client, headers, completed="false") == ["Tarea 0", "Tarea 2", "Tarea 3", "Tarea 4"]
+
+    response = client.request("DELETE", "/tasks/bulk", json={"ids": [ids[1], ids[3], 999999]}, headers=headers)
+    assert [item["status"] for item in response.json()] == ["deleted", "deleted", "not_found"]
+    stats = client.get("/tasks/stats", headers=headers).json()
+    assert (stats["total"], stats["completed"]) == (3, 0)
+    db_session.expire_all()
+    assert db_session.scalar(select(func.count()).select_from(TaskArchive)) == 0
@@ -0,0 +1,81 @@
+from app.routes import tasks as task_routes
+
+
+def test_bulk_create_tasks(client, test_user, auth_headers):
+    headers = auth_headers()
+    items = [{"title": f"Tarea {i}", "description": f"Descripción {i}"} for i in range(5)]
+
+    response = client.post("/tasks/bulk", json=items, headers=headers)
+
+    assert response.status_code == 201, response.json()
+    created = response.json()
+    assert [task["title"] for task in created] == [item["title"] for item in items]
+    assert all(task["completed"] is False and task["user_id"] == test_user.id for task in created)
+    assert len(client.get("/tasks/", headers=headers).json()) == 5
+
+
+def test_bulk_update_tasks(client, test_user, auth_headers):
+    headers = auth_headers()
+    created = client.post("/tasks/bulk", json=[{"title": f"T{i}", "description": "D"} for i in range(3)], headers=headers).json()
+    ids = [task["id"] for task in created]
+
+    response = client.patch("/tasks/bulk", json=[
+        {"id": ids[0], "completed": True},
+        {"id": ids[1], "completed": True},
+        {"id": ids[2], "title": "Renombrada"},
+        {"id": 9999, "completed": True},
+    ], headers=headers)
+
+    assert response.status_code == 200, response.json()
+    results = response.json()
+    assert [result["status"] for result in results] == ["updated", "updated", "updated", "not_found"]
+    assert results[0]["task"]["completed"] is True
+    assert results[2]["task"]["title"] == "Renombrada" and results[2]["task"]["completed"] is False
+    assert results[3]["task"] is None
+
+    read = client.get(f"/tasks/{ids[1]}", headers=headers).json()
+    assert read["completed"] is True
+
+
+def test_bulk_delete_tasks(client, test_user, auth_headers):
+    headers = auth_headers()
+    created = client.post("/tasks/bulk", json=[{"title": f"T{i}", "description": "D"} for i in range(3)], headers=headers).json()
+    ids = [task["id"] for task in created]
+
+    response = client.request("DELETE", "/tasks/bulk", json={"ids": [ids[0], ids[2], 9999]}, headers=headers)
+
+    assert response.status_code == 200, response.json()
+    assert response.json() == [
+        {"id": ids[0], "status": "deleted"},
+        {"id": ids[2], "status": "deleted"},
+        {"id": 9999, "status": "not_found"},
+    ]
+    remaining = client.get("/tasks/", headers=headers).json()
+    assert [task["id"] for task in remaining] == [ids[1]]
+
+
+def test_bulk_is_scoped_to_user(client, test_user, db_session, auth_headers):
+    headers = auth_headers()
+    created = client.post("/tasks/bulk", json=[{"title": "Mía", "description": "D"}], headers=headers).json()
+
+    client.post("/auth/register", json={"email": "otro@example.com", "password": "otra"})
+    other_login = client.post("/auth/login", json={"email": "otro@example.com", "password": "otra"})
+    other_headers = {"Authorization": f"Bearer {other_login.json()['access_token']}"}
+
+    response = client.patch("/tasks/bulk", json=[{"id": created[0]["id"], "completed": True}], headers=other_headers)
+    assert response.json()[0]["status"] == "not_found"
+    response = client.request("DELETE", "/tasks/bulk", json={"ids": [created[0]["id"]]}, headers=other_headers)
+    assert response.json()[0]["status"] == "not_found"
+    assert client.get(f"/tasks/{created[0]['id']}", headers=headers).json()["completed"] is False
+
+
+def test_bulk_limits(client, test_user, monkeypatch, auth_headers):
+    headers = auth_headers()
+    monkeypatch.setattr(task_routes, "BULK_MAX_ITEMS", 2)
+
+    response = client.post("/tasks/bulk", json=[{"title": "T", "description": "D"}] * 3, headers=headers)
+    assert response.status_code == 413
+    response = client.patch("/tasks/bulk", json=[{"id": 1, "completed": True}, {"id": 1, "completed": False}], headers=headers)
+    assert response.status_code == 422
+    response = client.post("/tasks/bulk", json=[], headers=headers)
+    assert response.status_code == 422
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture
+def task_statements(app_engine):
+    """Sentencias SQL sobre la tabla tasks ejecutadas durante el test."""
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if "tasks" in statement:
+            statements.append(statement.split()[0].upper())
+
+    event.listen(app_engine, "before_cursor_execute", before_execute)
+    yield statements
+    event.remove(app_engine, "before_cursor_execute", before_execute)
+
+
+def test_unchanged_collection_returns_304_without_reading_tasks(client, test_user, task_statements, auth_headers):
+    headers = auth_headers()
+    client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers)
+    first = client.get("/tasks/", headers=headers)
+    etag = first.headers["ETag"]
+    task_statements.clear()
+
+    response = client.get("/tasks/", headers={**headers, "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.headers["X-Sync-Cursor"] == first.headers["X-Sync-Cursor"]
+    assert response.content == b""
+    assert task_statements == []
+
+
+def test_collection_etag_changes_with_mutations_and_params(client, test_user, auth_headers):
+    headers = auth_headers()
+    task = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers).json()
+    etag = client.get("/tasks/", headers=headers).headers["ETag"]
+
+    # Otros parámetros son otra representación
+    filtered = client.get("/tasks/", params={"completed": "true"}, headers={**headers, "If-None-Match": etag})
+    assert filtered.status_code == 200 and filtered.headers["ETag"] != etag
+
+    client.put(f"/tasks/{task['id']}", json={"completed": True}, headers=headers)
+    response = client.get("/tasks/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["completed"] is True
+
+    client.delete(f"/tasks/{task['id']}", headers=headers)
+    after_delete = client.get("/tasks/", headers={**headers, "If-None-Match": response.headers["ETag"]})
+    assert after_delete.status_code == 200 and after_delete.json() == []
+
+
+def test_task_etag(client, test_user, auth_headers):
+    headers = auth_headers()
+    created = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers)
+    task = created.json()
+    first = client.get(f"/tasks/{task['id']}", headers=headers)
+    assert first.headers["ETag"] == created.headers["ETag"]
+
+    # Se aceptan listas de ETags y la forma débil W/"..."
+    conditional = {**headers, "If-None-Match": f'"otro", W/{first.headers["ETag"]}'}
+    assert client.get(f"/tasks/{task['id']}", headers=conditional).status_code == 304
+
+    # Cambiar otra tarea no invalida el ETag de esta
+    client.post("/tasks/", json={"title": "Otra", "description": "D"}, headers=headers)
+    assert client.get(f"/tasks/{task['id']}", headers=conditional).status_code == 304
+
+    updated = client.put(f"/tasks/{task['id']}", json={"title": "T2"}, headers=headers)
+    response = client.get(f"/tasks/{task['id']}", headers=conditional)
+    assert response.status_code == 200
+    assert response.json()["title"] == "T2"
+    assert response.headers["ETag"] == updated.headers["ETag"] != first.headers["ETag"]
+
+
+def test_task_etag_of_deleted_task_is_not_matched(client, test_user, auth_headers):
+    headers = auth_headers()
+    task = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers).json()
+    etag = client.get(f"/tasks/{task['id']}", headers=headers).headers["ETag"]
+    client.delete(f"/tasks/{task['id']}", headers=headers)
+
+    assert client.get(f"/tasks/{task['id']}", headers={**headers, "If-None-Match": etag}).status_code == 404
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import pytest
+from starlette.websockets import WebSocketDisconnect
+from app.services import events
+from app.services.events import Broker, InMemoryBroker, PostgresBroker
+
+
+def _token(headers):
+    return headers["Authorization"].split(" ", 1)[1]
+
+
+def test_task_events_are_pushed(client, test_user, auth_headers):
+    """
+    1. Se abre /ws/tasks con el token en la query.
+    2. Se crea, modifica y borra una tarea por HTTP.
+    3. Se recibe un evento por mutación, con el mismo cursor/base que las cabeceras X-Sync-*.
+    """
+    headers = auth_headers()
+    with client.websocket_connect(f"/ws/tasks?token={_token(headers)}") as websocket:
+        created = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers)
+        event = websocket.receive_json()
+        assert event["type"] == "created"
+        assert event["cursor"] == int(created.headers["X-Sync-Cursor"])
+        assert event["base"] == int(created.headers["X-Sync-Base"])
+        assert event["tasks"] == [created.json()]
+
+        task_id = created.json()["id"]
+        updated = client.put(f"/tasks/{task_id}", json={"completed": True}, headers=headers)
+        event = websocket.receive_json()
+        assert event["type"] == "updated"
+        assert event["base"] == int(created.headers["X-Sync-Cursor"])
+        assert event["tasks"] == [updated.json()]
+
+        deleted = client.delete(f"/tasks/{task_id}", headers=headers)
+        event = websocket.receive_json()
+        assert event == {"type": "deleted", "cursor": int(deleted.headers["X-Sync-Cursor"]), "base": int(deleted.headers["X-Sync-Base"]), "ids": [task_id]}
+
+
+def test_task_events_bulk_and_authorization_header(client, test_user, auth_headers):
+    headers = auth_headers()
+    with client.websocket_connect("/ws/tasks", headers=headers) as websocket:
+        response = client.post("/tasks/bulk", json=[{"title": "A", "description": "D"}, {"title": "B", "description": "D"}], headers=headers)
+        event = websocket.receive_json()
+        assert event["type"] == "created"
+        assert event["base"] == int(response.headers["X-Sync-Base"])
+        assert [task["title"] for task in event["tasks"]] == ["A", "B"]
+
+        ids = [task["id"] for task in response.json()]
+        client.request("DELETE", "/tasks/bulk", json={"ids": ids + [999999]}, headers=headers)
+        event = websocket.receive_json()
+        assert event["type"] == "deleted"
+        assert event["ids"] == ids
+
+
+def test_task_events_are_per_user(client, test_user, auth_headers):
+    headers = auth_headers()
+    client.post("/auth/register", json={"email": "other@example.com", "password": "otherpassword"})
+    other_headers = auth_headers("other@example.com", "otherpassword")
+    with client.websocket_connect(f"/ws/tasks?token={_token(other_headers)}") as websocket:
+        client.post("/tasks/", json={"title": "Ajena", "description": "D"}, headers=headers)
+        client.post("/tasks/", json={"title": "Propia", "description": "D"}, headers=other_headers)
+        # El primer evento que llega es el de su propia tarea
+        assert [task["title"] for task in websocket.receive_json()["tasks"]] == ["Propia"]
+
+
+@pytest.mark.parametrize("query", ["", "?token=no-es-un-token"])
+def test_task_events_require_token(client, test_user, query):
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with client.websocket_connect(f"/ws/tasks{query}") as websocket:
+            websocket.receive_json()
+    assert exc_info.value.code == 1008
+
+
+def test_subscription_overflow_requests_resync():
+    """Un cliente lento no bloquea al publicador: pierde eventos y recibe "resync"."""
+    async def scenario():
+        broker = InMemoryBroker()
+        subscription = broker.subscribe(1, max_size=2)
+        for cursor in range(1, 6):
+            await broker.publish(1, {"type": "created", "cursor": cursor})
+        received = [await subscription.get() for _ in range(3)]
+        await broker.publish(1, {"type": "created", "cursor": 6})
+        received.append(await subscription.get())
+        broker.unsubscribe(subscription)
+        return received, subscription.dropped, broker.stats()
+
+    received, dropped, stats = asyncio.run(scenario())
+    assert [event.get("cursor") for event in received] == [1, 2, None, 6]
+    assert received[2] == {"type": "resync"}
+    assert dropped == 3
+    assert stats["subscriptions"] == 0
+
+
+class _FakeNotifyConnection:
+    def __init__(self):
+        self.notified = []
+
+    async def execute(self, sql, channel, payload):
+        self.notified.append(json.loads(payload))
+
+
+def test_oversized_notify_falls_back_to_changed_event():
+    """Sin PostgreSQL disponible, se comprueba el payload que llega a pg_notify."""
+    with pytest.raises(TypeError):
+        Broker()
+    broker = PostgresBroker("postgresql://localhost/taskflow")
+    broker._connection = _FakeNotifyConnection()
+    event = {"type": "created", "cursor": 7, "base": 4, "tasks": [{"title": "x" * events.NOTIFY_MAX_BYTES}]}
+
+    asyncio.run(broker.publish(1, event))
+
+    assert broker._connection.notified == [{"user_id": 1, "event": {"type": "changed", "cursor": 7, "base": 4}}]
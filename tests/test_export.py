@@ -0,0 +1,60 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+from app.routes import tasks as tasks_routes
+
+
+@pytest.fixture
+def exported_tasks(client, test_user, monkeypatch, auth_headers):
+    """Cinco tareas (una borrada) y lotes de 2 filas, para que el export tenga varios bloques."""
+    monkeypatch.setattr(tasks_routes, "EXPORT_CHUNK_SIZE", 2)
+    headers = auth_headers()
+    created = client.post("/tasks/bulk", json=[{"title": f"T{i}", "description": "a,\"b\"\nc"} for i in range(5)], headers=headers).json()
+    client.delete(f"/tasks/{created[2]['id']}", headers=headers)
+    return headers, [task for i, task in enumerate(created) if i != 2]
+
+
+def test_export_ndjson(client, exported_tasks):
+    headers, expected = exported_tasks
+
+    response = client.get("/tasks/export", headers={**headers, "Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "content-encoding" not in response.headers
+    assert "content-length" not in response.headers  # streaming, sin tamaño conocido
+    lines = response.text.splitlines()
+    assert [json.loads(line) for line in lines] == expected
+
+
+def test_export_csv(client, exported_tasks):
+    headers, expected = exported_tasks
+
+    response = client.get("/tasks/export", params={"format": "csv"}, headers={**headers, "Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="tasks.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["id"]) for row in rows] == [task["id"] for task in expected]
+    assert rows[0]["description"] == "a,\"b\"\nc"
+    assert rows[0]["completed"] == "False"
+
+
+def test_export_gzip(client, exported_tasks):
+    headers, expected = exported_tasks
+
+    with client.stream("GET", "/tasks/export", headers={**headers, "Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        raw = b"".join(response.iter_raw())
+
+    assert [json.loads(line) for line in gzip.decompress(raw).splitlines()] == expected
+
+
+def test_export_empty_and_invalid_format(client, test_user, auth_headers):
+    headers = {**auth_headers(), "Accept-Encoding": "identity"}
+    assert client.get("/tasks/export", headers=headers).text == ""
+    assert client.get("/tasks/export", params={"format": "csv"}, headers=headers).text.strip() == "id,title,description,completed,created_at,updated_at,user_id"
+    assert client.get("/tasks/export", params={"format": "xml"}, headers=headers).status_code == 422
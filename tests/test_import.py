@@ -0,0 +1,162 @@
+import asyncio
+import gzip
+import json
+from app.routes import tasks as tasks_routes
+from app.services import import_service, task_service
+
+
+def _chunked(data: bytes, size: int = 7):
+    """Cuerpo enviado en trozos pequeños, para que las líneas queden partidas entre trozos."""
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_import_ndjson_in_batches_with_errors(client, test_user, monkeypatch, auth_headers):
+    monkeypatch.setattr(tasks_routes, "IMPORT_BATCH_SIZE", 2)
+    headers = auth_headers()
+    lines = [json.dumps({"title": f"T{i}", "description": "Año"}) for i in range(5)]
+    lines.insert(2, "{no es json")
+    lines.insert(4, json.dumps({"description": "sin título"}))
+    lines.insert(5, "")
+    body = ("\n".join(lines) + "\n").encode()
+
+    response = client.post("/tasks/import", content=_chunked(body), headers=headers)
+
+    assert response.status_code == 200, response.json()
+    result = response.json()
+    assert result["imported"] == 5
+    assert result["failed"] == 2
+    assert result["batches"] == 3
+    assert [error["line"] for error in result["errors"]] == [3, 5]
+    assert "title" in result["errors"][1]["error"]
+
+    tasks = client.get("/tasks/", headers=headers).json()
+    assert [task["title"] for task in tasks] == [f"T{i}" for i in range(5)]
+    assert tasks[0]["description"] == "Año"
+    # Las tareas importadas aparecen en la sincronización incremental
+    assert result["cursor"] == int(client.get("/tasks/", headers=headers).headers["X-Sync-Cursor"])
+    assert len(client.get("/tasks/changes", headers=headers).json()["changed"]) == 5
+
+
+def test_import_csv_with_multiline_fields(client, test_user, auth_headers):
+    headers = auth_headers()
+    body = 'title,description\r\nUno,"con, coma"\r\nDos,"varias\r\nlíneas y ""comillas"""\r\nTres\r\nCuatro,\r\n'.encode()
+
+    response = client.post("/tasks/import", params={"format": "csv"}, content=_chunked(body, 5), headers=headers)
+
+    result = response.json()
+    assert result["imported"] == 3
+    assert result["errors"] == [{"line": 5, "error": "Expected 2 fields, got 1"}]
+    tasks = client.get("/tasks/", headers=headers).json()
+    assert [task["description"] for task in tasks] == ["con, coma", 'varias\nlíneas y "comillas"', ""]
+
+
+def test_import_gzip_body(client, test_user, auth_headers):
+    headers = {**auth_headers(), "Content-Encoding": "gzip"}
+    body = gzip.compress(b"".join(json.dumps({"title": f"T{i}", "description": "D"}).encode() + b"\n" for i in range(50)))
+
+    response = client.post("/tasks/import", content=_chunked(body, 64), headers=headers)
+
+    assert response.json()["imported"] == 50
+    assert len(client.get("/tasks/", headers={"Authorization": headers["Authorization"]}).json()) == 50
+
+
+def test_import_keeps_completed_state_from_export(client, test_user, auth_headers):
+    headers = auth_headers()
+    for i in range(3):
+        task = client.post("/tasks/", json={"title": f"T{i}", "description": "D"}, headers=headers).json()
+        if i < 2:
+            client.put(f"/tasks/{task['id']}", json={"completed": True}, headers=headers)
+
+    exports = {format: client.get("/tasks/export", params={"format": format}, headers=headers).content for format in ("ndjson", "csv")}
+    for format, exported in exports.items():
+        response = client.post("/tasks/import", params={"format": format}, content=exported, headers=headers)
+        assert response.json()["imported"] == 3, response.json()
+
+    tasks = client.get("/tasks/", params={"limit": 100}, headers=headers).json()
+    assert [task["completed"] for task in tasks] == [True, True, False] * 3
+    assert client.get("/tasks/stats", headers=headers).json()["completed"] == 6
+    # Una columna completed vacía en CSV es una tarea pendiente
+    client.post("/tasks/import", params={"format": "csv"}, content=b"title,completed\nVacia,\n", headers=headers)
+    assert client.get("/tasks/stats", headers=headers).json()["pending"] == 4
+
+
+def test_import_error_report_is_capped(client, test_user, monkeypatch, auth_headers):
+    monkeypatch.setattr(tasks_routes, "IMPORT_MAX_ERRORS", 3)
+    headers = auth_headers()
+
+    response = client.post("/tasks/import", content=b"[]\n" * 10, headers=headers)
+
+    assert response.json()["failed"] == 10
+    assert len(response.json()["errors"]) == 3
+
+
+def test_import_rejects_oversized_records(client, test_user, monkeypatch, auth_headers):
+    monkeypatch.setattr(import_service, "IMPORT_MAX_RECORD_BYTES", 100)
+    monkeypatch.setattr(tasks_routes, "IMPORT_BATCH_SIZE", 1)
+    headers = auth_headers()
+    short = json.dumps({"title": "Corta"}).encode() + b"\n"
+    body = short + json.dumps({"title": "x" * 200}).encode() + b"\n" + short
+
+    response = client.post("/tasks/import", content=_chunked(body, 16), headers=headers)
+
+    assert response.status_code == 413
+    assert response.json()["detail"].startswith("Line 2 exceeds")
+    # Los lotes anteriores ya están guardados
+    assert [task["title"] for task in client.get("/tasks/", headers=headers).json()] == ["Corta"]
+    # En CSV el límite es por registro, aunque sus líneas sean cortas
+    body = b'title,description\nUno,"' + b"linea\n" * 30 + b'"\n'
+    response = client.post("/tasks/import", params={"format": "csv"}, content=_chunked(body, 16), headers=headers)
+    assert response.status_code == 413
+    assert response.json()["detail"].startswith("Line 2 exceeds")
+
+
+def test_gzip_body_is_decompressed_in_bounded_chunks(client, test_user, monkeypatch, auth_headers):
+    async def decompressed(body):
+        async def chunks():
+            yield body
+        return [data async for data in import_service.gunzip_chunks(chunks())]
+
+    bomb = gzip.compress(b"\n" * (10 * import_service.GUNZIP_CHUNK_SIZE))
+    parts = asyncio.run(decompressed(bomb))
+    assert sum(map(len, parts)) == 10 * import_service.GUNZIP_CHUNK_SIZE
+    assert max(map(len, parts)) <= import_service.GUNZIP_CHUNK_SIZE
+
+    monkeypatch.setattr(import_service, "IMPORT_MAX_BYTES", 1000)
+    headers = {**auth_headers(), "Content-Encoding": "gzip"}
+    response = client.post("/tasks/import", content=bomb, headers=headers)
+    assert response.status_code == 413
+    assert response.json()["detail"].startswith("The decompressed body exceeds 1000 bytes")
+
+
+class _FakeCursor:
+    def __init__(self, copied):
+        self.copied = copied
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy_expert(self, sql, file):
+        self.copied.append((sql, file.read()))
+
+
+def test_copy_rows_builds_csv_for_psycopg2(monkeypatch):
+    """Sin PostgreSQL disponible, se comprueba el SQL y el CSV que recibe copy_expert."""
+    copied = []
+
+    class FakeSession:
+        def connection(self):
+            driver_connection = type("Conn", (), {"cursor": lambda self: _FakeCursor(copied)})()
+            return type("C", (), {"connection": type("F", (), {"driver_connection": driver_connection})()})()
+
+        def get_bind(self):
+            return type("E", (), {"dialect": type("D", (), {"driver": "psycopg2"})()})()
+
+    task_service._copy_rows(FakeSession(), [("T", None, False, 1, 2, 3, 4), ("a,\"b\"", "", True, 1, 2, 4, 4)])
+
+    sql, data = copied[0]
+    assert sql == "COPY tasks (title, description, completed, created_at, updated_at, change_seq, user_id) FROM STDIN WITH (FORMAT csv)"
+    assert data.splitlines() == ['"T",,False,1,2,3,4', '"a,""b""","",True,1,2,4,4']
@@ -0,0 +1,81 @@
+import pytest
+
+
+def test_list_tasks_keyset_pagination(client, test_user, auth_headers):
+    """
+    1. Se crean 7 tareas.
+    2. Se recorren con limit=3 siguiendo la cabecera X-Next-Cursor.
+    3. Se verifica que se obtienen todas, en orden de creación y sin repetidos.
+    """
+    headers = auth_headers()
+    created_ids = []
+    for i in range(7):
+        response = client.post("/tasks/", json={"title": f"Tarea {i}", "description": "D"}, headers=headers)
+        assert response.status_code == 201
+        created_ids.append(response.json()["id"])
+
+    seen_ids = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/tasks/", params=params, headers=headers)
+        assert response.status_code == 200, response.json()
+        page = response.json()
+        assert len(page) <= 3
+        seen_ids.extend(task["id"] for task in page)
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert seen_ids == created_ids
+
+
+def test_list_tasks_filters(client, test_user, auth_headers):
+    headers = auth_headers()
+    client.post("/tasks/", json={"title": "Comprar pan", "description": "D"}, headers=headers)
+    client.post("/tasks/", json={"title": "Comprar leche", "description": "D"}, headers=headers)
+    other = client.post("/tasks/", json={"title": "Llamar", "description": "D"}, headers=headers).json()
+    client.put(f"/tasks/{other['id']}", json={"completed": True}, headers=headers)
+
+    response = client.get("/tasks/", params={"title_prefix": "Comprar"}, headers=headers)
+    assert [task["title"] for task in response.json()] == ["Comprar pan", "Comprar leche"]
+
+    response = client.get("/tasks/", params={"completed": True}, headers=headers)
+    assert [task["id"] for task in response.json()] == [other["id"]]
+
+    response = client.get("/tasks/", params={"created_after": "2000-01-01T00:00:00", "created_before": "2001-01-01T00:00:00"}, headers=headers)
+    assert response.json() == []
+
+    # Los comodines de LIKE se tratan como texto literal
+    response = client.get("/tasks/", params={"title_prefix": "%"}, headers=headers)
+    assert response.json() == []
+
+
+def test_list_tasks_invalid_cursor(client, test_user, auth_headers):
+    headers = auth_headers()
+    response = client.get("/tasks/", params={"cursor": "no-es-un-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_list_tasks_matches_task_schema(client, test_user, monkeypatch, use_orjson, auth_headers):
+    """El listado se serializa sin pydantic, pero con el mismo formato que GET /tasks/{id}."""
+    from app import responses
+    if not use_orjson:
+        monkeypatch.setattr(responses, "orjson", None)
+    headers = auth_headers()
+    first = client.post("/tasks/", json={"title": "Año nuevo", "description": "«ñ» ✓"}, headers=headers).json()
+    second = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers).json()
+    client.put(f"/tasks/{second['id']}", json={"completed": True}, headers=headers)
+
+    response = client.get("/tasks/", headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    expected = [client.get(f"/tasks/{task['id']}", headers=headers).json() for task in (first, second)]
+    assert response.json() == expected
@@ -0,0 +1,39 @@
+from passlib.context import CryptContext
+from app.models import User
+from app.services import password_pool, auth_service
+
+
+def test_register_and_login_use_pool(client, db_session):
+    response = client.post("/auth/register", json={"email": "nuevo@example.com", "password": "secreta"})
+    assert response.status_code == 200, response.json()
+
+    login_response = client.post("/auth/login", json={"email": "nuevo@example.com", "password": "secreta"})
+    assert login_response.status_code == 200
+    assert "access_token" in login_response.json()
+
+    bad_response = client.post("/auth/login", json={"email": "nuevo@example.com", "password": "otra"})
+    assert bad_response.status_code == 401
+
+
+def test_login_rehashes_weak_hash(client, db_session):
+    weak_hash = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash("testpassword")
+    user = User(email="viejo@example.com", hashed_password=weak_hash)
+    db_session.add(user)
+    db_session.commit()
+
+    response = client.post("/auth/login", json={"email": "viejo@example.com", "password": "testpassword"})
+    assert response.status_code == 200
+
+    db_session.refresh(user)
+    assert user.hashed_password != weak_hash
+    assert user.hashed_password.startswith(f"$2b${auth_service.BCRYPT_ROUNDS:02d}$")
+    assert auth_service.verify_password("testpassword", user.hashed_password)
+
+
+def test_login_returns_503_when_queue_is_full(client, test_user, monkeypatch):
+    monkeypatch.setattr(password_pool, "PASSWORD_HASH_MAX_PENDING", 0)
+
+    response = client.post("/auth/login", json={"email": "test@example.com", "password": "testpassword"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from app import database
+from app.routes import metrics as metrics_routes
+from app.services import pool_metrics, request_metrics
+
+
+def test_checkout_waits_and_timeouts_are_counted(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=pool_metrics.pool_class("test_pool"), pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    metrics = pool_metrics.instrument(engine, "test_pool")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert metrics.snapshot()["in_use"] == 1
+        # El pool está agotado: el segundo checkout espera y acaba en timeout
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    snapshot = pool_metrics.snapshot()["test_pool"]
+    assert snapshot["in_use"] == 0
+    assert snapshot["connects"] == 1
+    assert snapshot["checkouts"] == 1 and snapshot["checkins"] == 1
+    assert snapshot["waits"] == 1 and snapshot["timeouts"] == 1
+    assert snapshot["checkout_seconds_max"] >= 0.05
+    engine.dispose()
+    del pool_metrics.registry["test_pool"]
+
+
+def test_engine_options_from_environment(monkeypatch):
+    monkeypatch.setattr(database, "DB_POOL_SIZE", 20)
+    monkeypatch.setattr(database, "DB_STATEMENT_TIMEOUT_MS", 5000)
+
+    options = database.engine_options("postgresql://u:p@localhost/db", "primary")
+    assert options["pool_size"] == 20
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+
+    async_options = database.engine_options("postgresql+asyncpg://u:p@localhost/db", "primary_async", async_=True)
+    assert async_options["connect_args"] == {"server_settings": {"statement_timeout": "5000"}}
+
+    assert database.engine_options("sqlite:///./x.db", "primary") == {}
+
+
+def test_pool_metrics_endpoint(client):
+    response = client.get("/metrics/pool")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["config"]["pool_size"] == database.DB_POOL_SIZE
+    assert "primary" in body["pools"]
+
+
+def test_pool_metrics_endpoint_requires_metrics_access(client, monkeypatch):
+    monkeypatch.setattr(request_metrics, "METRICS_ENABLED", False)
+    assert client.get("/metrics/pool").status_code == 404
+    monkeypatch.setattr(request_metrics, "METRICS_ENABLED", True)
+    monkeypatch.setattr(metrics_routes, "METRICS_TOKEN", "secreto")
+    assert client.get("/metrics/pool").status_code == 401
+    assert client.get("/metrics/pool", headers={"Authorization": "Bearer secreto"}).status_code == 200
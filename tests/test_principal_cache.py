@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import event
+from app.models import User
+from app.routes import metrics as metrics_routes
+from app.services import principal_cache, request_metrics
+
+
+def _login(client):
+    login_response = client.post("/auth/login", json={"email": "test@example.com", "password": "testpassword"})
+    assert login_response.status_code == 200, f"Login failed: {login_response.json()}"
+    return {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+
+@pytest.fixture
+def user_queries(app_engine):
+    """Cuenta las búsquedas de usuario por email (las que hace get_current_user)."""
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement and "users.email = " in statement:
+            statements.append(statement)
+
+    event.listen(app_engine, "before_cursor_execute", before_execute)
+    yield statements
+    event.remove(app_engine, "before_cursor_execute", before_execute)
+
+
+def test_authenticated_requests_skip_users_table(client, test_user, user_queries):
+    headers = _login(client)
+    user_queries.clear()
+
+    for _ in range(3):
+        assert client.get("/tasks/", headers=headers).status_code == 200
+
+    # El login deja el principal en la caché
+    assert user_queries == [], "get_current_user no debería consultar la tabla users"
+    assert client.get("/auth/principal-cache").json()["hits"] == 3
+
+
+def test_token_without_uid_is_cached(client, test_user, user_queries):
+    from app.services.auth_service import create_access_token
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': 'test@example.com'})}"}
+
+    assert client.get("/tasks/", headers=headers).status_code == 200
+    assert client.get("/tasks/", headers=headers).status_code == 200
+    assert len(user_queries) == 1
+
+
+def test_deleted_user_is_invalidated(client, test_user, db_session):
+    headers = _login(client)
+    assert client.get("/tasks/", headers=headers).status_code == 200
+
+    db_session.delete(test_user)
+    db_session.commit()
+
+    assert principal_cache.get("test@example.com") is None
+    assert client.get("/tasks/", headers=headers).status_code == 401
+
+
+def test_password_change_invalidates(client, test_user, db_session):
+    headers = _login(client)
+    assert client.get("/tasks/", headers=headers).status_code == 200
+
+    test_user.hashed_password = "otro-hash"
+    db_session.commit()
+
+    assert principal_cache.get("test@example.com") is None
+    # El token sigue siendo válido, pero se vuelve a comprobar el usuario en la BD
+    assert client.get("/tasks/", headers=headers).status_code == 200
+    assert principal_cache.get("test@example.com") is not None
+
+
+def test_cache_stats_require_metrics_access(client, monkeypatch):
+    monkeypatch.setattr(request_metrics, "METRICS_ENABLED", False)
+    assert client.get("/auth/principal-cache").status_code == 404
+
+    monkeypatch.setattr(request_metrics, "METRICS_ENABLED", True)
+    monkeypatch.setattr(metrics_routes, "METRICS_TOKEN", "secreto")
+    assert client.get("/auth/principal-cache").status_code == 401
+    assert client.get("/auth/principal-cache", headers={"Authorization": "Bearer otro"}).status_code == 401
+    assert client.get("/auth/principal-cache", headers={"Authorization": "Bearer secreto"}).status_code == 200
+
+
+def test_principal_is_checked_again_after_ttl(client, test_user, db_session, user_queries):
+    headers = _login(client)
+    # Borrado fuera de la aplicación (otro worker, un script): no hay evento que invalide
+    db_session.execute(User.__table__.delete().where(User.id == test_user.id))
+    db_session.commit()
+    assert client.get("/tasks/", headers=headers).status_code == 200
+
+    principal_cache._principals.clear()
+    assert client.get("/tasks/", headers=headers).status_code == 401
+
+
+def test_stale_token_is_not_served_from_cache(client, test_user, user_queries):
+    headers = _login(client)
+    principal_cache.invalidate("test@example.com")
+    # Otra petición vuelve a dejar el principal en la caché...
+    principal_cache.put(principal_cache.Principal(id=test_user.id, email="test@example.com"))
+    user_queries.clear()
+
+    # ...pero un token anterior a la invalidación se comprueba igualmente en la BD
+    assert client.get("/tasks/", headers=headers).status_code == 200
+    assert len(user_queries) == 1
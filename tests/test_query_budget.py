@@ -0,0 +1,76 @@
+import logging
+import pytest
+from fastapi.testclient import TestClient
+from app import models
+from app.main import app
+from app.routes import tasks
+from app.services import query_budget
+from app.services.query_budget import QueryBudgetExceeded, QueryBudgetMiddleware, count_queries
+
+
+def _create_tasks(client, headers, n):
+    response = client.post("/tasks/bulk", json=[{"title": f"T{i}", "description": "D"} for i in range(n)], headers=headers)
+    assert response.status_code == 201
+    return response.json()
+
+
+@pytest.mark.parametrize("n_tasks", [1, 50])
+def test_list_tasks_within_budget(client, test_user, query_budget, n_tasks, auth_headers):
+    """El número de consultas del listado no depende del número de tareas."""
+    headers = auth_headers()
+    _create_tasks(client, headers, n_tasks)
+    with query_budget(tasks.get_tasks.query_budget):
+        response = client.get("/tasks/", headers=headers)
+    assert len(response.json()) == n_tasks
+
+
+def test_read_task_within_budget(client, test_user, query_budget, auth_headers):
+    headers = auth_headers()
+    task = _create_tasks(client, headers, 1)[0]
+    with query_budget(tasks.read_task.query_budget):
+        response = client.get(f"/tasks/{task['id']}", headers=headers)
+    assert response.status_code == 200
+    with query_budget(tasks.read_task.query_budget):
+        client.get(f"/tasks/{task['id']}", headers={**headers, "If-None-Match": response.headers["ETag"]})
+
+
+def test_mutations_within_budget(client, test_user, query_budget, auth_headers):
+    headers = auth_headers()
+    with query_budget(tasks.bulk_create_tasks.query_budget):
+        created = _create_tasks(client, headers, 20)
+    with query_budget(tasks.bulk_update_tasks.query_budget):
+        client.patch("/tasks/bulk", json=[{"id": task["id"], "completed": True} for task in created], headers=headers)
+    with query_budget(tasks.update_task_endpoint.query_budget):
+        client.put(f"/tasks/{created[0]['id']}", json={"title": "Otra"}, headers=headers)
+    with query_budget(tasks.delete_task_endpoint.query_budget):
+        client.delete(f"/tasks/{created[0]['id']}", headers=headers)
+
+
+def test_lazy_loads_in_a_loop_are_detected(db_session, engine):
+    """Recorrer User.tasks de varios usuarios sin carga previa es el N+1 clásico."""
+    for i in range(3):
+        user = models.User(email=f"user{i}@example.com", hashed_password="x")
+        user.tasks.append(models.Task(title="T", description="D"))
+        db_session.add(user)
+    db_session.commit()
+    db_session.expire_all()
+
+    with pytest.raises(QueryBudgetExceeded, match="possible N\\+1"):
+        with count_queries(engine, max_queries=10):
+            for user in db_session.query(models.User).all():
+                [task.title for task in user.tasks]
+
+
+def test_middleware_enforces_declared_budgets(client, test_user, app_engine, monkeypatch, caplog, auth_headers):
+    headers = auth_headers()
+    task = _create_tasks(client, headers, 1)[0]
+    query_budget.install(app_engine)
+    monkeypatch.setattr(tasks.read_task, "query_budget", 0)
+
+    with pytest.raises(QueryBudgetExceeded, match="ran 1 queries \\(budget 0\\)"):
+        TestClient(QueryBudgetMiddleware(app, mode="raise")).get(f"/tasks/{task['id']}", headers=headers)
+
+    with caplog.at_level(logging.WARNING, logger="app.query_budget"):
+        response = TestClient(QueryBudgetMiddleware(app, mode="warn")).get(f"/tasks/{task['id']}", headers=headers)
+    assert response.status_code == 200
+    assert "GET /tasks/" in caplog.text
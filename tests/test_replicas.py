@@ -0,0 +1,143 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app import replicas as replicas_module
+from app.database import Base
+from app.models import Task, User
+from app.replicas import ReplicaSet
+from app.services import task_cache
+from app.services.task_cache import MemoryBackend, TaskCache
+
+
+@pytest.fixture
+def replica_url(tmp_path, test_user):
+    """
+    Segundo fichero SQLite que hace de réplica, con un contenido distinto al del primario
+    (y otra versión del usuario, para que la caché de lecturas no los confunda).
+    """
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(User(id=test_user.id, email=test_user.email, hashed_password=test_user.hashed_password, change_seq=50, task_count=1))
+        db.add(Task(title="Solo en la réplica", user_id=test_user.id, change_seq=50))
+        db.commit()
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def replica_set(client, db_mode, replica_url, monkeypatch):
+    replica_set = ReplicaSet([replica_url], mode=db_mode, sticky_seconds=60)
+    monkeypatch.setattr(replicas_module, "replica_set", replica_set)
+    yield replica_set
+    client.portal.call(replica_set.stop)
+
+
+def _titles(client, headers):
+    response = client.get("/tasks/", headers=headers)
+    assert response.status_code == 200, response.json()
+    return [task["title"] for task in response.json()]
+
+
+def test_reads_are_served_by_replica(client, replica_set, auth_headers):
+    headers = auth_headers()
+
+    assert _titles(client, headers) == ["Solo en la réplica"]
+    assert client.get("/tasks/stats", headers=headers).json()["total"] == 1
+    assert replica_set.replicas[0].reads >= 2
+
+
+def test_user_reads_own_writes_from_primary(client, replica_set, auth_headers):
+    headers = auth_headers()
+    created = client.post("/tasks/", json={"title": "Nueva", "description": "Escrita en el primario"}, headers=headers).json()
+
+    # Dentro de la ventana, las lecturas del usuario van al primario
+    assert _titles(client, headers) == ["Nueva"]
+    assert client.get(f"/tasks/{created['id']}", headers=headers).status_code == 200
+    assert replica_set.sticky_reads == 2
+
+    # Pasada la ventana vuelven a la réplica
+    replica_set._sticky.clear()
+    assert _titles(client, headers) == ["Solo en la réplica"]
+
+
+def test_writes_do_not_route_reads(client, replica_set, auth_headers):
+    headers = auth_headers()
+    client.post("/tasks/", json={"title": "Nueva", "description": "D"}, headers=headers)
+    client.post("/tasks/", json={"title": "Otra", "description": "D"}, headers=headers)
+
+    # Autenticar una escritura no consume turnos del reparto ni consulta la ventana
+    assert replica_set.replicas[0].reads == 0
+    assert replica_set.sticky_reads == 0
+
+
+def test_unhealthy_replica_falls_back_to_primary(client, replica_set, auth_headers):
+    headers = auth_headers()
+    replica = replica_set.replicas[0]
+    replica_set.mark_failed(replica, ConnectionError("replica down"))
+
+    assert _titles(client, headers) == []
+    assert replica_set.fallback_reads == 1
+    assert client.get("/metrics/replicas").json()["replicas"][0]["healthy"] is False
+
+    # La comprobación periódica la devuelve al reparto
+    client.portal.call(replica_set.check)
+    assert replica.healthy
+    assert replica.lag == 0
+    assert _titles(client, headers) == ["Solo en la réplica"]
+
+
+def test_lagging_replica_is_not_cached_under_a_newer_version(client, test_user, db_session, db_mode, replica_url, monkeypatch, auth_headers):
+    # Sin ventana tras las escrituras, para que las lecturas vayan a la réplica atrasada
+    replica_set = ReplicaSet([replica_url], mode=db_mode, sticky_seconds=0, max_lag_seconds=0)
+    monkeypatch.setattr(replicas_module, "replica_set", replica_set)
+    monkeypatch.setattr(task_cache, "cache", TaskCache(100, 60, MemoryBackend()))
+    task = Task(title="Nueva", user_id=test_user.id, change_seq=101)
+    db_session.add(task)
+    test_user.change_seq = 101
+    db_session.commit()
+    # La caché compartida conoce la versión 101 del primario; la réplica sigue en la 50
+    client.portal.call(task_cache.cache.set_version, test_user.id, 101)
+    headers = auth_headers()
+
+    response = client.get("/tasks/", headers=headers)
+    assert [task["title"] for task in response.json()] == ["Nueva"]
+    assert response.headers["X-Sync-Cursor"] == "101"
+    assert client.get(f"/tasks/{task.id}", headers=headers).status_code == 200
+    assert replica_set.stale_reads == 2
+    client.portal.call(replica_set.stop)
+
+
+def test_sticky_window_must_cover_max_lag():
+    with pytest.raises(ValueError):
+        ReplicaSet(["sqlite:///a.db"], mode="sync", sticky_seconds=5, max_lag_seconds=30)
+    assert ReplicaSet([], sticky_seconds=0, max_lag_seconds=30).replicas == []
+
+
+def test_check_marks_unreachable_replica_unhealthy(tmp_path):
+    replica_set = ReplicaSet([f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"], mode="sync")
+    asyncio.run(replica_set.check())
+
+    replica = replica_set.replicas[0]
+    assert not replica.healthy
+    assert replica.failures == 1
+    assert "OperationalError" in replica.last_error
+    assert asyncio.run(replica_set.route(1)) is None
+    asyncio.run(replica_set.stop())
+
+
+def test_round_robin_skips_unhealthy_replicas():
+    replica_set = ReplicaSet(["sqlite:///a.db", "sqlite:///b.db", "sqlite:///c.db"], mode="sync", sticky_seconds=60)
+
+    async def routes(n, user_id=None):
+        return [(await replica_set.route(user_id)).name for _ in range(n)]
+
+    assert asyncio.run(routes(4)) == ["replica0", "replica1", "replica2", "replica0"]
+    replica_set.replicas[1].healthy = False
+    assert "replica1" not in asyncio.run(routes(6))
+
+    asyncio.run(replica_set.mark_write(7))
+    assert asyncio.run(replica_set.route(7)) is None
+    assert asyncio.run(replica_set.route(8)) is not None
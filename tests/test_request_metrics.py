@@ -0,0 +1,75 @@
+import logging
+import re
+import pytest
+from app.routes import metrics as metrics_routes
+from app.services import request_metrics
+
+
+@pytest.fixture
+def metrics(app_engine):
+    """Métricas a cero, con el engine del test instrumentado como lo está el de la aplicación."""
+    request_metrics.instrument_engine(app_engine)
+    request_metrics.reset()
+    yield request_metrics
+    request_metrics.reset()
+
+
+def _value(text: str, sample: str) -> float:
+    match = re.search(rf"^{re.escape(sample)} (\S+)$", text, re.MULTILINE)
+    assert match, f"{sample} not found"
+    return float(match.group(1))
+
+
+def test_metrics_endpoint_reports_requests_and_queries(client, test_user, metrics, auth_headers):
+    headers = auth_headers()
+    created = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers)
+    task = created.json()
+    client.get(f"/tasks/{task['id']}", headers=headers)
+    client.get(f"/tasks/{task['id'] + 1}", headers=headers)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+
+    # Las series usan la plantilla de la ruta, no la URL
+    route = 'method="GET",route="/tasks/{task_id}"'
+    assert _value(text, f'taskflow_http_request_duration_seconds_count{{{route},status="200"}}') == 1
+    assert _value(text, f'taskflow_http_request_duration_seconds_count{{{route},status="404"}}') == 1
+    assert _value(text, f'taskflow_db_queries_per_request_count{{{route}}}') == 2
+    assert _value(text, f'taskflow_db_queries_per_request_bucket{{{route},le="1"}}') == 2
+    assert _value(text, 'taskflow_http_response_size_bytes_sum{method="POST",route="/tasks/"}') == len(created.content)
+    assert _value(text, 'taskflow_db_statement_duration_seconds_count{operation="SELECT"}') >= 3
+    assert _value(text, "taskflow_http_requests_in_flight") == 1  # La propia petición a /metrics
+    assert "# TYPE taskflow_db_pool_checkouts_total counter" in text
+
+
+def test_unmatched_routes_share_one_series(client, metrics):
+    client.get("/no-existe/1")
+    client.get("/no-existe/2")
+    text = client.get("/metrics").text
+    assert _value(text, 'taskflow_http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}') == 2
+
+
+def test_slow_queries_are_logged(client, test_user, metrics, monkeypatch, caplog, auth_headers):
+    monkeypatch.setattr(request_metrics, "SLOW_QUERY_MS", 0)
+    headers = auth_headers()
+    with caplog.at_level(logging.WARNING, logger="app.slow_query"):
+        client.get("/tasks/", headers=headers)
+    messages = [record.getMessage() for record in caplog.records if record.name == "app.slow_query"]
+    assert any(", /tasks/): SELECT" in message for message in messages)
+    assert _value(client.get("/metrics").text, "taskflow_db_slow_queries_total") >= len(messages)
+
+
+def test_metrics_endpoints_are_hidden_when_disabled(client, monkeypatch):
+    monkeypatch.setattr(request_metrics, "METRICS_ENABLED", False)
+    for path in ("/metrics", "/metrics/pool", "/metrics/cache", "/auth/principal-cache"):
+        assert client.get(path).status_code == 404, path
+
+
+def test_metrics_token_is_required_when_configured(client, monkeypatch):
+    monkeypatch.setattr(metrics_routes, "METRICS_TOKEN", "secreto")
+    for path in ("/metrics", "/metrics/cache", "/auth/principal-cache"):
+        assert client.get(path).status_code == 401, path
+        assert client.get(path, headers={"Authorization": "Bearer otro"}).status_code == 401, path
+        assert client.get(path, headers={"Authorization": "Bearer secreto"}).status_code == 200, path
@@ -0,0 +1,75 @@
+from app.routes import tasks as tasks_routes
+
+
+def _create(client, headers, title, description="D"):
+    return client.post("/tasks/", json={"title": title, "description": description}, headers=headers).json()
+
+
+def test_search_ranks_title_matches_first(client, test_user, auth_headers):
+    headers = auth_headers()
+    in_description = _create(client, headers, "Recados", "comprar pan y leche")
+    in_title = _create(client, headers, "Comprar regalo", "para el cumpleaños")
+    _create(client, headers, "Llamar al banco")
+
+    response = client.get("/tasks/search", params={"q": "comprar"}, headers=headers)
+
+    assert response.status_code == 200
+    assert [task["id"] for task in response.json()] == [in_title["id"], in_description["id"]]
+    assert "X-Next-Offset" not in response.headers
+
+
+def test_search_matches_all_terms_and_ignores_syntax(client, test_user, auth_headers):
+    headers = auth_headers()
+    both = _create(client, headers, "Informe anual", "revisar con el equipo")
+    _create(client, headers, "Informe mensual", "enviar")
+
+    assert [t["id"] for t in client.get("/tasks/search", params={"q": "informe equipo"}, headers=headers).json()] == [both["id"]]
+    # Las comillas, operadores y acentos no rompen la consulta
+    for q in ['"informe', "informe AND", "informe*", "ínforme (anual"]:
+        response = client.get("/tasks/search", params={"q": q}, headers=headers)
+        assert response.status_code == 200, q
+    assert client.get("/tasks/search", params={"q": "?!"}, headers=headers).json() == []
+
+
+def test_search_tracks_updates_and_deletes(client, test_user, auth_headers):
+    headers = auth_headers()
+    task = _create(client, headers, "Pintar la valla")
+
+    client.put(f"/tasks/{task['id']}", json={"title": "Barnizar la valla"}, headers=headers)
+    assert client.get("/tasks/search", params={"q": "pintar"}, headers=headers).json() == []
+    assert len(client.get("/tasks/search", params={"q": "barnizar"}, headers=headers).json()) == 1
+
+    # Marcar como hecha no reindexa pero el resultado refleja el estado actual
+    client.put(f"/tasks/{task['id']}", json={"completed": True}, headers=headers)
+    assert client.get("/tasks/search", params={"q": "valla"}, headers=headers).json()[0]["completed"] is True
+
+    client.delete(f"/tasks/{task['id']}", headers=headers)
+    assert client.get("/tasks/search", params={"q": "valla"}, headers=headers).json() == []
+
+
+def test_search_only_returns_own_tasks(client, test_user, auth_headers):
+    headers = auth_headers()
+    client.post("/auth/register", json={"email": "otro@example.com", "password": "otropassword"})
+    other_headers = auth_headers("otro@example.com", "otropassword")
+    _create(client, other_headers, "Secreto compartido")
+    mine = _create(client, headers, "Secreto propio")
+
+    response = client.get("/tasks/search", params={"q": "secreto"}, headers=headers)
+
+    assert [task["id"] for task in response.json()] == [mine["id"]]
+    # El token del dueño no se puede buscar como término
+    assert client.get("/tasks/search", params={"q": f"u{test_user.id}"}, headers=headers).json() == []
+
+
+def test_search_pagination(client, test_user, auth_headers):
+    headers = auth_headers()
+    client.post("/tasks/bulk", json=[{"title": f"Tarea {i}", "description": "D"} for i in range(5)], headers=headers)
+
+    first = client.get("/tasks/search", params={"q": "tarea", "limit": 3}, headers=headers)
+    assert len(first.json()) == 3
+    offset = first.headers["X-Next-Offset"]
+    second = client.get("/tasks/search", params={"q": "tarea", "limit": 3, "offset": offset}, headers=headers)
+    assert len(second.json()) == 2 and "X-Next-Offset" not in second.headers
+    assert {t["id"] for t in first.json()}.isdisjoint(t["id"] for t in second.json())
+
+    assert client.get("/tasks/search", params={"q": "tarea", "offset": tasks_routes.MAX_SEARCH_OFFSET + 1}, headers=headers).status_code == 422
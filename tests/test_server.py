@@ -0,0 +1,42 @@
+import pytest
+from app import database, server
+from app.services import events
+
+
+def test_pool_sizes_keep_configured_values_when_they_fit():
+    assert server.pool_sizes(4, 100, 10, pool_size=5, max_overflow=10) == (5, 10)
+
+
+def test_pool_sizes_trim_overflow_first_to_stay_under_max_connections():
+    # 90 conexiones disponibles entre 16 workers: 5 por worker
+    assert server.pool_sizes(16, 100, 10, pool_size=5, max_overflow=10) == (5, 0)
+    assert server.pool_sizes(30, 100, 10, pool_size=5, max_overflow=10) == (3, 0)
+    pool_size, max_overflow = server.pool_sizes(8, 100, 10, pool_size=5, max_overflow=10, extra_per_worker=1)
+    assert 8 * (pool_size + max_overflow + 1) <= 90
+
+
+def test_pool_sizes_reject_more_workers_than_connections():
+    with pytest.raises(ValueError):
+        server.pool_sizes(50, 100, 10, pool_size=5, max_overflow=10, extra_per_worker=1)
+
+
+def test_configure_sizes_postgres_pools_per_worker(monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_URL", "postgresql://u:p@localhost/db")
+    monkeypatch.setattr(database, "DATABASE_MODE", "sync")
+    monkeypatch.setattr(events, "EVENTS_BROKER", "postgres")
+    monkeypatch.setenv("PASSWORD_HASH_WORKERS", "2")
+
+    settings = server.configure(workers=10)
+
+    assert settings["workers"] == 10
+    assert settings["env"] == {"DB_POOL_SIZE": "5", "DB_MAX_OVERFLOW": "3"}
+
+
+def test_configure_leaves_sqlite_pools_alone(monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_URL", "sqlite:///./x.db")
+    monkeypatch.delenv("PASSWORD_HASH_WORKERS", raising=False)
+
+    settings = server.configure(workers=2)
+
+    assert "DB_POOL_SIZE" not in settings["env"]
+    assert int(settings["env"]["PASSWORD_HASH_WORKERS"]) >= 1
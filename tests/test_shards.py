@@ -0,0 +1,157 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from app import shards as shards_module
+from app.database import Base
+from app.models import Task, TaskArchive, User, UserShard
+from app.services import shard_rebalance
+from app.services.auth_service import create_access_token
+from app.shards import HashRing, ShardRouter
+
+
+@pytest.fixture
+def shard_engine(tmp_path):
+    """Segundo fichero SQLite con el esquema completo, que hace de shard."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'shard1.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _router(client, db_mode, shard_engine, monkeypatch, names):
+    url = shard_engine.url.render_as_string(hide_password=False)
+    router = ShardRouter({name: None if name == "primary" else url for name in names}, mode=db_mode, directory_ttl=60)
+    monkeypatch.setattr(shards_module, "shard_router", router)
+    return router
+
+
+@pytest.fixture
+def shard_only(client, db_mode, shard_engine, monkeypatch):
+    """Anillo con un único shard: todos los usuarios nuevos van a él."""
+    router = _router(client, db_mode, shard_engine, monkeypatch, ["s1"])
+    yield router
+    client.portal.call(router.close)
+
+
+@pytest.fixture
+def primary_and_shard(client, db_mode, shard_engine, monkeypatch):
+    router = _router(client, db_mode, shard_engine, monkeypatch, ["primary", "s1"])
+    yield router
+    client.portal.call(router.close)
+
+
+def _count_tasks(engine, user_id):
+    with Session(engine) as db:
+        return db.execute(select(func.count()).select_from(Task).where(Task.user_id == user_id)).scalar()
+
+
+def test_ring_moves_few_keys_when_a_shard_is_added():
+    before = HashRing(["s1", "s2", "s3"])
+    after = HashRing(["s1", "s2", "s3", "s4"])
+
+    assert [before.get(key) for key in range(100)] == [HashRing(["s1", "s2", "s3"]).get(key) for key in range(100)]
+    moved = [key for key in range(10_000) if before.get(key) != after.get(key)]
+    # Solo cambian ~1/4 de las claves, y todas hacia el shard nuevo
+    assert 1500 < len(moved) < 3500
+    assert {after.get(key) for key in moved} == {"s4"}
+
+
+def test_new_user_lives_in_its_shard(client, shard_only, shard_engine, engine, auth_headers):
+    response = client.post("/auth/register", json={"email": "nuevo@example.com", "password": "password123"})
+    assert response.status_code == 200, response.json()
+    user_id = response.json()["id"]
+    headers = auth_headers("nuevo@example.com", "password123")
+
+    created = client.post("/tasks/", json={"title": "En el shard", "description": "s1"}, headers=headers)
+    assert created.status_code == 201, created.json()
+    assert [task["title"] for task in client.get("/tasks/", headers=headers).json()] == ["En el shard"]
+    assert client.get("/tasks/stats", headers=headers).json()["total"] == 1
+
+    assert _count_tasks(shard_engine, user_id) == 1
+    assert _count_tasks(engine, user_id) == 0
+    with Session(engine) as db:
+        assert db.get(UserShard, user_id).shard == "s1"
+    assert client.get("/metrics/shards").json()["shards"] == {"s1": shard_engine.url.render_as_string(hide_password=True)}
+
+
+def test_token_without_uid_is_routed_by_subject(client, shard_only, shard_engine, engine, auth_headers):
+    client.post("/auth/register", json={"email": "nuevo@example.com", "password": "password123"})
+    headers = auth_headers("nuevo@example.com", "password123")
+    client.post("/tasks/", json={"title": "En el shard", "description": "s1"}, headers=headers)
+
+    # Tokens emitidos antes de incluir uid: el id sale del email, no se usa la principal
+    legacy = {"Authorization": f"Bearer {create_access_token(data={'sub': 'nuevo@example.com'})}"}
+    assert [task["title"] for task in client.get("/tasks/", headers=legacy).json()] == ["En el shard"]
+    created = client.post("/tasks/", json={"title": "Otra", "description": "s1"}, headers=legacy)
+    assert created.status_code == 201, created.json()
+    assert _count_tasks(shard_engine, created.json()["user_id"]) == 2
+    assert _count_tasks(engine, created.json()["user_id"]) == 0
+
+    unknown = {"Authorization": f"Bearer {create_access_token(data={'sub': 'nadie@example.com'})}"}
+    assert client.get("/tasks/", headers=unknown).status_code == 401
+
+
+def test_legacy_user_stays_on_primary(client, shard_only, test_user, shard_engine, engine, auth_headers):
+    headers = auth_headers()
+    created = client.post("/tasks/", json={"title": "En la principal", "description": "primary"}, headers=headers)
+    assert created.status_code == 201, created.json()
+
+    assert _count_tasks(engine, test_user.id) == 1
+    assert _count_tasks(shard_engine, test_user.id) == 0
+
+
+def test_move_user_keeps_tasks_and_counters(client, primary_and_shard, test_user, shard_engine, engine, auth_headers):
+    headers = auth_headers()
+    for i in range(3):
+        client.post("/tasks/", json={"title": f"Tarea {i}", "description": "mover"}, headers=headers)
+    task_id = client.get("/tasks/", headers=headers).json()[0]["id"]
+    client.delete(f"/tasks/{task_id}", headers=headers)
+    with Session(engine) as db:
+        db.add(TaskArchive(id=1000, title="Archivada", completed=True, created_at=datetime(2020, 1, 1), user_id=test_user.id))
+        db.commit()
+    engines = {"primary": engine, "s1": shard_engine}
+
+    assert shard_rebalance.move_user(engines, test_user.id, "s1", wait=0)
+    primary_and_shard.invalidate(test_user.id)
+
+    assert _count_tasks(engine, test_user.id) == 0
+    # Las tareas borradas también se trasladan, para que la sincronización siga funcionando
+    assert _count_tasks(shard_engine, test_user.id) == 3
+    assert sorted(task["title"] for task in client.get("/tasks/", headers=headers).json()) == ["Tarea 1", "Tarea 2"]
+    assert client.get("/tasks/", params={"include_archived": "true"}, headers=headers).json()[0]["title"] == "Archivada"
+    stats = client.get("/tasks/stats", headers=headers).json()
+    assert stats["total"] == 2
+    changes = client.get("/tasks/changes", params={"since": 0}, headers=headers).json()
+    assert changes["deleted"] == [task_id]
+
+    # Vuelta a la principal: la fila del usuario se conserva allí y se actualizan sus contadores
+    assert shard_rebalance.move_user(engines, test_user.id, "primary", wait=0)
+    primary_and_shard.invalidate(test_user.id)
+    assert _count_tasks(shard_engine, test_user.id) == 0
+    assert client.get("/tasks/stats", headers=headers).json()["total"] == 2
+    assert not shard_rebalance.move_user(engines, test_user.id, "primary", wait=0)
+
+
+def test_writes_are_rejected_while_moving(client, primary_and_shard, test_user, db_session, auth_headers):
+    headers = auth_headers()
+    db_session.add(UserShard(user_id=test_user.id, shard="primary", moving_to="s1"))
+    db_session.commit()
+
+    response = client.post("/tasks/", json={"title": "Durante el traslado", "description": "x"}, headers=headers)
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert client.get("/tasks/", headers=headers).status_code == 200
+
+
+def test_rebalance_plan_follows_the_ring(client, primary_and_shard, test_user, db_session, engine):
+    users = [User(email=f"user{i}@example.com", hashed_password="x") for i in range(20)]
+    db_session.add_all(users)
+    db_session.commit()
+    ring = primary_and_shard.ring
+
+    moves = shard_rebalance.plan(engine, ring)
+    expected = [(user.id, "primary", "s1") for user in [test_user, *users] if ring.get(user.id) == "s1"]
+    assert moves == sorted(expected)
+    assert shard_rebalance.plan(engine, ring, limit=1) == moves[:1]
+    assert shard_rebalance.status({"primary": engine, "s1": None}) == {"primary": 21, "s1": 0}
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import pytest
+from sqlalchemy import create_engine, text
+from fastapi.testclient import TestClient
+from app import database
+from app.main import app
+from app.services import password_pool, startup
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def warmup_env(monkeypatch, sqlite_engine):
+    """Calentamiento contra una BD SQLite propia y sin procesos de bcrypt."""
+    monkeypatch.setattr(database, "get_engine", lambda: sqlite_engine)
+    monkeypatch.setattr(database, "DATABASE_MODE", "sync")
+    monkeypatch.setattr(password_pool, "PASSWORD_HASH_WORKERS", 0)
+    monkeypatch.setattr(startup, "WARMUP_RETRY_SECONDS", 0)
+    return sqlite_engine
+
+
+def _stamp(engine, revision):
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        connection.execute(text("INSERT INTO alembic_version VALUES (:revision)"), {"revision": revision})
+
+
+def test_import_does_not_touch_database_or_passlib():
+    # Una BD inaccesible no impide importar la aplicación, y passlib no se carga hasta usarse
+    code = (
+        "import sys, app.main\n"
+        "from app import database\n"
+        "assert 'passlib' not in sys.modules, 'passlib imported'\n"
+        "assert not database._engines, 'engine created on import'\n"
+    )
+    env = {**os.environ, "DATABASE_URL": "postgresql://nobody@127.0.0.1:1/missing"}
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_health_and_ready_endpoints(client):
+    assert client.get("/health").json() == {"status": "ok"}
+    assert client.get("/ready").status_code == 200
+
+    startup.readiness.ready = False
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "starting"
+
+
+def test_schema_check_compares_with_alembic_head(sqlite_engine):
+    result = startup.check_database(sqlite_engine, mode="warn")
+    assert result["schema"] == {"current": None, "head": startup.head_revision(), "up_to_date": False}
+
+    with pytest.raises(startup.SchemaOutOfDate):
+        startup.check_database(sqlite_engine, mode="strict")
+
+    _stamp(sqlite_engine, startup.head_revision())
+    assert startup.check_database(sqlite_engine, mode="strict")["schema"]["up_to_date"] is True
+    assert startup.check_database(sqlite_engine, mode="off") == {"database": "ok"}
+
+
+def test_warm_up_retries_until_database_is_ready(warmup_env, monkeypatch):
+    monkeypatch.setattr(startup, "SCHEMA_CHECK", "strict")
+    state = startup.Readiness()
+    attempts = []
+    real_check = startup.check_database
+
+    def check_database():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("database is starting up")
+        if len(attempts) == 2:
+            # Todavía sin migrar
+            return real_check(warmup_env)
+        _stamp(warmup_env, startup.head_revision())
+        return real_check(warmup_env)
+
+    monkeypatch.setattr(startup, "check_database", check_database)
+    asyncio.run(startup.warm_up(state))
+
+    assert state.ready
+    assert state.attempts == 3
+    assert state.error is None
+    assert state.checks["schema"]["up_to_date"] is True
+    assert state.checks["password_hashing"] == "ok"
+
+
+def test_lifespan_reports_ready_once_warm(warmup_env, monkeypatch):
+    monkeypatch.setattr(startup, "STARTUP_WARMUP", True)
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 10
+        while (response := client.get("/ready")).status_code == 503 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert response.status_code == 200, response.json()
+        body = response.json()
+        assert body["status"] == "ready"
+        assert body["checks"]["database"] == "ok"
+        assert body["warmup_ms"] is not None
+    assert not startup.readiness.ready
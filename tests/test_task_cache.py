@@ -0,0 +1,162 @@
+import asyncio
+import pytest
+from sqlalchemy import event
+from app.services import task_cache
+from app.services.task_cache import MemoryBackend, TaskCache
+
+
+@pytest.fixture
+def statements(app_engine):
+    """Sentencias SQL ejecutadas durante el test (primera palabra y tabla principal)."""
+    executed = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append("tasks" if "FROM tasks" in statement else statement.split()[0].upper())
+
+    event.listen(app_engine, "before_cursor_execute", before_execute)
+    yield executed
+    event.remove(app_engine, "before_cursor_execute", before_execute)
+
+
+@pytest.fixture
+def shared_cache(monkeypatch):
+    """Caché de la aplicación con nivel compartido, más un segundo "worker" que lo comparte."""
+    shared = MemoryBackend()
+    monkeypatch.setattr(task_cache, "cache", TaskCache(100, 60, shared))
+    return TaskCache(100, 60, shared)
+
+
+def test_list_is_served_from_cache_until_a_write(client, test_user, statements, auth_headers):
+    headers = auth_headers()
+    client.post("/tasks/", json={"title": "A", "description": "D"}, headers=headers)
+    first = client.get("/tasks/", headers=headers)
+    statements.clear()
+
+    second = client.get("/tasks/", headers=headers)
+    assert second.json() == first.json()
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert "tasks" not in statements
+
+    client.post("/tasks/", json={"title": "B", "description": "D"}, headers=headers)
+    third = client.get("/tasks/", headers=headers)
+    assert [task["title"] for task in third.json()] == ["A", "B"]
+    assert task_cache.cache.stats()["local"]["hits"] == 1
+
+
+def test_list_cache_keeps_pagination_headers(client, test_user, auth_headers):
+    headers = auth_headers()
+    for i in range(3):
+        client.post("/tasks/", json={"title": f"T{i}", "description": "D"}, headers=headers)
+    first = client.get("/tasks/", params={"limit": 2}, headers=headers)
+    second = client.get("/tasks/", params={"limit": 2}, headers=headers)
+    assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+    assert client.get("/tasks/", params={"cursor": "no-es-un-cursor"}, headers=headers).status_code == 400
+
+
+def test_shared_cache_serves_reads_without_database(client, test_user, statements, shared_cache, auth_headers):
+    headers = auth_headers()
+    created = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers).json()
+    statements.clear()
+
+    # La tarea creada ya está en la caché (write-through): ni siquiera se lee la versión
+    response = client.get(f"/tasks/{created['id']}", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == created
+    assert statements == []
+
+    conditional = client.get(f"/tasks/{created['id']}", headers={**headers, "If-None-Match": response.headers["ETag"]})
+    assert conditional.status_code == 304
+    assert client.get("/tasks/999999", headers=headers).status_code == 404
+
+
+def test_write_invalidates_other_workers(client, test_user, shared_cache, auth_headers):
+    """Otro worker con su propia caché local ve la escritura a través del nivel compartido."""
+    headers = auth_headers()
+    created = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers).json()
+
+    async def read_from_other_worker():
+        version = await shared_cache.version(test_user.id)
+        return await shared_cache.get_or_load(test_user.id, version, ("task", created["id"]), None)
+
+    assert '"completed":false' in asyncio.run(read_from_other_worker())["body"]
+    client.put(f"/tasks/{created['id']}", json={"completed": True}, headers=headers)
+    assert '"completed":true' in asyncio.run(read_from_other_worker())["body"]
+    assert shared_cache.stats()["shared"]["hits"] == 2
+
+
+def test_concurrent_misses_are_coalesced():
+    async def scenario():
+        cache = TaskCache(100, 60)
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"body": "[]"}
+
+        results = await asyncio.gather(*(cache.get_or_load(1, 5, ("list", "x"), loader) for _ in range(10)))
+        return results, calls, cache.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result == {"body": "[]"} for result in results)
+    assert stats["coalesced"] == 9
+    assert stats["hit_ratio"] == 0.9
+
+
+def test_cancelled_load_is_handed_over_to_a_waiter():
+    async def scenario():
+        cache = TaskCache(100, 60)
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        async def loader():
+            return {"body": "ok"}
+
+        leader = asyncio.create_task(cache.get_or_load(1, 1, ("task", 1), slow))
+        await started.wait()
+        waiters = [asyncio.create_task(cache.get_or_load(1, 1, ("task", 1), loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        # La petición que cargaba se desconecta: las demás no reciben su CancelledError
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return results, cache.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == [{"body": "ok"}] * 3
+    # Solo uno de los que esperaban vuelve a cargar; los demás lo encuentran ya en caché
+    assert stats["loads"] == 1
+
+
+def test_failed_load_is_not_cached():
+    async def scenario():
+        cache = TaskCache(100, 60)
+
+        async def failing():
+            raise RuntimeError("boom")
+
+        async def loader():
+            return {"body": "ok"}
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load(1, 1, ("task", 1), failing)
+        return await cache.get_or_load(1, 1, ("task", 1), loader)
+
+    assert asyncio.run(scenario()) == {"body": "ok"}
+
+
+def test_shared_version_never_goes_back():
+    async def scenario():
+        cache = TaskCache(100, 60, MemoryBackend())
+        await cache.set_version(1, 7)
+        # Una versión leída de la BD antes de la escritura llega tarde y no la pisa
+        await cache.set_version(1, 6)
+        return await cache.version(1)
+
+    assert asyncio.run(scenario()) == 7
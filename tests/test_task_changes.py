@@ -0,0 +1,64 @@
+def test_changes_since_cursor(client, test_user, auth_headers):
+    """
+    1. Se obtiene el cursor inicial con GET /tasks/.
+    2. Se crea, modifica y elimina tareas.
+    3. GET /tasks/changes devuelve solo lo ocurrido desde el cursor.
+    """
+    headers = auth_headers()
+    kept = client.post("/tasks/", json={"title": "Antigua", "description": "D"}, headers=headers).json()
+
+    cursor = int(client.get("/tasks/", headers=headers).headers["X-Sync-Cursor"])
+
+    created = client.post("/tasks/", json={"title": "Nueva", "description": "D"}, headers=headers)
+    assert int(created.headers["X-Sync-Base"]) == cursor
+    assert int(created.headers["X-Sync-Cursor"]) == cursor + 1
+    created = created.json()
+    updated = client.put(f"/tasks/{kept['id']}", json={"completed": True}, headers=headers)
+    assert int(updated.headers["X-Sync-Cursor"]) == cursor + 2
+    doomed = client.post("/tasks/", json={"title": "Efímera", "description": "D"}, headers=headers).json()
+    deleted = client.delete(f"/tasks/{doomed['id']}", headers=headers)
+    assert int(deleted.headers["X-Sync-Cursor"]) == cursor + 4
+
+    response = client.get("/tasks/changes", params={"since": cursor}, headers=headers)
+
+    assert response.status_code == 200, response.json()
+    changes = response.json()
+    assert changes["cursor"] == cursor + 4
+    assert changes["has_more"] is False
+    assert [task["id"] for task in changes["changed"]] == [created["id"], kept["id"]]
+    assert changes["changed"][1]["completed"] is True
+    assert changes["deleted"] == [doomed["id"]]
+
+    # Sin cambios nuevos, el cursor no se mueve
+    again = client.get("/tasks/changes", params={"since": changes["cursor"]}, headers=headers).json()
+    assert again == {"cursor": changes["cursor"], "has_more": False, "changed": [], "deleted": [], "archived": []}
+
+
+def test_deleted_task_is_hidden_from_reads(client, test_user, auth_headers):
+    headers = auth_headers()
+    task = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers).json()
+    client.delete(f"/tasks/{task['id']}", headers=headers)
+
+    assert client.get(f"/tasks/{task['id']}", headers=headers).status_code == 404
+    assert client.get("/tasks/", headers=headers).json() == []
+    assert client.put(f"/tasks/{task['id']}", json={"title": "X"}, headers=headers).status_code == 404
+    assert client.delete(f"/tasks/{task['id']}", headers=headers).status_code == 404
+
+
+def test_changes_pagination_keeps_batches_together(client, test_user, auth_headers):
+    headers = auth_headers()
+    created = client.post("/tasks/bulk", json=[{"title": f"T{i}", "description": "D"} for i in range(4)], headers=headers).json()
+    ids = [task["id"] for task in created]
+    page = client.get("/tasks/changes", params={"since": 0, "limit": 1}, headers=headers).json()
+    assert [task["id"] for task in page["changed"]] == ids[:1]
+    assert page["has_more"] is True and page["cursor"] == 1
+
+    # Un único número de secuencia para todo el lote
+    response = client.patch("/tasks/bulk", json=[{"id": task_id, "completed": True} for task_id in ids], headers=headers)
+    batch_cursor = int(response.headers["X-Sync-Cursor"])
+    assert int(response.headers["X-Sync-Base"]) == batch_cursor - 1
+
+    first = client.get("/tasks/changes", params={"since": batch_cursor - 1, "limit": 2}, headers=headers).json()
+    assert [task["id"] for task in first["changed"]] == ids
+    assert first["cursor"] == batch_cursor
+    assert first["has_more"] is False
@@ -0,0 +1,85 @@
+import re
+import pytest
+from sqlalchemy import event
+from app.services import task_service
+
+
+@pytest.fixture
+def task_statements(app_engine):
+    """Sentencias SQL sobre la tabla tasks ejecutadas durante el test."""
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if "tasks" in statement:
+            verb = statement.split()[0].upper()
+            if verb == "WITH":
+                # Sentencia principal tras las CTE: WITH x AS (...) UPDATE ...
+                verb = re.search(r"\)\s*(SELECT|INSERT|UPDATE|DELETE)\b", statement).group(1)
+            statements.append(verb)
+
+    event.listen(app_engine, "before_cursor_execute", before_execute)
+    yield statements
+    event.remove(app_engine, "before_cursor_execute", before_execute)
+
+
+def test_update_is_a_single_statement(client, test_user, task_statements, auth_headers):
+    headers = auth_headers()
+    task = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers).json()
+    task_statements.clear()
+
+    response = client.put(f"/tasks/{task['id']}", json={"completed": True}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["completed"] is True and response.json()["title"] == "T"
+    assert task_statements == ["UPDATE"]
+
+
+def test_completing_a_task_takes_two_round_trips(client, test_user, query_budget, auth_headers):
+    headers = auth_headers()
+    task = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers).json()
+
+    # El UPDATE de users que reserva el change_seq ya suma la tarea completada al contador
+    with query_budget(2):
+        response = client.put(f"/tasks/{task['id']}", json={"completed": True}, headers=headers)
+    assert response.status_code == 200
+    assert client.get("/tasks/stats", headers=headers).json()["completed"] == 1
+
+
+def test_delete_is_a_single_statement(client, test_user, task_statements, auth_headers):
+    headers = auth_headers()
+    task = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers).json()
+    task_statements.clear()
+
+    response = client.delete(f"/tasks/{task['id']}", headers=headers)
+
+    assert response.status_code == 204
+    # Borrado lógico: la fila queda como lápida para GET /tasks/changes
+    assert task_statements == ["UPDATE"]
+
+
+def test_mutations_without_returning(client, test_user, monkeypatch, auth_headers):
+    """Sin soporte de RETURNING se usa el camino SELECT + escritura, con la misma semántica."""
+    monkeypatch.setattr(task_service, "_returning_supported", lambda db, kind: False)
+    headers = auth_headers()
+    task = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers).json()
+
+    response = client.put(f"/tasks/{task['id']}", json={"title": "Nuevo"}, headers=headers)
+    assert response.status_code == 200 and response.json()["title"] == "Nuevo"
+    assert client.put("/tasks/9999", json={"title": "X"}, headers=headers).status_code == 404
+
+    created = client.post("/tasks/bulk", json=[{"title": "A", "description": "D"}, {"title": "B", "description": "D"}], headers=headers).json()
+    results = client.patch("/tasks/bulk", json=[{"id": created[0]["id"], "completed": True}], headers=headers).json()
+    assert results[0]["task"]["completed"] is True
+    results = client.request("DELETE", "/tasks/bulk", json={"ids": [created[1]["id"], 9999]}, headers=headers).json()
+    assert [result["status"] for result in results] == ["deleted", "not_found"]
+
+    assert client.delete(f"/tasks/{task['id']}", headers=headers).status_code == 204
+    assert client.delete(f"/tasks/{task['id']}", headers=headers).status_code == 404
+
+
+def test_update_with_empty_body_keeps_404_semantics(client, test_user, auth_headers):
+    headers = auth_headers()
+    task = client.post("/tasks/", json={"title": "T", "description": "D"}, headers=headers).json()
+
+    assert client.put(f"/tasks/{task['id']}", json={}, headers=headers).status_code == 200
+    assert client.put("/tasks/9999", json={}, headers=headers).status_code == 404
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import pytest
+from app import models
+from app.services import task_service
+
+
+def _stats(client, headers, **params):
+    response = client.get("/tasks/stats", params=params, headers=headers)
+    assert response.status_code == 200, response.json()
+    return response.json()
+
+
+def _mutate(client, headers):
+    """Crea, completa, reabre y borra tareas por todos los caminos de escritura."""
+    a = client.post("/tasks/", json={"title": "A", "description": "D"}, headers=headers).json()
+    batch = client.post("/tasks/bulk", json=[{"title": f"B{i}", "description": "D"} for i in range(4)], headers=headers).json()
+    client.post("/tasks/import", content=b'{"title": "I", "description": "D"}\n', headers=headers)
+
+    client.put(f"/tasks/{a['id']}", json={"completed": True}, headers=headers)
+    client.put(f"/tasks/{a['id']}", json={"completed": True, "title": "A2"}, headers=headers)  # ya estaba completada
+    client.patch("/tasks/bulk", json=[{"id": task["id"], "completed": True} for task in batch], headers=headers)
+    client.patch("/tasks/bulk", json=[{"id": batch[0]["id"], "completed": False}], headers=headers)
+
+    client.delete(f"/tasks/{batch[1]['id']}", headers=headers)  # completada
+    client.request("DELETE", "/tasks/bulk", json={"ids": [batch[0]["id"], batch[2]["id"]]}, headers=headers)  # pendiente y completada
+
+
+def _assert_counters_match_rows(db_session, user_id):
+    db_session.expire_all()
+    user = db_session.get(models.User, user_id)
+    live = db_session.query(models.Task).filter(models.Task.user_id == user_id, models.Task.deleted_at.is_(None)).all()
+    assert user.task_count == len(live)
+    assert user.completed_task_count == sum(1 for task in live if task.completed)
+
+
+def test_stats_counters_follow_mutations(client, test_user, db_session, auth_headers):
+    headers = auth_headers()
+    assert _stats(client, headers)["total"] == 0
+
+    _mutate(client, headers)
+
+    stats = _stats(client, headers)
+    # Quedan A (completada), B3 (completada) e I (pendiente)
+    assert (stats["total"], stats["completed"], stats["pending"]) == (3, 2, 1)
+    assert stats["completion_ratio"] == pytest.approx(2 / 3)
+    _assert_counters_match_rows(db_session, test_user.id)
+
+
+def test_stats_counters_without_returning(client, test_user, db_session, monkeypatch, auth_headers):
+    monkeypatch.setattr(task_service, "_returning_supported", lambda db, kind: False)
+    headers = auth_headers()
+
+    _mutate(client, headers)
+
+    assert (_stats(client, headers)["total"], _stats(client, headers)["completed"]) == (3, 2)
+    _assert_counters_match_rows(db_session, test_user.id)
+
+
+def test_stats_histogram(client, test_user, db_session, auth_headers):
+    headers = auth_headers()
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    for days_ago, completed in [(0, True), (0, False), (2, True), (10, False)]:
+        db_session.add(models.Task(title="T", description="D", completed=completed, user_id=test_user.id,
+                                   created_at=today - timedelta(days=days_ago)))
+    db_session.add(models.Task(title="Borrada", description="D", user_id=test_user.id, created_at=today, deleted_at=today))
+    db_session.commit()
+
+    histogram = _stats(client, headers, days=3)["created_per_day"]
+
+    assert [day["day"] for day in histogram] == [(today - timedelta(days=n)).date().isoformat() for n in (2, 1, 0)]
+    assert [(day["created"], day["completed"]) for day in histogram] == [(1, 1), (0, 0), (2, 1)]
+    assert client.get("/tasks/stats", params={"days": 0}, headers=headers).status_code == 422
@@ -0,0 +1,107 @@
+import pytest
+import time
+from datetime import timedelta
+from app.models import RevokedToken
+from app.services import auth_service, revocations
+from app.services.auth_service import create_access_token, decode_access_token, revoke_token, clear_token_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_token_cache()
+    yield
+    clear_token_cache()
+
+
+def test_verified_token_is_memoized(monkeypatch):
+    token = create_access_token(data={"sub": "test@example.com"})
+    calls = []
+    real_decode = auth_service.jwt.decode
+    monkeypatch.setattr(auth_service.jwt, "decode", lambda *a, **kw: calls.append(1) or real_decode(*a, **kw))
+
+    first = decode_access_token(token)
+    second = decode_access_token(token)
+
+    assert first == second and first["sub"] == "test@example.com"
+    assert len(calls) == 1, "La segunda verificación debería salir de la caché"
+
+
+def test_cached_token_still_expires(monkeypatch):
+    token = create_access_token(data={"sub": "test@example.com"}, expires_delta=timedelta(minutes=1))
+    payload = decode_access_token(token)
+    assert payload is not None
+
+    # Justo en el "exp" el token deja de ser válido aunque siga en caché
+    monkeypatch.setattr(auth_service.time, "time", lambda: payload["exp"])
+    assert decode_access_token(token) is None
+
+
+def test_invalid_token_is_not_cached():
+    assert decode_access_token("no.es.un.jwt") is None
+    assert auth_service.token_cache_stats()["size"] == 0
+
+
+def test_revoked_token_is_rejected():
+    token = create_access_token(data={"sub": "test@example.com"})
+    assert decode_access_token(token) is not None
+
+    revoke_token(token)
+
+    assert decode_access_token(token) is None
+    assert auth_service.token_cache_stats()["revoked"] == 1
+
+
+def test_logout_revokes_tokens(client, test_user):
+    login_response = client.post("/auth/login", json={"email": "test@example.com", "password": "testpassword"})
+    tokens = login_response.json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/tasks/", headers=headers).status_code == 200
+
+    logout_response = client.post("/auth/logout", json={"refresh_token": tokens["refresh_token"]}, headers=headers)
+    assert logout_response.status_code == 204
+
+    assert client.get("/tasks/", headers=headers).status_code == 401
+    refresh_response = client.post("/auth/refresh-token", json={"refresh_token": tokens["refresh_token"]})
+    assert refresh_response.status_code == 401
+
+
+def test_revocations_are_kept_until_their_tokens_expire(monkeypatch):
+    revoked = revocations.RevocationList()
+    now = time.time()
+    revoked.add("primero", now + 10)
+    for i in range(10_000):
+        revoked.add(f"token-{i}", now + 100)
+    revoked.add("caducado", now - 1)
+    assert "primero" in revoked and "caducado" not in revoked
+
+    # Solo se retiran las revocaciones cuyo token ya ha caducado
+    monkeypatch.setattr(revocations.time, "time", lambda: now + 50)
+    revoked.add("nuevo", now + 100)
+    assert "primero" not in revoked and "token-0" in revoked
+    assert len(revoked) == 10_001
+
+
+def test_logout_reaches_other_workers(client, test_user, db_session):
+    tokens = client.post("/auth/login", json={"email": "test@example.com", "password": "testpassword"}).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.post("/auth/logout", json={"refresh_token": tokens["refresh_token"]}, headers=headers).status_code == 204
+    assert db_session.query(RevokedToken).count() == 2
+
+    # Otro worker no tiene las revocaciones en memoria: el refresh se comprueba en la BD
+    revocations.revoked.clear()
+    assert client.post("/auth/refresh-token", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+    # y el token de acceso se rechaza en cuanto sincroniza
+    revocations.sync(db_session)
+    assert client.get("/tasks/", headers=headers).status_code == 401
+
+
+def test_stale_revocation_list_fails_closed(client, test_user, monkeypatch):
+    tokens = client.post("/auth/login", json={"email": "test@example.com", "password": "testpassword"}).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    monkeypatch.setattr(revocations, "_task", object())
+
+    assert client.get("/tasks/", headers=headers).status_code == 503
+    revocations.revoked.synced_at = time.monotonic()
+    assert client.get("/tasks/", headers=headers).status_code == 200
+    revocations.revoked.synced_at = time.monotonic() - revocations.REVOCATION_MAX_LAG - 1
+    assert client.get("/tasks/", headers=headers).status_code == 503